@@ -13,6 +13,7 @@ import models.scanned_food  # noqa: F401
 import models.marketplace_item  # noqa: F401
 import models.audit_log  # noqa: F401
 import models.revoked_token  # noqa: F401
+import models.ai_call_log  # noqa: F401
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
@@ -0,0 +1,41 @@
+"""Add ai_call_logs table
+
+Revision ID: 0006_ai_call_logs
+Revises: 0005_audit_revocation
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006_ai_call_logs"
+down_revision: Union[str, None] = "0005_audit_revocation"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ai_call_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=True),
+        sa.Column("task", sa.String(), nullable=False),
+        sa.Column("outcome", sa.String(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("latency_ms", sa.Float(), nullable=True),
+        sa.Column("cache_hit", sa.Boolean(), nullable=True),
+        sa.Column("demo_fallback", sa.Boolean(), nullable=True),
+        sa.Column("error_class", sa.String(), nullable=True),
+    )
+    op.create_index("ix_ai_call_logs_created_at", "ai_call_logs", ["created_at"])
+    op.create_index("ix_ai_call_logs_task", "ai_call_logs", ["task"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_call_logs_task", table_name="ai_call_logs")
+    op.drop_index("ix_ai_call_logs_created_at", table_name="ai_call_logs")
+    op.drop_table("ai_call_logs")
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator, model_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 WEAK_SECRET_KEYS = {
     "",
@@ -48,6 +48,12 @@ class Settings(BaseSettings):
     S3_SECRET_ACCESS_KEY: str = ""
     S3_REGION: str = "us-east-1"
     S3_PUBLIC_BASE_URL: str = ""  # optional CDN/public base; else presigned GET
+    # Externally reachable API origin, used to build upload URLs for AI providers on local disk storage
+    PUBLIC_API_URL: str = ""
+    # Vision input: "inline" sends a resized base64 JPEG; "url" lets the provider fetch the stored upload
+    # (S3, or local disk when PUBLIC_API_URL is set), falling back to inline
+    VISION_IMAGE_SOURCE: str = "inline"
+    VISION_IMAGE_URL_TTL_SECONDS: int = 600
 
     # Observability (optional)
     SENTRY_DSN: str = ""
@@ -57,13 +63,32 @@ class Settings(BaseSettings):
 
     # Open Food Facts
     OPEN_FOOD_FACTS_USER_AGENT: str = "VitalPlan/1.0 (contact: support@vitalplan.local)"
+    OPEN_FOOD_FACTS_TIMEOUT_SECONDS: float = 10.0
+    # Barcode product cache (memory LRU + Redis when REDIS_URL is set); unknown barcodes expire sooner
+    BARCODE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    BARCODE_CACHE_NEGATIVE_TTL_SECONDS: int = 3600
+    BARCODE_CACHE_MAX_ENTRIES: int = 4096
+    # Local index built by scripts/import_off_dump.py (relative to backend/), consulted before the API
+    BARCODE_INDEX_PATH: str = "data/off_barcodes.sqlite"
 
     # Payments (optional — demo mode when unset)
     STRIPE_SECRET_KEY: str = ""
     STRIPE_PUBLISHABLE_KEY: str = ""
     STRIPE_WEBHOOK_SECRET: str = ""
+    STRIPE_TIMEOUT_SECONDS: float = 20.0
     FRONTEND_URL: str = "http://localhost:5173"
 
+    # Pooled outbound clients for Open Food Facts and Stripe (utils/http_clients); HTTP/2 is opt-in and
+    # also needs the h2 package (pip install "httpx[http2]").
+    # Connection errors and 429/5xx are retried for idempotent requests with jittered backoff
+    OUTBOUND_HTTP2: bool = False
+    OUTBOUND_MAX_CONNECTIONS: int = 50
+    OUTBOUND_MAX_KEEPALIVE: int = 20
+    OUTBOUND_KEEPALIVE_EXPIRY: float = 30.0
+    OUTBOUND_CONNECT_TIMEOUT: float = 5.0
+    OUTBOUND_RETRIES: int = 2
+    OUTBOUND_RETRY_BACKOFF_SECONDS: float = 0.2
+
     # Email / SMTP (console fallback when unset)
     SMTP_HOST: str = ""
     SMTP_PORT: int = 587
@@ -106,6 +131,90 @@ class Settings(BaseSettings):
     HUGGING_FACE_MODEL: str = "meta-llama/Meta-Llama-3-8B-Instruct"
     MISTRAL_API_KEY: str = ""
     MISTRAL_MODEL: str = "mistral-small"
+    # Worker threads for provider SDKs without an async client
+    AI_SYNC_EXECUTOR_WORKERS: int = 16
+    # Pooled provider HTTP clients (created once per process)
+    AI_HTTP_MAX_CONNECTIONS: int = 50
+    AI_HTTP_MAX_KEEPALIVE: int = 20
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    AI_HTTP_TIMEOUT: float = 60.0
+    AI_HTTP_CONNECT_TIMEOUT: float = 5.0
+    AI_MAX_RETRIES: int = 2
+    # Provider routing: rank configured providers by rolling latency / error rate
+    AI_ROUTING_ENABLED: bool = True
+    AI_ROUTER_WINDOW: int = 100
+    AI_ROUTER_MIN_SAMPLES: int = 5
+    AI_ROUTER_MAX_ERROR_RATE: float = 0.5
+    # Fire a duplicate request at the next provider after this delay (0 disables hedging)
+    AI_HEDGE_DELAY_SECONDS: float = 0.0
+    # Per-provider circuit breaker and bulkhead
+    AI_CALL_TIMEOUT_SECONDS: float = 45.0
+    AI_BREAKER_FAILURE_RATE: float = 0.5
+    AI_BREAKER_WINDOW: int = 20
+    AI_BREAKER_MIN_CALLS: int = 5
+    AI_BREAKER_OPEN_SECONDS: float = 30.0
+    AI_BREAKER_HALF_OPEN_CALLS: int = 1
+    AI_BULKHEAD_MAX_CONCURRENT: int = 16
+    AI_BULKHEAD_MAX_QUEUE: int = 32
+    AI_BULKHEAD_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    # Global AI work scheduler (services/ai_scheduler): caps provider work across all endpoints,
+    # queues the rest by priority (paid > interactive > background) and answers 503 + Retry-After when full
+    AI_SCHEDULER_MAX_CONCURRENT: int = 24
+    AI_SCHEDULER_MAX_QUEUE: int = 48
+    AI_SCHEDULER_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    AI_SCHEDULER_RETRY_AFTER_SECONDS: int = 5
+    # Ask providers for the short-key JSON format in services/compact_output (expanded server-side)
+    AI_COMPACT_OUTPUT: bool = True
+    # Nutrition insights come from data/nutrition_rules.json; set to also ask the AI provider
+    AI_INSIGHTS_ENRICH: bool = False
+    # Per-task model profiles (services/model_profiles). *_MODEL is "provider:model,..." (empty = provider default);
+    # *_TIMEOUT_SECONDS = 0 falls back to AI_CALL_TIMEOUT_SECONDS
+    AI_INSIGHTS_MODEL: str = "groq:llama-3.1-8b-instant,openai:gpt-4o-mini"
+    AI_INSIGHTS_MAX_TOKENS: int = 300
+    AI_INSIGHTS_TEMPERATURE: float = 0.3
+    AI_INSIGHTS_TIMEOUT_SECONDS: float = 10.0
+    AI_VISION_MODEL: str = "openai:gpt-4o-mini"
+    AI_VISION_MAX_TOKENS: int = 800
+    AI_VISION_TEMPERATURE: float = 0.1
+    AI_VISION_TIMEOUT_SECONDS: float = 30.0
+    AI_PLAN_MODEL: str = ""
+    AI_PLAN_MAX_TOKENS: int = 4000
+    AI_PLAN_TEMPERATURE: float = 0.1
+    AI_PLAN_TIMEOUT_SECONDS: float = 45.0
+    # "ai": provider-generated plans with the local engine as fallback; "local": rule-based engine only
+    DIET_PLAN_ENGINE: str = "ai"
+    # Time budget for AI work in a request (clients may ask for less with X-Request-Timeout);
+    # work is cancelled when the client disconnects, checked every AI_DISCONNECT_POLL_SECONDS
+    AI_REQUEST_DEADLINE_SECONDS: float = 90.0
+    AI_DISCONNECT_POLL_SECONDS: float = 0.5
+    # AI call ledger (services/ai_ledger): "" = metrics + in-memory window only, "table" = ai_call_logs, "ndjson" = file
+    AI_LEDGER_SINK: str = ""
+    AI_LEDGER_SAMPLE_RATE: float = 1.0
+    AI_LEDGER_MEMORY_ENTRIES: int = 10000
+    AI_LEDGER_NDJSON_PATH: str = "ai_calls.ndjson"
+    # Sink writes are queued and flushed in batches off the event loop at most this often
+    AI_LEDGER_FLUSH_SECONDS: float = 1.0
+    # USD per million [prompt, completion] tokens by model, for ledger cost estimates (JSON in env)
+    AI_MODEL_PRICES_PER_MTOK: Dict[str, List[float]] = {}
+    # Serve precomputed goal/calorie-band templates (data/plan_templates.json) for ?instant=true and stream drafts
+    DIET_PLAN_TEMPLATES_ENABLED: bool = True
+    # Generated diet plan cache (memory LRU + Redis when REDIS_URL is set)
+    DIET_PLAN_CACHE_TTL_SECONDS: int = 6 * 3600
+    DIET_PLAN_CACHE_MAX_ENTRIES: int = 512
+    # Background AI jobs (/api/diet-plans/generate?async=true)
+    AI_JOB_WORKERS: int = 4
+    AI_JOB_MAX_PENDING: int = 200
+    AI_JOB_TTL_SECONDS: int = 3600
+    # Food image analysis cache (SHA-256 exact + dHash near-duplicate)
+    IMAGE_CACHE_TTL_SECONDS: int = 24 * 3600
+    IMAGE_CACHE_MAX_ENTRIES: int = 2048
+    # Max differing dHash bits for a near-duplicate hit; -1 disables near matching
+    IMAGE_CACHE_MAX_HAMMING_DISTANCE: int = 6
+    # Coalesce identical in-flight AI requests (across workers when REDIS_URL is set)
+    AI_SINGLE_FLIGHT_ENABLED: bool = True
+    AI_SINGLE_FLIGHT_LOCK_SECONDS: int = 90
+    AI_SINGLE_FLIGHT_RESULT_SECONDS: int = 30
+    AI_SINGLE_FLIGHT_POLL_SECONDS: float = 0.25
     
     # Azure Computer Vision
     AZURE_COMPUTER_VISION_ENDPOINT: str = ""
@@ -114,6 +223,15 @@ class Settings(BaseSettings):
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/webp"]
+    # Worker processes for image decode/resize/hash (0 = run on a thread instead)
+    IMAGE_PROCESS_WORKERS: int = 2
+    VISION_IMAGE_MAX_SIDE: int = 1024
+    # Batch scans (/api/scanner/analyze-images)
+    SCANNER_BATCH_MAX_FILES: int = 6
+    SCANNER_BATCH_CONCURRENCY: int = 4
+    # Batch barcode lookups (/api/scanner/barcodes): Open Food Facts requests in flight per batch
+    SCANNER_BARCODE_BATCH_MAX: int = 50
+    SCANNER_BARCODE_CONCURRENCY: int = 8
     
     # External APIs
     NUTRITION_API_KEY: str = ""
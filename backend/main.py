@@ -1,7 +1,8 @@
+from contextlib import asynccontextmanager
 from typing import Optional
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -17,6 +18,14 @@ from services.storage_service import resolve_upload_path, s3_enabled, verify_upl
 from services.health_service import build_health_report
 from services.logging_config import configure_logging
 from services.metrics_service import PrometheusMiddleware, metrics_response
+from services.image_processing import image_processor
+from services.ai_ledger import ai_ledger
+from services.job_service import job_manager
+from services.plan_templates import plan_template_store
+from services.ai_scheduler import AIOverloaded
+from services.request_deadline import CLIENT_CLOSED_REQUEST, ClientDisconnected, DeadlineExceeded
+from utils.chat_completion_factory import close_ai_clients
+from utils.http_clients import outbound_clients
 import models.user  # noqa: F401
 import models.goal  # noqa: F401
 import models.diet_plan  # noqa: F401
@@ -25,6 +34,7 @@ import models.scanned_food  # noqa: F401
 import models.marketplace_item  # noqa: F401
 import models.audit_log  # noqa: F401
 import models.revoked_token  # noqa: F401
+import models.ai_call_log  # noqa: F401
 
 configure_logging(environment=settings.ENVIRONMENT, log_format=settings.LOG_FORMAT)
 logger = logging.getLogger(__name__)
@@ -58,6 +68,18 @@ AI-powered diet guide and nutrition tracker API.
 Most endpoints require `Authorization: Bearer <access_token>` from `/api/auth/login`.
 """
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DIET_PLAN_TEMPLATES_ENABLED:
+        logger.info("Loaded %d diet plan templates", plan_template_store.load())
+    yield
+    await job_manager.aclose()
+    await ai_ledger.aclose()
+    await close_ai_clients()
+    await outbound_clients.aclose()
+    image_processor.shutdown()
+
+
 app = FastAPI(
     title="VitalPlan API",
     description=API_DESCRIPTION,
@@ -66,6 +88,7 @@ app = FastAPI(
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
     swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,
 )
 
 
@@ -172,6 +195,43 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Nobody is listening; the status only shows up in access logs and metrics.
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+@app.exception_handler(AIOverloaded)
+async def ai_overloaded_handler(request: Request, exc: AIOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": {
+                "type": "overloaded",
+                "message": "AI service is busy. Please retry shortly.",
+                "detail": None,
+                "path": str(request.url.path),
+            }
+        },
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={
+            "error": {
+                "type": "deadline_exceeded",
+                "message": "AI service did not respond in time. Please retry.",
+                "detail": None,
+                "path": str(request.url.path),
+            }
+        },
+    )
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     logger.exception("Unhandled error on %s", request.url.path)
@@ -0,0 +1,22 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
+
+from services.database import Base
+
+
+class AICallLog(Base):
+    """Sampled AI call ledger rows (AI_LEDGER_SINK=table)."""
+
+    __tablename__ = "ai_call_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=True)
+    task = Column(String, nullable=False, index=True)
+    outcome = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Float, nullable=True)
+    cache_hit = Column(Boolean, default=False)
+    demo_fallback = Column(Boolean, default=False)
+    error_class = Column(String, nullable=True)
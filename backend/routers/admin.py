@@ -2,6 +2,7 @@ from datetime import timedelta
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
 from services.database import get_db
@@ -26,6 +27,9 @@ from schemas.user import (
     UserListResponse,
 )
 from schemas.audit import AuditLogEntry, AuditLogListResponse
+from schemas.ai_ledger import AICallSummary
+from services.ai_ledger import ai_ledger
+from services.barcode_service import barcode_cache, normalize_barcode
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -277,6 +281,41 @@ async def list_audit_logs(
     )
 
 
+@router.get("/ai-calls/summary", response_model=AICallSummary)
+async def summarize_ai_calls(
+    hours: float = Query(24, gt=0, le=24 * 30),
+    current_admin: User = Depends(get_current_admin_user),
+):
+    """AI call counts, tokens, latency percentiles and errors per provider/model/task (admin only)."""
+    # With the table sink this queries up to 30 days of rows; keep it off the event loop.
+    return await run_in_threadpool(ai_ledger.summary, hours)
+
+
+@router.delete("/barcode-cache")
+async def purge_barcode_cache(
+    request: Request,
+    barcode: Optional[str] = Query(None, description="Purge one barcode; omit to purge the whole cache"),
+    current_admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """Drop cached Open Food Facts products, e.g. after a product was corrected upstream (admin only)."""
+    if barcode:
+        barcode = normalize_barcode(barcode)
+        barcode_cache.delete(barcode)
+    else:
+        barcode_cache.purge()
+    log_audit(
+        db,
+        action="barcode_cache.purge",
+        resource_type="barcode_cache",
+        actor=current_admin,
+        resource_id=barcode,
+        details={"scope": "barcode" if barcode else "all"},
+        request=request,
+    )
+    return {"message": "Barcode cache purged", "barcode": barcode}
+
+
 @router.get("/me", response_model=UserSchema)
 async def get_current_admin(current_admin: User = Depends(get_current_admin_user)):
     """Get current admin user info"""
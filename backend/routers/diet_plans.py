@@ -1,17 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, List, Optional
+import logging
 
-from services.database import get_db
+from services.database import get_db, get_session_factory
 from services.auth_service import get_current_user
 from services.ai_service import ai_service
+from services.ai_scheduler import BACKGROUND, AIOverloaded, priority_for_user, priority_scope
 from services.rate_limit import ai_rate_limiter, client_key
+from services.job_service import JobQueueFull, TERMINAL_STATUSES, job_manager
+from services.request_deadline import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    deadline_scope,
+    request_budget,
+    run_for_request,
+)
+from services.plan_templates import PLAN_FIELDS, apply_plan_diff, plan_diff, plan_template_store
+from config import settings
 from models.user import User
 from models.goal import Goal
 from models.diet_plan import DietPlan
 from schemas.diet_plan import DietPlan as DietPlanSchema, DietPlanCreate, DietPlanUpdate, DietPlanGenerate
+from utils.sse import SSE_HEADERS, sse_event
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _user_profile(user: User) -> Dict[str, Any]:
+    return {
+        "id": user.id,
+        "age": user.age,
+        "gender": user.gender,
+        "height": user.height,
+        "weight": user.weight,
+        "activity_level": user.activity_level,
+        "dietary_restrictions": user.dietary_restrictions or [],
+        "allergies": user.allergies or []
+    }
+
+def _plan_description(plan: Dict[str, Any]) -> str:
+    if plan.get("engine") == "local":
+        return "Rule-based personalized diet plan"
+    return "AI-generated personalized diet plan"
+
+def _save_plan(
+    db: Session,
+    user: User,
+    ai_plan: Dict[str, Any],
+    goals: List[Dict[str, Any]],
+    description: Optional[str] = None,
+) -> DietPlan:
+    db_plan = DietPlan(
+        user_id=user.id,
+        name=f"AI Diet Plan - {ai_plan.get('generated_at', 'Today')}",
+        description=description or _plan_description(ai_plan),
+        total_calories=ai_plan.get("total_calories"),
+        macros=ai_plan.get("macros"),
+        meals=ai_plan.get("meals"),
+        supplements=ai_plan.get("supplements"),
+        ai_recommendations=ai_plan.get("ai_recommendations"),
+        goals=goals
+    )
+    
+    db.add(db_plan)
+    db.commit()
+    db.refresh(db_plan)
+    return db_plan
 
 @router.get("/", response_model=List[DietPlanSchema])
 async def get_user_diet_plans(
@@ -25,56 +81,221 @@ async def get_user_diet_plans(
         .all()
     return plans
 
-@router.post("/generate", response_model=DietPlanSchema)
+@router.post(
+    "/generate",
+    response_model=DietPlanSchema,
+    responses={202: {"description": "Job accepted (when async=true)"}},
+)
 async def generate_diet_plan(
     plan_request: DietPlanGenerate,
     request: Request,
+    response: Response,
+    bypass_cache: bool = Query(False, description="Skip cached plans for identical profiles"),
+    run_async: bool = Query(False, alias="async", description="Queue as a background job and return 202"),
+    instant: bool = Query(
+        False, description="Return a precomputed template plan now and personalize it in the background"
+    ),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
 ):
-    """Generate a new AI-powered diet plan"""
+    """Generate a new AI-powered diet plan.
+
+    With ``instant=true`` and a matching template, the template plan is saved
+    and returned immediately; the `X-Personalization-Job` header names the job
+    that patches it with the personalized plan (its result holds the diff).
+    """
     ai_rate_limiter.check(client_key(request, f"diet:{current_user.id}"))
+    if run_async:
+        return _submit_generation_job(current_user, plan_request, bypass_cache, session_factory)
+    if instant and settings.DIET_PLAN_TEMPLATES_ENABLED:
+        template = plan_template_store.lookup(_user_profile(current_user), plan_request.goals)
+        if template is not None:
+            db_plan = _save_plan(
+                db, current_user, template, plan_request.goals, description="Diet plan (personalizing...)"
+            )
+            job_id = _submit_personalization_job(current_user, db_plan.id, template, plan_request.goals, session_factory)
+            if job_id:
+                response.headers["X-Personalization-Job"] = job_id
+            return db_plan
+
     try:
-        # Prepare user data
-        user_data = {
-            "id": current_user.id,
-            "age": current_user.age,
-            "gender": current_user.gender,
-            "height": current_user.height,
-            "weight": current_user.weight,
-            "activity_level": current_user.activity_level,
-            "dietary_restrictions": current_user.dietary_restrictions or [],
-            "allergies": current_user.allergies or []
-        }
-        
-        # Generate plan using AI
-        ai_plan = await ai_service.generate_diet_plan(user_data, plan_request.goals)
+        # Generate plan using AI; cancelled (and not saved) if the client disconnects
+        with priority_scope(priority_for_user(db, current_user)):
+            ai_plan = await run_for_request(
+                request,
+                ai_service.generate_diet_plan(
+                    _user_profile(current_user), plan_request.goals, bypass_cache=bypass_cache
+                ),
+                task="diet_plan",
+            )
         
         # Save to database
-        db_plan = DietPlan(
-            user_id=current_user.id,
-            name=f"AI Diet Plan - {ai_plan.get('generated_at', 'Today')}",
-            description="AI-generated personalized diet plan",
-            total_calories=ai_plan.get("total_calories"),
-            macros=ai_plan.get("macros"),
-            meals=ai_plan.get("meals"),
-            supplements=ai_plan.get("supplements"),
-            ai_recommendations=ai_plan.get("ai_recommendations"),
-            goals=plan_request.goals
-        )
-        
-        db.add(db_plan)
-        db.commit()
-        db.refresh(db_plan)
-        
-        return db_plan
+        return _save_plan(db, current_user, ai_plan, plan_request.goals)
         
+    except (ClientDisconnected, AIOverloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate diet plan: {str(e)}"
         )
 
+def _submit_generation_job(
+    user: User,
+    plan_request: DietPlanGenerate,
+    bypass_cache: bool,
+    session_factory: sessionmaker,
+) -> JSONResponse:
+    user_id = user.id
+    user_data = _user_profile(user)
+    goals = plan_request.goals
+
+    async def work() -> Dict[str, Any]:
+        with priority_scope(BACKGROUND):
+            ai_plan = await ai_service.generate_diet_plan(user_data, goals, bypass_cache=bypass_cache)
+        job_db = session_factory()
+        try:
+            job_user = job_db.query(User).filter(User.id == user_id).first()
+            if job_user is None:
+                raise LookupError("User no longer exists; diet plan not saved")
+            db_plan = _save_plan(job_db, job_user, ai_plan, goals)
+            return DietPlanSchema.model_validate(db_plan).model_dump(mode="json")
+        finally:
+            job_db.close()
+
+    try:
+        job = job_manager.submit("diet_plan.generate", user_id, work)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Plan generation is busy. Please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/api/diet-plans/jobs/{job['id']}",
+            "events_url": f"/api/diet-plans/jobs/{job['id']}/events",
+        },
+    )
+
+def _submit_personalization_job(
+    user: User,
+    plan_id: int,
+    template: Dict[str, Any],
+    goals: List[Dict[str, Any]],
+    session_factory: sessionmaker,
+) -> Optional[str]:
+    user_data = _user_profile(user)
+
+    async def work() -> Dict[str, Any]:
+        with priority_scope(BACKGROUND):
+            personalized = await ai_service.generate_diet_plan(user_data, goals)
+        # Without an AI plan (no credentials, provider failure) the template is as good as it gets.
+        fallback = bool(personalized.get("demo_mode"))
+        ops = [] if fallback else plan_diff(template, personalized)
+        job_db = session_factory()
+        try:
+            db_plan = job_db.query(DietPlan).filter(DietPlan.id == plan_id).first()
+            # Leave plans the user deleted or edited in the meantime alone.
+            untouched = db_plan is not None and db_plan.is_active and db_plan.updated_at is None
+            applied = untouched and not fallback
+            if applied:
+                patched = apply_plan_diff({field: getattr(db_plan, field) for field in PLAN_FIELDS}, ops)
+                for field in PLAN_FIELDS:
+                    setattr(db_plan, field, patched[field])
+                db_plan.description = _plan_description(personalized)
+                job_db.commit()
+            elif untouched:
+                db_plan.description = "Diet plan (AI personalization unavailable)"
+                job_db.commit()
+            return {"plan_id": plan_id, "applied": applied, "fallback": fallback, "diff": ops}
+        finally:
+            job_db.close()
+
+    try:
+        return job_manager.submit("diet_plan.personalize", user.id, work)["id"]
+    except JobQueueFull:
+        logger.warning("Job queue full; template plan %s stays unpersonalized", plan_id)
+        return None
+
+def _owned_job(job_id: str, user: User) -> Dict[str, Any]:
+    job = job_manager.get(job_id)
+    if not job or job.get("user_id") != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """Poll a background plan generation job"""
+    return _owned_job(job_id, current_user)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_generation_job(
+    job_id: str,
+    timeout: float = Query(50, ge=1, le=600, description="Seconds to wait; keep under the proxy read timeout"),
+    current_user: User = Depends(get_current_user),
+):
+    """Server-Sent Events notification when a background job finishes."""
+    job = _owned_job(job_id, current_user)
+
+    async def events():
+        yield sse_event("status", {"job_id": job_id, "status": job["status"]})
+        final = job if job["status"] in TERMINAL_STATUSES else await job_manager.wait(job_id, timeout)
+        if final and final["status"] in TERMINAL_STATUSES:
+            yield sse_event("done", final)
+        else:
+            yield sse_event("timeout", {"job_id": job_id, "status": (final or job)["status"]})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/generate/stream")
+async def stream_diet_plan(
+    plan_request: DietPlanGenerate,
+    request: Request,
+    bypass_cache: bool = Query(False, description="Skip cached plans for identical profiles"),
+    draft: bool = Query(False, description="Send a rule-based draft plan before the AI plan"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Generate a diet plan over Server-Sent Events.
+
+    Optionally emits a `draft` event with an unsaved rule-based plan first.
+    Then emits a `meal` or `supplement` event as each item completes, then a
+    `plan` event with the persisted plan (or an `error` event).
+    """
+    ai_rate_limiter.check(client_key(request, f"diet:{current_user.id}"))
+    user_data = _user_profile(current_user)
+    priority = priority_for_user(db, current_user)
+
+    async def events():
+        try:
+            with deadline_scope(request_budget(request)), priority_scope(priority):
+                async for event, payload in ai_service.stream_diet_plan(
+                    user_data, plan_request.goals, bypass_cache=bypass_cache, draft=draft
+                ):
+                    if event == "plan":
+                        db_plan = _save_plan(db, current_user, payload, plan_request.goals)
+                        payload = DietPlanSchema.model_validate(db_plan).model_dump(mode="json")
+                    yield sse_event(event, payload)
+        except AIOverloaded as e:
+            yield sse_event(
+                "error", {"message": "AI service is busy. Please retry shortly.", "retry_after": e.retry_after}
+            )
+        except DeadlineExceeded:
+            yield sse_event("error", {"message": "AI service did not respond in time. Please retry."})
+        except Exception as e:
+            logger.error(f"Error streaming diet plan: {str(e)}")
+            yield sse_event("error", {"message": "Failed to generate diet plan"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/{plan_id}", response_model=DietPlanSchema)
 async def get_diet_plan(
     plan_id: int,
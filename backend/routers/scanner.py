@@ -1,67 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
+import asyncio
 import logging
 
 from services.database import get_db
 from services.auth_service import get_current_user
 from services.ai_service import ai_service
-from services.barcode_service import lookup_barcode
-from services.storage_service import save_upload, public_upload_url
+from services.ai_scheduler import AIOverloaded, priority_for_user, priority_scope
+from services.barcode_service import fetch_barcode, known_barcode, lookup_barcode, normalize_barcode
+from services.nutrition_insights import nutrition_insights
+from services.storage_service import save_upload, public_upload_url, vision_image_url
 from services.rate_limit import ai_rate_limiter, client_key
+from services.request_deadline import ClientDisconnected, DeadlineExceeded, run_for_request
+from models.goal import Goal
 from models.user import User
 from models.scanned_food import ScannedFood
-from schemas.scanner import FoodAnalysisResult, ScannedFood as ScannedFoodSchema
+from schemas.scanner import (
+    BatchBarcodeItem,
+    BatchBarcodeRequest,
+    BatchBarcodeResponse,
+    BatchImageAnalysisItem,
+    BatchImageAnalysisResponse,
+    FoodAnalysisResult,
+    ScannedFood as ScannedFoodSchema,
+)
+from utils.uploads import ReadUpload, UnsupportedUpload, UploadTooLarge, read_upload
 from config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def _read_image(file: UploadFile) -> ReadUpload:
+    """Read an image upload in chunks; the type comes from its signature, not the client."""
+    try:
+        return await read_upload(
+            file, max_bytes=settings.MAX_FILE_SIZE, allowed_types=settings.ALLOWED_IMAGE_TYPES
+        )
+    except UnsupportedUpload:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file type. Please upload a JPEG, PNG, or WebP image.",
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=400,
+            detail="File too large. Please upload an image smaller than 10MB.",
+        )
+
+
+def _vision_url(storage_key: str) -> Optional[str]:
+    if settings.VISION_IMAGE_SOURCE != "url":
+        return None
+    return vision_image_url(storage_key)
+
+
+def _active_goals(db: Session, user: User) -> List[Dict[str, Any]]:
+    goals = db.query(Goal).filter(Goal.user_id == user.id, Goal.is_active.is_(True)).all()
+    return [{"type": g.type, "title": g.title, "description": g.description} for g in goals]
+
+
+def _rank_insights_for_goals(result: Dict[str, Any], goals: List[Dict[str, Any]]) -> None:
+    """Re-rank rule insights for the user's goals; cached results are shared across users."""
+    if goals:
+        result["ai_insights"] = nutrition_insights(result, goals, extra=result.get("ai_insights"))
+
+
+def _scanned_food_row(user: User, result: Dict[str, Any], image_url: Optional[str]) -> ScannedFood:
+    return ScannedFood(
+        user_id=user.id,
+        name=result["food_name"],
+        brand=result.get("brand", "Unknown"),
+        barcode=result.get("barcode", ""),
+        calories=result["calories"],
+        serving_size=result["serving_size"],
+        macros=result["macros"],
+        nutrition_details=result["nutrition_details"],
+        ai_insights=result["ai_insights"],
+        confidence=result["confidence"],
+        image_url=image_url,
+        image_data=None,
+    )
+
+
 @router.post("/analyze-image", response_model=FoodAnalysisResult)
 async def analyze_food_image(
     request: Request,
     file: UploadFile = File(...),
+    bypass_cache: bool = Query(False, description="Skip cached results for identical photos"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Analyze food image using AI and persist the upload."""
     ai_rate_limiter.check(client_key(request, f"scan:{current_user.id}"))
     try:
-        if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid file type. Please upload a JPEG, PNG, or WebP image.",
-            )
-
-        image_data = await file.read()
+        upload = await _read_image(file)
 
-        if len(image_data) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Please upload an image smaller than 10MB.",
+        storage_key = await run_in_threadpool(save_upload, upload.data, upload.content_type, "scans")
+        with priority_scope(priority_for_user(db, current_user)):
+            analysis_result = await run_for_request(
+                request,
+                ai_service.analyze_food_image(
+                    upload.data,
+                    image_url=_vision_url(storage_key),
+                    image_sha256=upload.sha256,
+                    bypass_cache=bypass_cache,
+                ),
+                task="food_vision",
             )
-
-        storage_key = save_upload(image_data, file.content_type or "image/jpeg", subdir="scans")
-        analysis_result = await ai_service.analyze_food_image(image_data)
+        _rank_insights_for_goals(analysis_result, _active_goals(db, current_user))
         image_url = public_upload_url(storage_key)
         analysis_result["image_url"] = image_url
 
-        scanned_food = ScannedFood(
-            user_id=current_user.id,
-            name=analysis_result["food_name"],
-            brand=analysis_result.get("brand", "Unknown"),
-            barcode=analysis_result.get("barcode", ""),
-            calories=analysis_result["calories"],
-            serving_size=analysis_result["serving_size"],
-            macros=analysis_result["macros"],
-            nutrition_details=analysis_result["nutrition_details"],
-            ai_insights=analysis_result["ai_insights"],
-            confidence=analysis_result["confidence"],
-            image_url=image_url,
-            image_data=None,
-        )
+        scanned_food = _scanned_food_row(current_user, analysis_result, image_url)
 
         db.add(scanned_food)
         db.commit()
@@ -69,7 +123,7 @@ async def analyze_food_image(
 
         return FoodAnalysisResult(**analysis_result)
 
-    except HTTPException:
+    except (HTTPException, ClientDisconnected, AIOverloaded, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error(f"Error analyzing food image: {str(e)}")
@@ -79,6 +133,82 @@ async def analyze_food_image(
         )
 
 
+@router.post("/analyze-images", response_model=BatchImageAnalysisResponse)
+async def analyze_food_images(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    bypass_cache: bool = Query(False, description="Skip cached results for identical photos"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Analyze several food photos at once; persists all successful scans in one transaction."""
+    if len(files) > settings.SCANNER_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Upload at most {settings.SCANNER_BATCH_MAX_FILES} images per batch.",
+        )
+    # One rate-limit check for the whole batch, before any upload is read or analyzed.
+    ai_rate_limiter.check(client_key(request, f"scan:{current_user.id}"))
+
+    fan_out = asyncio.Semaphore(settings.SCANNER_BATCH_CONCURRENCY)
+    goals = _active_goals(db, current_user)
+    priority = priority_for_user(db, current_user)
+
+    async def process(file: UploadFile) -> Dict[str, Any]:
+        try:
+            upload = await _read_image(file)
+            storage_key = await run_in_threadpool(save_upload, upload.data, upload.content_type, "scans")
+            async with fan_out:
+                with priority_scope(priority):
+                    analysis = await ai_service.analyze_food_image(
+                        upload.data,
+                        image_url=_vision_url(storage_key),
+                        image_sha256=upload.sha256,
+                        bypass_cache=bypass_cache,
+                    )
+            _rank_insights_for_goals(analysis, goals)
+            analysis["image_url"] = public_upload_url(storage_key)
+            return {"filename": file.filename, "result": analysis}
+        except HTTPException as exc:
+            return {"filename": file.filename, "error": exc.detail}
+        except AIOverloaded:
+            return {"filename": file.filename, "error": "AI service is busy. Please retry shortly."}
+        except DeadlineExceeded:
+            return {"filename": file.filename, "error": "AI service did not respond in time. Please retry."}
+        except Exception as e:
+            logger.error(f"Error analyzing food image {file.filename}: {str(e)}")
+            return {"filename": file.filename, "error": "Failed to analyze image. Please try again."}
+
+    async def process_all() -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(process(file) for file in files))
+
+    # One deadline for the whole batch; cancelled (and nothing saved) if the client disconnects.
+    outcomes = await run_for_request(request, process_all(), task="food_vision_batch")
+
+    succeeded = [outcome for outcome in outcomes if "result" in outcome]
+    if succeeded:
+        db.add_all(
+            [
+                _scanned_food_row(current_user, outcome["result"], outcome["result"]["image_url"])
+                for outcome in succeeded
+            ]
+        )
+        db.commit()
+
+    return BatchImageAnalysisResponse(
+        items=[
+            BatchImageAnalysisItem(
+                filename=outcome["filename"],
+                result=FoodAnalysisResult(**outcome["result"]) if "result" in outcome else None,
+                error=outcome.get("error"),
+            )
+            for outcome in outcomes
+        ],
+        analyzed=len(succeeded),
+        failed=len(outcomes) - len(succeeded),
+    )
+
+
 @router.get("/history", response_model=List[ScannedFoodSchema])
 async def get_scan_history(
     current_user: User = Depends(get_current_user),
@@ -132,6 +262,7 @@ async def scan_barcode(
                 status_code=404,
                 detail="Product not found for this barcode",
             )
+        _rank_insights_for_goals(result, _active_goals(db, current_user))
 
         scanned_food = ScannedFood(
             user_id=current_user.id,
@@ -177,3 +308,73 @@ async def scan_barcode(
             status_code=500,
             detail="Failed to scan barcode. Please try again.",
         )
+
+
+@router.post("/barcodes", response_model=BatchBarcodeResponse)
+async def scan_barcodes(
+    payload: BatchBarcodeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Look up several barcodes at once; persists all found products in one transaction.
+
+    Duplicates are looked up once. Barcodes the local index or cache knows are
+    answered immediately; the rest go to Open Food Facts concurrently.
+    """
+    barcodes = list(dict.fromkeys(normalize_barcode(barcode) for barcode in payload.barcodes))
+    if not barcodes:
+        raise HTTPException(status_code=400, detail="No barcodes to look up.")
+    if len(barcodes) > settings.SCANNER_BARCODE_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many barcodes. Look up at most {settings.SCANNER_BARCODE_BATCH_MAX} per batch.",
+        )
+
+    not_found = {"error": "Product not found for this barcode"}
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    misses: List[str] = []
+    for barcode in barcodes:
+        if len(barcode) < 8:
+            outcomes[barcode] = {"error": "Invalid barcode"}
+            continue
+        known, product = known_barcode(barcode)
+        if known:
+            outcomes[barcode] = {"result": product} if product else not_found
+        else:
+            misses.append(barcode)
+
+    fan_out = asyncio.Semaphore(settings.SCANNER_BARCODE_CONCURRENCY)
+
+    async def fetch(barcode: str) -> Dict[str, Any]:
+        try:
+            async with fan_out:
+                product = await fetch_barcode(barcode)
+        except Exception as e:
+            logger.error(f"Error scanning barcode {barcode}: {str(e)}")
+            return {"error": "Failed to scan barcode. Please try again."}
+        return {"result": product} if product else not_found
+
+    for barcode, outcome in zip(misses, await asyncio.gather(*(fetch(barcode) for barcode in misses))):
+        outcomes[barcode] = outcome
+
+    ordered = [(barcode, outcomes[barcode]) for barcode in barcodes]
+    found = [outcome["result"] for _, outcome in ordered if "result" in outcome]
+    if found:
+        goals = _active_goals(db, current_user)
+        for result in found:
+            _rank_insights_for_goals(result, goals)
+        db.add_all([_scanned_food_row(current_user, result, result.get("image_url")) for result in found])
+        db.commit()
+
+    return BatchBarcodeResponse(
+        items=[
+            BatchBarcodeItem(
+                barcode=barcode,
+                result=FoodAnalysisResult(**outcome["result"]) if "result" in outcome else None,
+                error=outcome.get("error"),
+            )
+            for barcode, outcome in ordered
+        ],
+        found=len(found),
+        failed=len(barcodes) - len(found),
+    )
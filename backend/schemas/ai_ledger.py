@@ -0,0 +1,29 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class AICallGroup(BaseModel):
+    provider: str
+    model: Optional[str] = None
+    task: str
+    calls: int
+    errors: int
+    cache_hits: int
+    demo_fallbacks: int
+    prompt_tokens: int
+    completion_tokens: int
+    error_classes: Dict[str, int]
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    latency_max: Optional[float] = None
+    estimated_cost_usd: Optional[float] = None
+
+
+class AICallSummary(BaseModel):
+    since: str
+    hours: float
+    source: str
+    sample_rate: float
+    total_calls: int
+    groups: List[AICallGroup]
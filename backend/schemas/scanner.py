@@ -16,6 +16,29 @@ class FoodAnalysisResult(BaseModel):
     brand: Optional[str] = None
     barcode: Optional[str] = None
 
+class BatchImageAnalysisItem(BaseModel):
+    filename: Optional[str] = None
+    result: Optional[FoodAnalysisResult] = None
+    error: Optional[str] = None
+
+class BatchImageAnalysisResponse(BaseModel):
+    items: List[BatchImageAnalysisItem]
+    analyzed: int
+    failed: int
+
+class BatchBarcodeRequest(BaseModel):
+    barcodes: List[str]
+
+class BatchBarcodeItem(BaseModel):
+    barcode: str
+    result: Optional[FoodAnalysisResult] = None
+    error: Optional[str] = None
+
+class BatchBarcodeResponse(BaseModel):
+    items: List[BatchBarcodeItem]
+    found: int
+    failed: int
+
 class ScannedFoodBase(BaseModel):
     name: str
     brand: Optional[str] = None
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Precompute diet plan templates for every goal combination and calorie band.
+
+Usage:
+  cd backend && source .venv/bin/activate
+  python scripts/build_plan_templates.py [--output data/plan_templates.json]
+
+Re-run after editing data/meal_catalog.json (bump its "version"); the API
+ignores templates built from a different catalog version.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.plan_templates import TEMPLATES_PATH, build_templates  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build VitalPlan diet plan templates")
+    parser.add_argument("--output", default=str(TEMPLATES_PATH))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    document = build_templates()
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=1)
+        fh.write("\n")
+    print(f"Wrote {len(document['templates'])} templates to {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
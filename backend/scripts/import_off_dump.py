@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Build the local barcode index from an Open Food Facts export.
+
+Usage:
+  cd backend && source .venv/bin/activate
+  python scripts/import_off_dump.py openfoodfacts-products.jsonl.gz
+  python scripts/import_off_dump.py en.openfoodfacts.org.products.csv.gz --format csv
+
+The export is streamed (plain or gzipped, "-" for stdin), so memory stays flat
+whatever its size. The index replaces BARCODE_INDEX_PATH atomically; running
+API workers pick it up on their next lookup.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.barcode_index import (  # noqa: E402
+    index_path,
+    iter_csv_products,
+    iter_jsonl_products,
+    open_dump,
+    write_index,
+)
+from services.barcode_service import map_off_products  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import an Open Food Facts export into the barcode index")
+    parser.add_argument("dump", help="JSONL or CSV export, optionally .gz; - reads stdin")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Default: guessed from the file name")
+    parser.add_argument("--output", default=str(index_path()))
+    args = parser.parse_args()
+
+    dump_format = args.format or ("csv" if ".csv" in Path(args.dump).name else "jsonl")
+    reader = iter_csv_products if dump_format == "csv" else iter_jsonl_products
+
+    started = time.perf_counter()
+    with open_dump(args.dump) as stream:
+        count = write_index(Path(args.output), map_off_products(reader(stream)), source=Path(args.dump).name)
+    print(f"Indexed {count} products into {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""Ledger of AI calls: tokens, latency, cache hits, demo fallbacks and errors.
+
+Every record updates the Prometheus metrics and an in-memory window used by
+the admin summary. A sampled copy can also go to the ``ai_call_logs`` table or
+an NDJSON file (AI_LEDGER_SINK), so the summary survives restarts and covers
+all workers. Sink writes are queued and flushed in batches from a background
+task in a worker thread, so recording never blocks the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from services.metrics_service import AI_CALL_LATENCY, AI_CALLS, AI_TOKENS
+
+logger = logging.getLogger(__name__)
+
+SINKS = ("", "table", "ndjson")
+
+
+def usage_tokens(usage: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, completion) tokens from an OpenAI/Groq/Anthropic-style usage object or dict."""
+    if usage is None:
+        return None, None
+
+    def read(*names: str) -> Optional[int]:
+        for name in names:
+            value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+            if isinstance(value, (int, float)):
+                return int(value)
+        return None
+
+    return read("prompt_tokens", "input_tokens"), read("completion_tokens", "output_tokens")
+
+
+@dataclass
+class AICallRecord:
+    provider: str
+    model: Optional[str]
+    task: str
+    latency_seconds: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cache_hit: bool = False
+    demo_fallback: bool = False
+    error_class: Optional[str] = None
+    at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @property
+    def outcome(self) -> str:
+        if self.demo_fallback:
+            return "demo"
+        if self.cache_hit:
+            return "cache_hit"
+        return "error" if self.error_class else "ok"
+
+    def to_json(self) -> Dict[str, Any]:
+        return {**asdict(self), "at": self.at.isoformat(), "outcome": self.outcome}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _group_row(provider: str, model: Optional[str], task: str) -> Dict[str, Any]:
+    return {
+        "provider": provider,
+        "model": model,
+        "task": task,
+        "calls": 0,
+        "errors": 0,
+        "cache_hits": 0,
+        "demo_fallbacks": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "error_classes": {},
+    }
+
+
+def _priced_and_sorted(
+    rows: Iterable[Dict[str, Any]], prices: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    rows = list(rows)
+    for row in rows:
+        price = (prices or {}).get(row["model"] or "")
+        row["estimated_cost_usd"] = (
+            round((row["prompt_tokens"] * price[0] + row["completion_tokens"] * price[1]) / 1_000_000, 6)
+            if price
+            else None
+        )
+    rows.sort(key=lambda row: (row["task"], row["provider"], row["model"] or ""))
+    return rows
+
+
+def summarize(records: Iterable[AICallRecord], prices: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """One row per (provider, model, task) with counts, token totals and latency percentiles."""
+    groups: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    latencies: Dict[Tuple[str, str, str], List[float]] = {}
+    for record in records:
+        key = (record.provider, record.model or "", record.task)
+        row = groups.setdefault(key, _group_row(record.provider, record.model, record.task))
+        row["calls"] += 1
+        row["cache_hits"] += record.cache_hit
+        row["demo_fallbacks"] += record.demo_fallback
+        row["prompt_tokens"] += record.prompt_tokens or 0
+        row["completion_tokens"] += record.completion_tokens or 0
+        if record.error_class:
+            row["error_classes"][record.error_class] = row["error_classes"].get(record.error_class, 0) + 1
+            if not record.demo_fallback:
+                row["errors"] += 1
+        if record.latency_seconds is not None and not record.cache_hit and not record.demo_fallback:
+            latencies.setdefault(key, []).append(record.latency_seconds)
+
+    for key, row in groups.items():
+        ordered = sorted(latencies.get(key, []))
+        row["latency_p50"] = _percentile(ordered, 0.5)
+        row["latency_p95"] = _percentile(ordered, 0.95)
+        row["latency_max"] = ordered[-1] if ordered else None
+    return _priced_and_sorted(groups.values(), prices)
+
+
+class AICallLedger:
+    def __init__(
+        self,
+        *,
+        sink: str = "",
+        sample_rate: float = 1.0,
+        memory_entries: int = 10000,
+        ndjson_path: str = "ai_calls.ndjson",
+        session_factory: Optional[Callable[[], Any]] = None,
+        flush_seconds: float = 1.0,
+    ):
+        if sink not in SINKS:
+            raise ValueError(f"Unknown AI ledger sink: {sink!r}")
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.ndjson_path = ndjson_path
+        self._session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self._recent: Deque[AICallRecord] = deque(maxlen=memory_entries)
+        # Oldest records are dropped if the sink falls this far behind.
+        self._pending: Deque[AICallRecord] = deque(maxlen=memory_entries)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def session_factory(self) -> Callable[[], Any]:
+        if self._session_factory is None:
+            from services.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def record(self, record: AICallRecord) -> AICallRecord:
+        AI_CALLS.labels(record.provider, record.task, record.outcome).inc()
+        model = record.model or ""
+        if record.latency_seconds is not None and record.outcome in ("ok", "error"):
+            AI_CALL_LATENCY.labels(record.provider, model, record.task).observe(record.latency_seconds)
+        for kind, tokens in (("prompt", record.prompt_tokens), ("completion", record.completion_tokens)):
+            if tokens:
+                AI_TOKENS.labels(record.provider, model, record.task, kind).inc(tokens)
+        sampled = bool(self.sink) and random.random() < self.sample_rate
+        with self._lock:
+            self._recent.append(record)
+            if sampled:
+                self._pending.append(record)
+        if sampled:
+            self._schedule_flush()
+        return record
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on an event loop, so writing inline blocks nobody.
+            self.flush()
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_seconds)
+            await asyncio.to_thread(self.flush)
+
+    def flush(self) -> int:
+        """Write every queued record to the sink in one batch; returns how many were taken."""
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as exc:
+                    logger.warning("AI ledger %s write of %d records failed (%s)", self.sink, len(batch), exc)
+            return len(batch)
+
+    async def aclose(self) -> None:
+        """Stop the background flusher and drain the queue (app shutdown)."""
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        self._flusher = None
+        await asyncio.to_thread(self.flush)
+
+    def _write(self, records: List[AICallRecord]) -> None:
+        if self.sink == "ndjson":
+            lines = "".join(json.dumps(record.to_json(), default=str) + "\n" for record in records)
+            with open(self.ndjson_path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+            return
+
+        from models.ai_call_log import AICallLog
+
+        db = self.session_factory()()
+        try:
+            db.add_all(
+                AICallLog(
+                    created_at=record.at,
+                    provider=record.provider,
+                    model=record.model,
+                    task=record.task,
+                    outcome=record.outcome,
+                    prompt_tokens=record.prompt_tokens,
+                    completion_tokens=record.completion_tokens,
+                    latency_ms=record.latency_seconds * 1000 if record.latency_seconds is not None else None,
+                    cache_hit=record.cache_hit,
+                    demo_fallback=record.demo_fallback,
+                    error_class=record.error_class,
+                )
+                for record in records
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _table_summary(self, since: datetime) -> Tuple[int, List[Dict[str, Any]]]:
+        """``summarize`` done by the database: GROUP BY aggregates plus one ordered lookup per percentile."""
+        from sqlalchemy import and_, case, func
+
+        from models.ai_call_log import AICallLog
+
+        def count_where(condition: Any) -> Any:
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+        key = (AICallLog.provider, AICallLog.model, AICallLog.task)
+        recent = AICallLog.created_at >= since
+        timed = and_(
+            AICallLog.latency_ms.isnot(None),
+            AICallLog.cache_hit.isnot(True),
+            AICallLog.demo_fallback.isnot(True),
+        )
+        db = self.session_factory()()
+        try:
+            aggregates = (
+                db.query(
+                    *key,
+                    func.count(AICallLog.id),
+                    count_where(AICallLog.cache_hit.is_(True)),
+                    count_where(AICallLog.demo_fallback.is_(True)),
+                    func.coalesce(func.sum(AICallLog.prompt_tokens), 0),
+                    func.coalesce(func.sum(AICallLog.completion_tokens), 0),
+                    count_where(and_(AICallLog.error_class.isnot(None), AICallLog.demo_fallback.isnot(True))),
+                    count_where(timed),
+                    func.max(case((timed, AICallLog.latency_ms))),
+                )
+                .filter(recent)
+                .group_by(*key)
+                .all()
+            )
+            error_classes = (
+                db.query(*key, AICallLog.error_class, func.count(AICallLog.id))
+                .filter(recent, AICallLog.error_class.isnot(None))
+                .group_by(*key, AICallLog.error_class)
+                .all()
+            )
+
+            groups: Dict[Tuple[str, Optional[str], str], Dict[str, Any]] = {}
+            for provider, model, task, *totals in aggregates:
+                calls, hits, demos, prompt, completion, errors, timed_calls, slowest = totals
+                row = _group_row(provider, model, task)
+                row.update(
+                    calls=calls,
+                    cache_hits=int(hits),
+                    demo_fallbacks=int(demos),
+                    prompt_tokens=int(prompt),
+                    completion_tokens=int(completion),
+                    errors=int(errors),
+                    latency_max=slowest / 1000 if slowest is not None else None,
+                )
+                for name, fraction in (("latency_p50", 0.5), ("latency_p95", 0.95)):
+                    row[name] = None
+                    if timed_calls:
+                        offset = min(timed_calls - 1, int(round(fraction * (timed_calls - 1))))
+                        # model == None compiles to IS NULL.
+                        latency_ms = (
+                            db.query(AICallLog.latency_ms)
+                            .filter(recent, timed, AICallLog.provider == provider)
+                            .filter(AICallLog.model == model, AICallLog.task == task)
+                            .order_by(AICallLog.latency_ms)
+                            .offset(offset)
+                            .limit(1)
+                            .scalar()
+                        )
+                        row[name] = latency_ms / 1000 if latency_ms is not None else None
+                groups[(provider, model, task)] = row
+        finally:
+            db.close()
+
+        for provider, model, task, error_class, count in error_classes:
+            groups[(provider, model, task)]["error_classes"][error_class] = count
+        total = sum(row["calls"] for row in groups.values())
+        return total, _priced_and_sorted(groups.values(), settings.AI_MODEL_PRICES_PER_MTOK)
+
+    def summary(self, hours: float) -> Dict[str, Any]:
+        """Aggregates over the last ``hours``; from the table when it is the sink, else this process."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        if self.sink == "table":
+            total, groups = self._table_summary(since)
+            source, sample_rate = "table", self.sample_rate
+        else:
+            with self._lock:
+                records = [record for record in self._recent if record.at >= since]
+            total, groups = len(records), summarize(records, settings.AI_MODEL_PRICES_PER_MTOK)
+            source, sample_rate = "memory", 1.0
+        return {
+            "since": since.isoformat(),
+            "hours": hours,
+            "source": source,
+            "sample_rate": sample_rate,
+            "total_calls": total,
+            "groups": groups,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._pending.clear()
+
+
+ai_ledger = AICallLedger(
+    sink=settings.AI_LEDGER_SINK,
+    sample_rate=settings.AI_LEDGER_SAMPLE_RATE,
+    memory_entries=settings.AI_LEDGER_MEMORY_ENTRIES,
+    ndjson_path=settings.AI_LEDGER_NDJSON_PATH,
+    flush_seconds=settings.AI_LEDGER_FLUSH_SECONDS,
+)
@@ -0,0 +1,180 @@
+"""Global scheduler for AI provider work: one concurrency cap, one bounded priority queue.
+
+The per-provider bulkheads in services/circuit_breaker protect each upstream;
+this caps provider work across every endpoint of the process. Requests beyond
+``max_concurrent`` wait in a queue ordered by priority class (paid users,
+then interactive requests, then background jobs). When the queue is full a
+new request either displaces the lowest-priority waiter or is refused with
+:class:`AIOverloaded`, which the API answers with 503 and Retry-After.
+
+The priority travels in a context variable, like the request deadline, so
+routers set it once with :func:`priority_scope` and the AI service picks it up.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from config import settings
+from services.metrics_service import (
+    AI_SCHEDULER_IN_FLIGHT,
+    AI_SCHEDULER_QUEUED,
+    AI_SCHEDULER_SHED,
+    AI_SCHEDULER_WAIT,
+)
+from services.request_deadline import bounded_timeout
+
+PAID = "paid"
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# Lower rank is served first.
+PRIORITIES = {PAID: 0, INTERACTIVE: 1, BACKGROUND: 2}
+
+_priority: ContextVar[str] = ContextVar("ai_priority", default=INTERACTIVE)
+
+
+class AIOverloaded(Exception):
+    """The AI scheduler refused the request; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def priority_scope(priority: str) -> Iterator[None]:
+    """Schedule AI work started in this context under ``priority``."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown AI priority: {priority!r}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def priority_for_user(db, user) -> str:
+    """PAID for users with a paid order, INTERACTIVE otherwise."""
+    from models.order import Order
+
+    paid = (
+        db.query(Order.id)
+        .filter(Order.user_id == user.id, Order.payment_status == "paid")
+        .first()
+    )
+    return PAID if paid is not None else INTERACTIVE
+
+
+_Waiter = Tuple[int, int, asyncio.Future, str]
+
+
+class AIScheduler:
+    """Caps concurrent AI requests with a bounded priority wait queue."""
+
+    def __init__(self, *, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._order = itertools.count()
+        self._publish()
+
+    def _publish(self) -> None:
+        AI_SCHEDULER_IN_FLIGHT.set(self.in_flight)
+        for priority in PRIORITIES:
+            AI_SCHEDULER_QUEUED.labels(priority).set(
+                sum(1 for waiter in self._waiters if waiter[3] == priority)
+            )
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _overloaded(self, priority: str, reason: str) -> AIOverloaded:
+        AI_SCHEDULER_SHED.labels(priority, reason).inc()
+        return AIOverloaded(
+            f"AI scheduler {reason}: {self.in_flight} in flight, {len(self._waiters)} queued",
+            self.retry_after,
+        )
+
+    def _discard(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+
+    async def acquire(self, priority: Optional[str] = None) -> None:
+        priority = priority or current_priority()
+        rank = PRIORITIES[priority]
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            AI_SCHEDULER_WAIT.labels(priority).observe(0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            # The newest waiter of the lowest class makes room, if that class is below ours.
+            lowest = max(self._waiters, default=None)
+            if lowest is None or lowest[0] <= rank:
+                raise self._overloaded(priority, "queue_full")
+            self._discard(lowest)
+            lowest[2].set_exception(self._overloaded(lowest[3], "displaced"))
+
+        timeout = bounded_timeout(self.queue_timeout)
+        waiter: _Waiter = (rank, next(self._order), asyncio.get_running_loop().create_future(), priority)
+        heapq.heappush(self._waiters, waiter)
+        self._publish()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter[2], timeout)
+        except asyncio.TimeoutError:
+            raise self._overloaded(priority, "queue_timeout")
+        except AIOverloaded:
+            raise
+        except BaseException:
+            # Cancelled after the slot was handed over: pass it on.
+            future = waiter[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        finally:
+            self._discard(waiter)
+            self._publish()
+            AI_SCHEDULER_WAIT.labels(priority).observe(time.monotonic() - started)
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the best waiter; in_flight is unchanged.
+                future.set_result(None)
+                self._publish()
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+        self._publish()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+ai_scheduler = AIScheduler(
+    max_concurrent=settings.AI_SCHEDULER_MAX_CONCURRENT,
+    max_queue=settings.AI_SCHEDULER_MAX_QUEUE,
+    queue_timeout=settings.AI_SCHEDULER_QUEUE_TIMEOUT_SECONDS,
+    retry_after=settings.AI_SCHEDULER_RETRY_AFTER_SECONDS,
+)
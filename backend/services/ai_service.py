@@ -1,150 +1,324 @@
+import asyncio
 import base64
-import io
-from PIL import Image
-from typing import Dict, List, Any, Optional
+import hashlib
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import logging
+import time
 import json
 from datetime import datetime, timezone
 from models.ai_provider import AIProvider
 from utils.chat_completion_factory import ChatCompletionFactory
+from utils.json_stream import StreamingArrayParser
+from services.cache_service import ResponseCache
+from services.compact_output import (
+    COMPACT_PLAN_ARRAYS,
+    DIET_PLAN_FORMAT,
+    EXPANDERS,
+    FOOD_ANALYSIS_FORMAT,
+    expand_diet_plan,
+    expand_food_analysis,
+    is_compact_food_analysis,
+    is_compact_plan,
+)
+from services.diet_engine import build_local_plan
+from services.ai_ledger import AICallRecord, ai_ledger, usage_tokens
+from services.ai_scheduler import AIOverloaded, ai_scheduler
+from services.request_deadline import DeadlineExceeded, bounded_timeout
+from services.model_profiles import DIET_PLAN, FOOD_VISION, INSIGHTS, ModelProfile, model_profile
+from services.plan_templates import plan_template_store
+from services.image_cache import image_analysis_cache
+from services.nutrition_insights import DEFAULT_INSIGHTS, nutrition_insights
+from services.image_processing import encode_for_vision, fingerprint_image, image_processor
+from services.provider_router import provider_configured, provider_router
+from services.single_flight import single_flight
+from services.circuit_breaker import ProviderUnavailable
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Bump when the diet plan prompt changes so stale cached plans are not served.
+DIET_PLAN_PROMPT_VERSION = "3"
+
+diet_plan_cache = ResponseCache(
+    "diet_plan",
+    max_entries=settings.DIET_PLAN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.DIET_PLAN_CACHE_TTL_SECONDS,
+)
+diet_plan_flight = single_flight("diet_plan")
+food_image_flight = single_flight("food_image")
+
+
+def _bucket(value: Any, step: float) -> Optional[float]:
+    try:
+        return round(float(value) / step) * step
+    except (TypeError, ValueError):
+        return None
+
+
+def _body_metrics(user_data: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Age, height and weight rounded to 5; both the plan prompt and its cache key use these."""
+    return {field: _bucket(user_data.get(field), 5) for field in ("age", "height", "weight")}
+
+
+def _normalized_list(values: Optional[List[Any]]) -> List[str]:
+    return sorted({str(v).strip().lower() for v in values or [] if str(v).strip()})
+
+
+def diet_plan_fingerprint(
+    user_data: Dict[str, Any],
+    goals: List[Dict[str, Any]],
+    *,
+    provider: AIProvider,
+    model: str,
+) -> str:
+    """Canonical hash of the profile/goal fields the plan prompt uses.
+
+    Age, height and weight are bucketed (in the prompt too) so near-identical
+    profiles share a plan.
+    """
+    profile = {
+        **_body_metrics(user_data),
+        "gender": str(user_data.get("gender") or "other").lower(),
+        "activity_level": str(user_data.get("activity_level") or "moderate").lower(),
+        "dietary_restrictions": _normalized_list(user_data.get("dietary_restrictions")),
+        "allergies": _normalized_list(user_data.get("allergies")),
+    }
+    goal_keys = sorted(
+        (
+            str(goal.get("type") or "").strip().lower(),
+            str(goal.get("title") or "").strip().lower(),
+            str(goal.get("description") or "").strip().lower(),
+            str(goal.get("priority") or "medium").strip().lower(),
+        )
+        for goal in goals
+    )
+    payload = {
+        "v": DIET_PLAN_PROMPT_VERSION,
+        "provider": provider.value,
+        "model": model,
+        "profile": profile,
+        "goals": goal_keys,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 
 def _demo_diet_plan(user_data: Dict[str, Any], goals: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Deterministic fallback when no AI provider is configured."""
-    return {
+    """Rule-based plan from the bundled meal catalog, used when no AI plan is available."""
+    return {**build_local_plan(user_data, goals), "demo_mode": True}
+
+
+def _diet_plan_prompt(user_data: Dict[str, Any], goals: List[Dict[str, Any]]) -> str:
+    metrics = _body_metrics(user_data)
+    user_context = f"""
+    User Profile:
+    - Age: {metrics['age'] or 25}
+    - Gender: {user_data.get('gender', 'other')}
+    - Height: {metrics['height'] or 170}cm
+    - Weight: {metrics['weight'] or 70}kg
+    - Activity Level: {user_data.get('activity_level', 'moderate')}
+    - Dietary Restrictions: {', '.join(user_data.get('dietary_restrictions', []) or [])}
+    - Allergies: {', '.join(user_data.get('allergies', []) or [])}
+
+    Goals:
+    {chr(10).join([f"- {goal.get('title', '')}: {goal.get('description', '')} (Priority: {goal.get('priority', 'medium')})" for goal in goals])}
+    """
+
+    if settings.AI_COMPACT_OUTPUT:
+        return f"""
+    {user_context}
+
+    Create a comprehensive, personalized diet plan tailored to the user's goals,
+    restrictions, and preferences, with 4 meals (breakfast, lunch, dinner, snack)
+    and 2-3 relevant supplements.
+    """ + DIET_PLAN_FORMAT
+
+    return f"""
+    {user_context}
+
+    Create a comprehensive, personalized diet plan with the following structure:
+    {{
         "total_calories": 2000,
-        "macros": {"protein": 150, "carbs": 200, "fat": 67},
+        "macros": {{"protein": 150, "carbs": 200, "fat": 67}},
         "meals": [
-            {
+            {{
                 "id": "meal-1",
                 "name": "Power Protein Breakfast Bowl",
                 "type": "breakfast",
                 "description": "Greek yogurt with berries and nuts",
                 "ingredients": ["Greek yogurt (200g)", "Mixed berries (100g)", "Almonds (30g)"],
                 "calories": 485,
-                "macros": {"protein": 38, "carbs": 32, "fat": 18},
+                "macros": {{"protein": 38, "carbs": 32, "fat": 18}},
                 "prep_time": 5,
                 "difficulty": "easy",
                 "instructions": ["Add yogurt to bowl", "Top with berries and nuts"],
-                "image_url": "https://images.pexels.com/photos/1640774/pexels-photo-1640774.jpeg?auto=compress&cs=tinysrgb&w=400",
-                "nutrition_details": {
-                    "vitamins": {"Vitamin C": "45mg", "Vitamin B12": "2.4μg"},
-                    "minerals": {"Calcium": "320mg", "Iron": "2.1mg"},
+                "nutrition_details": {{
+                    "vitamins": {{"Vitamin C": "45mg", "Vitamin B12": "2.4μg"}},
+                    "minerals": {{"Calcium": "320mg", "Iron": "2.1mg"}},
                     "fiber": 8.5,
                     "sugar": 24,
                     "sodium": 95,
                     "cholesterol": 15,
                     "saturated_fat": 4.2,
-                    "trans_fat": 0,
-                },
-            },
-            {
-                "id": "meal-2",
-                "name": "Mediterranean Quinoa Power Salad",
-                "type": "lunch",
-                "description": "Nutrient-dense quinoa salad packed with antioxidants",
-                "ingredients": ["Quinoa (100g)", "Cherry tomatoes (150g)", "Cucumber (100g)", "Feta cheese (50g)"],
-                "calories": 565,
-                "macros": {"protein": 20, "carbs": 48, "fat": 32},
-                "prep_time": 15,
-                "difficulty": "easy",
-                "instructions": ["Cook quinoa", "Dice vegetables", "Toss with olive oil and lemon"],
-                "image_url": "https://images.pexels.com/photos/1640770/pexels-photo-1640770.jpeg?auto=compress&cs=tinysrgb&w=400",
-                "nutrition_details": {
-                    "vitamins": {"Vitamin K": "180μg", "Vitamin C": "28mg"},
-                    "minerals": {"Magnesium": "118mg", "Potassium": "520mg"},
-                    "fiber": 12.3,
-                    "sugar": 8,
-                    "sodium": 485,
-                    "cholesterol": 25,
-                    "saturated_fat": 8.1,
-                    "trans_fat": 0,
-                },
-            },
-            {
-                "id": "meal-3",
-                "name": "Grilled Salmon with Sweet Potato",
-                "type": "dinner",
-                "description": "Omega-3 rich salmon with roasted vegetables",
-                "ingredients": ["Salmon fillet (150g)", "Sweet potato (200g)", "Broccoli (150g)"],
-                "calories": 620,
-                "macros": {"protein": 42, "carbs": 45, "fat": 28},
-                "prep_time": 25,
-                "difficulty": "medium",
-                "instructions": ["Preheat oven", "Season salmon", "Roast vegetables", "Serve"],
-                "image_url": "https://images.pexels.com/photos/3655916/pexels-photo-3655916.jpeg?auto=compress&cs=tinysrgb&w=400",
-                "nutrition_details": {
-                    "vitamins": {"Vitamin D": "570IU", "Vitamin B12": "3.2μg"},
-                    "minerals": {"Selenium": "40μg", "Potassium": "890mg"},
-                    "fiber": 7.2,
-                    "sugar": 9,
-                    "sodium": 210,
-                    "cholesterol": 70,
-                    "saturated_fat": 5.4,
-                    "trans_fat": 0,
-                },
-            },
-            {
-                "id": "meal-4",
-                "name": "Greek Yogurt Berry Parfait",
-                "type": "snack",
-                "description": "High-protein snack with antioxidants",
-                "ingredients": ["Greek yogurt (150g)", "Blueberries (80g)", "Honey (1 tsp)"],
-                "calories": 220,
-                "macros": {"protein": 18, "carbs": 28, "fat": 4},
-                "prep_time": 5,
-                "difficulty": "easy",
-                "instructions": ["Layer yogurt and berries", "Drizzle honey"],
-                "image_url": "https://images.pexels.com/photos/1099680/pexels-photo-1099680.jpeg?auto=compress&cs=tinysrgb&w=400",
-                "nutrition_details": {
-                    "vitamins": {"Vitamin C": "12mg", "Vitamin B12": "1.1μg"},
-                    "minerals": {"Calcium": "180mg", "Phosphorus": "140mg"},
-                    "fiber": 3.5,
-                    "sugar": 18,
-                    "sodium": 55,
-                    "cholesterol": 10,
-                    "saturated_fat": 1.5,
-                    "trans_fat": 0,
-                },
-            },
+                    "trans_fat": 0
+                }}
+            }}
         ],
         "supplements": [
-            {
+            {{
                 "id": "supp-1",
                 "name": "Omega-3 Fish Oil",
                 "description": "High-potency fish oil for heart health",
                 "dosage": "2 capsules daily",
                 "timing": "With meals",
                 "benefits": ["Heart health", "Brain function", "Anti-inflammatory"],
-                "price": 29.99,
-                "image_url": "https://images.pexels.com/photos/3683074/pexels-photo-3683074.jpeg?auto=compress&cs=tinysrgb&w=400",
-            },
-            {
-                "id": "supp-2",
-                "name": "Vitamin D3",
-                "description": "Supports bone health and immune function",
-                "dosage": "1 softgel daily",
-                "timing": "Morning with food",
-                "benefits": ["Bone health", "Immune support", "Mood"],
-                "price": 14.99,
-                "image_url": "https://images.pexels.com/photos/3683107/pexels-photo-3683107.jpeg?auto=compress&cs=tinysrgb&w=400",
-            },
+                "price": 29.99
+            }}
         ],
         "ai_recommendations": [
-            "Focus on lean proteins aligned with your selected goals",
-            "Stay hydrated and prioritize whole foods",
-            f"Plan tailored for: {', '.join([g.get('title', g.get('type', 'goal')) for g in goals]) or 'general wellness'}",
-            f"Activity level considered: {user_data.get('activity_level', 'moderate')}",
-        ],
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "user_id": user_data.get("id"),
-        "goals": goals,
-        "demo_mode": True,
+            "Focus on lean proteins for muscle building",
+            "Include antioxidant-rich foods for skin health"
+        ]
+    }}
+
+    Ensure the plan is tailored to the user's goals, restrictions, and preferences.
+    Include 4 meals (breakfast, lunch, dinner, snack) and 2-3 relevant supplements.
+    Return ONLY valid JSON.
+    """
+
+
+FOOD_ANALYSIS_PROMPT = """
+    Analyze this food image and provide detailed nutritional information.
+    Return a JSON response with the following structure:
+    {
+        "food_name": "Name of the food item",
+        "confidence": 0.95,
+        "serving_size": "1 medium apple (182g)",
+        "calories": 95,
+        "macros": {
+            "protein": 0.5,
+            "carbs": 25,
+            "fat": 0.3
+        },
+        "nutrition_details": {
+            "vitamins": {"Vitamin C": "14% DV", "Vitamin K": "5% DV"},
+            "minerals": {"Potassium": "6% DV", "Manganese": "3% DV"},
+            "fiber": 4.4,
+            "sugar": 19,
+            "sodium": 2,
+            "cholesterol": 0,
+            "saturated_fat": 0.1,
+            "trans_fat": 0
+        },
+        "ai_insights": [
+            "Rich in antioxidants and fiber",
+            "Great for heart health",
+            "Natural source of energy"
+        ]
     }
 
+    Be accurate with nutritional values and provide helpful health insights.
+    Return ONLY valid JSON.
+    """
+
+FOOD_ANALYSIS_PROMPT_COMPACT = """
+    Analyze this food image and estimate its nutrition. Be accurate with nutritional values.
+    """ + FOOD_ANALYSIS_FORMAT
+
+
+def _parse_json_content(content: Optional[str]) -> Any:
+    """Parse a model reply, tolerating a surrounding Markdown code fence."""
+    content = (content or "").strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[-1]
+        content = content.rsplit("```", 1)[0].strip()
+
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid JSON response from AI")
+
+
+def _ledger_call(
+    provider: AIProvider,
+    model: Optional[str],
+    task: str,
+    started: float,
+    usage: Any = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    prompt_tokens, completion_tokens = usage_tokens(usage)
+    ai_ledger.record(
+        AICallRecord(
+            provider=provider.value,
+            model=model,
+            task=task,
+            latency_seconds=time.perf_counter() - started,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            error_class=type(error).__name__ if error is not None else None,
+        )
+    )
+
+
+def _ledger_event(
+    provider: AIProvider,
+    model: Optional[str],
+    task: str,
+    *,
+    cache_hit: bool = False,
+    error: Optional[BaseException] = None,
+) -> None:
+    """A task answered without a provider call: a cache hit, or a demo fallback when not cache_hit."""
+    ai_ledger.record(
+        AICallRecord(
+            provider=provider.value,
+            model=model,
+            task=task,
+            cache_hit=cache_hit,
+            demo_fallback=not cache_hit,
+            error_class=type(error).__name__ if error is not None else None,
+        )
+    )
+
+
+def _draft_plan(user_data: Dict[str, Any], goals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    template = plan_template_store.lookup(user_data, goals) if settings.DIET_PLAN_TEMPLATES_ENABLED else None
+    return template or build_local_plan(user_data, goals)
+
+
+def _decode_diet_plan(document: Any) -> Dict[str, Any]:
+    """Expand a compact plan; verbose plans (AI_COMPACT_OUTPUT off, older prompts) pass through."""
+    return expand_diet_plan(document) if is_compact_plan(document) else document
+
+
+def _decode_food_analysis(document: Any) -> Dict[str, Any]:
+    return expand_food_analysis(document) if is_compact_food_analysis(document) else document
+
+
+def _finalize_diet_plan(
+    diet_plan: Dict[str, Any], user_data: Dict[str, Any], goals: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    diet_plan["generated_at"] = datetime.now(timezone.utc).isoformat()
+    diet_plan["user_id"] = user_data.get("id")
+    diet_plan["goals"] = goals
+    return diet_plan
+
+
+# Providers whose default models accept OpenAI-style image_url content.
+VISION_PROVIDERS = (AIProvider.AZURE_OPENAI, AIProvider.OPENAI)
+
+# Top-level plan arrays streamed item by item, mapped to their SSE event names.
+STREAMED_PLAN_ARRAYS = {"meals": "meal", "supplements": "supplement"}
+
+
+async def _replay_plan(plan: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Emit an already complete plan in the same event sequence as a live stream."""
+    for key, event in STREAMED_PLAN_ARRAYS.items():
+        for item in plan.get(key) or []:
+            yield event, item
+    yield "plan", plan
+
 
 def _demo_food_analysis() -> Dict[str, Any]:
     return {
@@ -190,240 +364,361 @@ class AIService:
             return AIProvider.OPENAI
         return AIProvider.GROQ
 
+    def _candidate_providers(self, allowed: Optional[List[AIProvider]] = None) -> List[AIProvider]:
+        """Configured providers to try, best first (just self.provider when routing is off)."""
+        if settings.AI_ROUTING_ENABLED:
+            return provider_router.ranked(self.provider, allowed)
+        return [self.provider] if provider_configured(self.provider) else []
+
     def _has_provider_credentials(self) -> bool:
-        if self.provider == AIProvider.AZURE_OPENAI:
-            return bool(settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT)
-        if self.provider == AIProvider.GROQ:
-            return bool(settings.GROQ_API_KEY)
-        if self.provider == AIProvider.OPENAI:
-            return bool(settings.OPENAI_API_KEY)
-        return False
+        return bool(self._candidate_providers())
 
-    def _default_model(self) -> str:
-        if self.provider == AIProvider.AZURE_OPENAI:
+    def _model_for(self, provider: AIProvider) -> str:
+        if provider == AIProvider.AZURE_OPENAI:
             return settings.AZURE_OPENAI_MODEL or "gpt-4o"
-        if self.provider == AIProvider.GROQ:
+        if provider == AIProvider.GROQ:
             return settings.GROQ_MODEL
-        if self.provider == AIProvider.OPENAI:
+        if provider == AIProvider.OPENAI:
             return settings.OPENAI_MODEL
         return "gpt-4o"
 
-    def generate_chat_completion(self, messages: list, model: str, **kwargs) -> Dict[str, Any]:
-        """Generate chat completion using the configured provider"""
-        completion_kwargs = {
-            **self.config,
-            **kwargs,
-        }
-
-        return ChatCompletionFactory.create_completion(
-            provider=self.provider,
-            messages=messages,
-            model=model,
-            **completion_kwargs,
-        )
+    def _default_model(self) -> str:
+        return self._model_for(self.provider)
+
+    def _choose_model(
+        self, provider: AIProvider, model: Optional[str], profile: Optional[ModelProfile]
+    ) -> str:
+        if profile is not None:
+            return profile.model_for(provider, self.provider) or self._model_for(provider)
+        return model if model and provider == self.provider else self._model_for(provider)
+
+    def _completion_kwargs(self, profile: Optional[ModelProfile], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        completion_kwargs = {**self.config, **kwargs}
+        if profile is not None:
+            completion_kwargs.setdefault("max_tokens", profile.max_tokens)
+            completion_kwargs.setdefault("temperature", profile.temperature)
+        return completion_kwargs
+
+    async def generate_chat_completion(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        allowed_providers: Optional[List[AIProvider]] = None,
+        profile: Optional[ModelProfile] = None,
+        failover: bool = True,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """Generate chat completion, routed to the fastest healthy provider with failover.
+
+        A ``profile`` picks the model for each provider and supplies max_tokens,
+        temperature and the per-attempt timeout. Without one, ``model`` applies to
+        the preferred provider and failover targets use their own default model.
+        ``failover=False`` makes a single attempt that is kept out of provider
+        health (stats and circuit breakers).
+        """
+        completion_kwargs = self._completion_kwargs(profile, kwargs)
+        task = profile.task if profile is not None else "chat"
+
+        async def call(provider: AIProvider) -> Dict[str, Any]:
+            chosen = self._choose_model(provider, model, profile)
+            started = time.perf_counter()
+            try:
+                response = await ChatCompletionFactory.acreate_completion(
+                    provider=provider,
+                    messages=messages,
+                    model=chosen,
+                    **completion_kwargs,
+                )
+            except BaseException as exc:
+                # Cancelled attempts are hedge losers or timeouts; record them too.
+                _ledger_call(provider, chosen, task, started, error=exc)
+                raise
+            _ledger_call(provider, chosen, task, started, usage=response.get("usage"))
+            return response
+
+        if not settings.AI_ROUTING_ENABLED:
+            allowed_providers = [self.provider]
+        route = provider_router.call if failover else provider_router.attempt
+        async with ai_scheduler.slot():
+            return await route(
+                call,
+                preferred=self.provider,
+                allowed=allowed_providers,
+                timeout=profile.timeout_seconds if profile is not None else None,
+            )
 
-    async def analyze_food_image(self, image_data: bytes, **kwargs) -> Dict[str, Any]:
-        """Analyze food image using vision-capable AI, with demo fallback."""
+    async def stream_chat_completion(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        profile: Optional[ModelProfile] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream content deltas from the best available provider.
+
+        The profile timeout bounds the whole stream, not each delta.
+        """
+        candidates = self._candidate_providers() or [self.provider]
+        provider = candidates[0]
+        limit = profile.timeout_seconds if profile is not None else None
+        timeout = bounded_timeout(limit)
+        # When the request deadline is shorter than the profile timeout, running
+        # out of time is the client's doing, not the provider's.
+        clipped = timeout is not None and (limit is None or timeout < limit)
+        deadline = asyncio.get_running_loop().time() + timeout if timeout else None
+        chosen = self._choose_model(provider, model, profile)
+        task = profile.task if profile is not None else "chat"
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        async with ai_scheduler.slot(), provider_router.guard(provider):
+            deltas = ChatCompletionFactory.astream_completion(
+                provider=provider,
+                messages=messages,
+                model=chosen,
+                **self._completion_kwargs(profile, kwargs),
+            )
+            try:
+                while True:
+                    try:
+                        if deadline is None:
+                            delta = await deltas.__anext__()
+                        else:
+                            remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+                            delta = await asyncio.wait_for(deltas.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        if clipped:
+                            raise DeadlineExceeded("request deadline exceeded") from None
+                        raise
+                    yield delta
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                await deltas.aclose()
+                _ledger_call(provider, chosen, task, started, error=error)
+
+    async def analyze_food_image(
+        self,
+        image_data: bytes,
+        image_url: Optional[str] = None,
+        image_sha256: Optional[str] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """Analyze food image using vision-capable AI, with demo fallback.
+
+        With ``image_url`` (a short-lived URL of the stored upload) the provider
+        fetches the image itself instead of receiving it inline as base64.
+        ``image_sha256`` saves rehashing when the caller hashed the upload already.
+        """
         if not self._has_provider_credentials():
             logger.warning("No AI credentials configured; returning demo food analysis")
+            _ledger_event(self.provider, None, FOOD_VISION)
             return _demo_food_analysis()
 
-        try:
-            image = Image.open(io.BytesIO(image_data))
-
-            if image.size[0] > 1024 or image.size[1] > 1024:
-                image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
-
-            buffer = io.BytesIO()
-            image.save(buffer, format="JPEG", quality=85)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-
-            prompt = """
-            Analyze this food image and provide detailed nutritional information.
-            Return a JSON response with the following structure:
-            {
-                "food_name": "Name of the food item",
-                "confidence": 0.95,
-                "serving_size": "1 medium apple (182g)",
-                "calories": 95,
-                "macros": {
-                    "protein": 0.5,
-                    "carbs": 25,
-                    "fat": 0.3
-                },
-                "nutrition_details": {
-                    "vitamins": {"Vitamin C": "14% DV", "Vitamin K": "5% DV"},
-                    "minerals": {"Potassium": "6% DV", "Manganese": "3% DV"},
-                    "fiber": 4.4,
-                    "sugar": 19,
-                    "sodium": 2,
-                    "cholesterol": 0,
-                    "saturated_fat": 0.1,
-                    "trans_fat": 0
-                },
-                "ai_insights": [
-                    "Rich in antioxidants and fiber",
-                    "Great for heart health",
-                    "Natural source of energy"
-                ]
-            }
-
-            Be accurate with nutritional values and provide helpful health insights.
-            Return ONLY valid JSON.
-            """
-
-            response = self.generate_chat_completion(
-                model=kwargs.get("model", self._default_model()),
+        fingerprint = None
+        if not kwargs.get("bypass_cache"):
+            try:
+                fingerprint = await image_processor.run(fingerprint_image, image_data, image_sha256)
+            except Exception as exc:
+                logger.warning("Could not fingerprint image for cache lookup: %s", exc)
+            if fingerprint is not None:
+                cached = image_analysis_cache.lookup(fingerprint)
+                if cached is not None:
+                    cached["analyzed_at"] = datetime.now(timezone.utc).isoformat()
+                    cached["cache_hit"] = True
+                    _ledger_event(self.provider, None, FOOD_VISION, cache_hit=True)
+                    return cached
+
+        profile = model_profile(FOOD_VISION, **kwargs)
+        model = self._choose_model(self.provider, None, profile)
+
+        prompt = FOOD_ANALYSIS_PROMPT_COMPACT if settings.AI_COMPACT_OUTPUT else FOOD_ANALYSIS_PROMPT
+
+        async def complete(url: str, failover: bool = True) -> Dict[str, Any]:
+            return await self.generate_chat_completion(
+                profile=profile,
+                failover=failover,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                },
-                            },
+                            {"type": "image_url", "image_url": {"url": url}},
                         ],
                     }
                 ],
-                max_tokens=kwargs.get("max_tokens", settings.AZURE_OPENAI_MAX_TOKENS),
-                temperature=kwargs.get("temperature", settings.AZURE_OPENAI_TEMPERATURE),
+                allowed_providers=[*VISION_PROVIDERS, self.provider],
             )
 
-            content = response.get("content") or ""
-            content = content.strip()
-            if content.startswith("```"):
-                content = content.split("\n", 1)[-1]
-                content = content.rsplit("```", 1)[0].strip()
-
-            try:
-                nutrition_data = json.loads(content)
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON response from AI")
-
-            nutrition_data["analyzed_at"] = datetime.now(timezone.utc).isoformat()
+        async def analyze() -> Dict[str, Any]:
+            response = None
+            if image_url:
+                try:
+                    # A failed fetch says nothing about provider health, so this
+                    # attempt neither fails over nor counts against the breakers.
+                    response = await complete(image_url, failover=False)
+                except (DeadlineExceeded, ProviderUnavailable, AIOverloaded):
+                    raise
+                except Exception as exc:
+                    logger.warning("Vision call by URL failed (%s); retrying with the inline image", exc)
+            if response is None:
+                jpeg_bytes = await image_processor.run(
+                    encode_for_vision, image_data, max_side=settings.VISION_IMAGE_MAX_SIDE
+                )
+                response = await complete(f"data:image/jpeg;base64,{base64.b64encode(jpeg_bytes).decode()}")
+
+            nutrition_data = _decode_food_analysis(_parse_json_content(response.get("content")))
+            nutrition_data["ai_insights"] = nutrition_insights(
+                nutrition_data, extra=nutrition_data.get("ai_insights")
+            )
             nutrition_data["image_processed"] = True
+            if fingerprint is not None:
+                image_analysis_cache.store(fingerprint, nutrition_data)
+            return nutrition_data
 
+        if fingerprint is not None:
+            digest = fingerprint.sha256
+        else:
+            digest = image_sha256 or hashlib.sha256(image_data).hexdigest()
+        try:
+            nutrition_data = await food_image_flight.do(f"{model}:{digest}", analyze)
+            nutrition_data["analyzed_at"] = datetime.now(timezone.utc).isoformat()
             return nutrition_data
 
+        except (AIOverloaded, DeadlineExceeded):
+            # Shed load and expired deadlines are answered with 503/504, not a made-up analysis.
+            raise
         except Exception as e:
             logger.error(f"Error analyzing food image: {str(e)}")
             logger.warning("Falling back to demo food analysis")
+            _ledger_event(self.provider, model, FOOD_VISION, error=e)
             return _demo_food_analysis()
 
     async def generate_diet_plan(self, user_data: Dict[str, Any], goals: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
         """Generate personalized diet plan using AI, with demo fallback."""
+        if settings.DIET_PLAN_ENGINE == "local":
+            return build_local_plan(user_data, goals)
         if not self._has_provider_credentials():
             logger.warning("No AI credentials configured; returning demo diet plan")
+            _ledger_event(self.provider, None, DIET_PLAN)
             return _demo_diet_plan(user_data, goals)
 
-        try:
-            user_context = f"""
-            User Profile:
-            - Age: {user_data.get('age', 25)}
-            - Gender: {user_data.get('gender', 'other')}
-            - Height: {user_data.get('height', 170)}cm
-            - Weight: {user_data.get('weight', 70)}kg
-            - Activity Level: {user_data.get('activity_level', 'moderate')}
-            - Dietary Restrictions: {', '.join(user_data.get('dietary_restrictions', []) or [])}
-            - Allergies: {', '.join(user_data.get('allergies', []) or [])}
-
-            Goals:
-            {chr(10).join([f"- {goal.get('title', '')}: {goal.get('description', '')} (Priority: {goal.get('priority', 'medium')})" for goal in goals])}
-            """
-
-            prompt = f"""
-            {user_context}
-
-            Create a comprehensive, personalized diet plan with the following structure:
-            {{
-                "total_calories": 2000,
-                "macros": {{"protein": 150, "carbs": 200, "fat": 67}},
-                "meals": [
-                    {{
-                        "id": "meal-1",
-                        "name": "Power Protein Breakfast Bowl",
-                        "type": "breakfast",
-                        "description": "Greek yogurt with berries and nuts",
-                        "ingredients": ["Greek yogurt (200g)", "Mixed berries (100g)", "Almonds (30g)"],
-                        "calories": 485,
-                        "macros": {{"protein": 38, "carbs": 32, "fat": 18}},
-                        "prep_time": 5,
-                        "difficulty": "easy",
-                        "instructions": ["Add yogurt to bowl", "Top with berries and nuts"],
-                        "nutrition_details": {{
-                            "vitamins": {{"Vitamin C": "45mg", "Vitamin B12": "2.4μg"}},
-                            "minerals": {{"Calcium": "320mg", "Iron": "2.1mg"}},
-                            "fiber": 8.5,
-                            "sugar": 24,
-                            "sodium": 95,
-                            "cholesterol": 15,
-                            "saturated_fat": 4.2,
-                            "trans_fat": 0
-                        }}
-                    }}
-                ],
-                "supplements": [
-                    {{
-                        "id": "supp-1",
-                        "name": "Omega-3 Fish Oil",
-                        "description": "High-potency fish oil for heart health",
-                        "dosage": "2 capsules daily",
-                        "timing": "With meals",
-                        "benefits": ["Heart health", "Brain function", "Anti-inflammatory"],
-                        "price": 29.99
-                    }}
-                ],
-                "ai_recommendations": [
-                    "Focus on lean proteins for muscle building",
-                    "Include antioxidant-rich foods for skin health"
-                ]
-            }}
-
-            Ensure the plan is tailored to the user's goals, restrictions, and preferences.
-            Include 4 meals (breakfast, lunch, dinner, snack) and 2-3 relevant supplements.
-            Return ONLY valid JSON.
-            """
-
-            response = self.generate_chat_completion(
-                model=kwargs.get("model", self._default_model()),
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=kwargs.get("max_tokens", settings.AZURE_OPENAI_MAX_TOKENS),
-                temperature=kwargs.get("temperature", settings.AZURE_OPENAI_TEMPERATURE),
+        profile = model_profile(DIET_PLAN, **kwargs)
+        model = self._choose_model(self.provider, None, profile)
+        cache_key = diet_plan_fingerprint(user_data, goals, provider=self.provider, model=model)
+        if not kwargs.get("bypass_cache"):
+            cached_plan = diet_plan_cache.get(cache_key)
+            if cached_plan is not None:
+                cached_plan["cache_hit"] = True
+                _ledger_event(self.provider, model, DIET_PLAN, cache_hit=True)
+                return _finalize_diet_plan(cached_plan, user_data, goals)
+
+        async def generate() -> Dict[str, Any]:
+            response = await self.generate_chat_completion(
+                profile=profile,
+                messages=[{"role": "user", "content": _diet_plan_prompt(user_data, goals)}],
             )
-
-            content = response.get("content") or ""
-            content = content.strip()
-            if content.startswith("```"):
-                content = content.split("\n", 1)[-1]
-                content = content.rsplit("```", 1)[0].strip()
-
-            try:
-                diet_plan = json.loads(content)
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON response from AI")
-
-            diet_plan["generated_at"] = datetime.now(timezone.utc).isoformat()
-            diet_plan["user_id"] = user_data.get("id")
-            diet_plan["goals"] = goals
-
+            diet_plan = _decode_diet_plan(_parse_json_content(response.get("content")))
+            diet_plan_cache.set(cache_key, diet_plan)
             return diet_plan
 
+        try:
+            # Identical in-flight requests (double taps, client retries) share one provider call.
+            diet_plan = await diet_plan_flight.do(cache_key, generate)
+            return _finalize_diet_plan(diet_plan, user_data, goals)
+
+        except (AIOverloaded, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"Error generating diet plan: {str(e)}")
             logger.warning("Falling back to demo diet plan")
+            _ledger_event(self.provider, model, DIET_PLAN, error=e)
             return _demo_diet_plan(user_data, goals)
 
-    async def get_nutrition_insights(self, nutrition_data: Dict[str, Any], **kwargs) -> List[str]:
-        """Generate AI-powered nutrition insights"""
+    async def stream_diet_plan(
+        self, user_data: Dict[str, Any], goals: List[Dict[str, Any]], **kwargs
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ("meal" | "supplement", item) as each object completes, then ("plan", plan).
+
+        With ``draft=True`` a ("draft", plan) event from a precomputed template (or the
+        local engine) comes first,
+        so clients can render something while the provider call is in flight.
+        Falls back to the demo plan only when the provider fails before any item was sent.
+        """
+        if settings.DIET_PLAN_ENGINE == "local":
+            async for event in _replay_plan(build_local_plan(user_data, goals)):
+                yield event
+            return
         if not self._has_provider_credentials():
-            return [
-                "Include a variety of colorful vegetables",
-                "Balance protein, carbs, and healthy fats",
-                "Watch sodium if this is a frequent choice",
-            ]
+            logger.warning("No AI credentials configured; streaming demo diet plan")
+            _ledger_event(self.provider, None, DIET_PLAN)
+            async for event in _replay_plan(_demo_diet_plan(user_data, goals)):
+                yield event
+            return
+
+        profile = model_profile(DIET_PLAN, **kwargs)
+        model = self._choose_model(self.provider, None, profile)
+        cache_key = diet_plan_fingerprint(user_data, goals, provider=self.provider, model=model)
+        if not kwargs.get("bypass_cache"):
+            cached_plan = diet_plan_cache.get(cache_key)
+            if cached_plan is not None:
+                cached_plan["cache_hit"] = True
+                _ledger_event(self.provider, model, DIET_PLAN, cache_hit=True)
+                async for event in _replay_plan(_finalize_diet_plan(cached_plan, user_data, goals)):
+                    yield event
+                return
+
+        if kwargs.get("draft"):
+            yield "draft", _draft_plan(user_data, goals)
+
+        parser = StreamingArrayParser([*STREAMED_PLAN_ARRAYS, *COMPACT_PLAN_ARRAYS])
+        counts = dict.fromkeys(COMPACT_PLAN_ARRAYS, 0)
+        emitted = 0
+        try:
+            async for delta in self.stream_chat_completion(
+                profile=profile,
+                messages=[{"role": "user", "content": _diet_plan_prompt(user_data, goals)}],
+            ):
+                for key, item in parser.feed(delta):
+                    if key in COMPACT_PLAN_ARRAYS:
+                        item = EXPANDERS[key](item, counts[key])
+                        counts[key] += 1
+                        key = COMPACT_PLAN_ARRAYS[key]
+                    emitted += 1
+                    yield STREAMED_PLAN_ARRAYS[key], item
+            diet_plan = _decode_diet_plan(_parse_json_content(parser.text))
+        except Exception as e:
+            if emitted or isinstance(e, (AIOverloaded, DeadlineExceeded)):
+                raise
+            logger.error(f"Error streaming diet plan: {str(e)}")
+            logger.warning("Falling back to demo diet plan")
+            _ledger_event(self.provider, model, DIET_PLAN, error=e)
+            async for event in _replay_plan(_demo_diet_plan(user_data, goals)):
+                yield event
+            return
+
+        diet_plan_cache.set(cache_key, diet_plan)
+        yield "plan", _finalize_diet_plan(diet_plan, user_data, goals)
+
+    async def get_nutrition_insights(
+        self,
+        nutrition_data: Dict[str, Any],
+        goals: Optional[List[Dict[str, Any]]] = None,
+        enrich: Optional[bool] = None,
+        **kwargs,
+    ) -> List[str]:
+        """Rule-based nutrition insights, optionally enriched by the AI provider.
+
+        ``enrich`` defaults to AI_INSIGHTS_ENRICH; without credentials the rule
+        output is returned as is.
+        """
+        insights = nutrition_insights(nutrition_data, goals)
+        if enrich is None:
+            enrich = settings.AI_INSIGHTS_ENRICH
+        if not enrich or not self._has_provider_credentials():
+            return insights or list(DEFAULT_INSIGHTS)
 
         try:
             prompt = f"""
@@ -438,24 +733,19 @@ class AIService:
             Return as a JSON array of strings.
             """
 
-            response = self.generate_chat_completion(
-                model=kwargs.get("model", self._default_model()),
+            response = await self.generate_chat_completion(
+                profile=model_profile(INSIGHTS, **kwargs),
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=kwargs.get("max_tokens", settings.AZURE_OPENAI_MAX_TOKENS),
-                temperature=kwargs.get("temperature", settings.AZURE_OPENAI_TEMPERATURE),
             )
 
-            content = response.get("content") or "[]"
-            insights = json.loads(content)
-
-            return insights if isinstance(insights, list) else []
+            enriched = _parse_json_content(response.get("content") or "[]")
+            if not isinstance(enriched, list):
+                enriched = []
+            return nutrition_insights(nutrition_data, goals, extra=[str(line) for line in enriched])
 
         except Exception as e:
             logger.error(f"Error generating insights: {str(e)}")
-            return [
-                "Include a variety of colorful vegetables",
-                "Balance protein, carbs, and healthy fats",
-            ]
+            return insights or list(DEFAULT_INSIGHTS)
 
 
 # Global AI service instance
@@ -0,0 +1,182 @@
+"""Local barcode index built from an Open Food Facts export (scripts/import_off_dump.py).
+
+A SQLite file with one ``products(barcode, data)`` row per product, keyed by
+barcode in a WITHOUT ROWID table so a lookup is a single B-tree probe. The
+data column holds the mapped product as compact JSON. The import writes a new
+file and swaps it in, and the index reopens it when the file changes.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE products (barcode TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+def index_path() -> Path:
+    path = Path(settings.BARCODE_INDEX_PATH)
+    return path if path.is_absolute() else BACKEND_DIR / path
+
+
+def open_dump(path: str) -> TextIO:
+    """Text stream over a (optionally gzipped) export; read line by line, never whole."""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="replace")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+
+def iter_jsonl_products(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """Products from the OFF JSONL export (one product document per line)."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed JSONL line %d", line_number)
+
+
+def iter_csv_products(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """Products from the OFF CSV export, reshaped like API product documents.
+
+    The export is tab-separated with flattened nutriment columns
+    (``proteins_100g``, ``energy-kcal_serving`` ...), which move under
+    ``nutriments`` so map_off_product reads both formats the same way.
+    """
+    csv.field_size_limit(sys.maxsize)
+    for row in csv.DictReader(stream, delimiter="\t", quoting=csv.QUOTE_NONE):
+        product: Dict[str, Any] = {"nutriments": {}}
+        for key, value in row.items():
+            if not key or value in (None, ""):
+                continue
+            if key.endswith(("_100g", "_serving")):
+                product["nutriments"][key] = value
+            else:
+                product[key] = value
+        yield product
+
+
+class BarcodeIndex:
+    """Read side of the index; a missing file simply means every lookup misses."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path or index_path()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.close()
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if self._conn is None or stamp != self._stamp:
+            self.close()
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._stamp = stamp
+        return self._conn
+
+    def lookup(self, barcode: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            try:
+                conn = self._connection()
+                if conn is None:
+                    return None
+                row = conn.execute("SELECT data FROM products WHERE barcode = ?", (barcode,)).fetchone()
+            except sqlite3.Error as exc:
+                logger.warning("Barcode index lookup failed (%s)", exc)
+                return None
+        if row is None:
+            return None
+        product = json.loads(row[0])
+        product["barcode"] = barcode
+        return product
+
+    def metadata(self) -> Dict[str, str]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return {}
+            return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._stamp = None
+
+
+def write_index(
+    path: Path,
+    products: Iterable[Dict[str, Any]],
+    *,
+    source: str = "",
+    batch_size: int = 5000,
+) -> int:
+    """Write mapped products to a fresh index at ``path``; returns the product count.
+
+    Builds ``<path>.tmp`` and renames it over ``path``, so readers never see a
+    half-written index. Later duplicates of a barcode replace earlier ones.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_SCHEMA)
+        batch = []
+        for product in products:
+            data = {key: value for key, value in product.items() if key not in ("barcode", "analyzed_at")}
+            batch.append((product["barcode"], json.dumps(data, separators=(",", ":"))))
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?)", batch)
+                batch.clear()
+        conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?)", batch)
+        count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [
+                ("version", str(INDEX_VERSION)),
+                ("source", source),
+                ("products", str(count)),
+                ("built_at", datetime.now(timezone.utc).isoformat()),
+            ],
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return count
+
+
+barcode_index = BarcodeIndex()
@@ -1,17 +1,27 @@
-"""Open Food Facts barcode nutrition lookup."""
+"""Open Food Facts barcode nutrition lookup, cached in memory and Redis."""
 from __future__ import annotations
 
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
-
-import httpx
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 
 from config import settings
+from services.barcode_index import barcode_index
+from services.cache_service import ResponseCache
+from services.metrics_service import CACHE_REQUESTS
+from services.nutrition_insights import nutrition_insights
+from utils.http_clients import OPEN_FOOD_FACTS, outbound_clients
 
 logger = logging.getLogger(__name__)
 
-OPEN_FOOD_FACTS_URL = "https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
+OPEN_FOOD_FACTS_PRODUCT_PATH = "/api/v2/product/{barcode}.json"
+
+# Entries are {"product": mapped product or None}; None records a barcode Open Food Facts does not know.
+barcode_cache = ResponseCache(
+    "barcode",
+    max_entries=settings.BARCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.BARCODE_CACHE_TTL_SECONDS,
+)
 
 
 def _to_float(value: Any, default: float = 0.0) -> float:
@@ -30,7 +40,9 @@ def _nutrient(nutriments: Dict[str, Any], *keys: str, default: float = 0.0) -> f
     return default
 
 
-def map_off_product(barcode: str, product: Dict[str, Any]) -> Dict[str, Any]:
+def map_off_product(
+    barcode: str, product: Dict[str, Any], analyzed_at: Optional[str] = None
+) -> Dict[str, Any]:
     nutriments = product.get("nutriments") or {}
     name = (
         product.get("product_name")
@@ -69,22 +81,10 @@ def map_off_product(barcode: str, product: Dict[str, Any]) -> Dict[str, Any]:
         nutriments, "saturated-fat_serving", "saturated-fat_100g", "saturated-fat"
     )
 
-    insights = []
     categories = (product.get("categories") or "").split(",")
-    if categories and categories[0].strip():
-        insights.append(f"Category: {categories[0].strip()}")
-    if fiber >= 5:
-        insights.append("Good source of dietary fiber")
-    if protein >= 10:
-        insights.append("Provides meaningful protein per serving")
-    if sodium_mg >= 400:
-        insights.append("Higher sodium — consider moderating intake")
-    if sugar >= 15:
-        insights.append("Higher sugar content")
-    if not insights:
-        insights.append("Nutrition data from Open Food Facts")
-
-    return {
+    category = categories[0].strip() if categories else ""
+
+    result = {
         "food_name": name.strip(),
         "brand": brand.strip() if isinstance(brand, str) else "Unknown",
         "barcode": barcode,
@@ -102,37 +102,90 @@ def map_off_product(barcode: str, product: Dict[str, Any]) -> Dict[str, Any]:
             "fiber": round(fiber, 1),
             "sugar": round(sugar, 1),
             "sodium": round(sodium_mg, 1),
-            "cholesterol": _nutrient(nutriments, "cholesterol_100g", "cholesterol"),
+            # Open Food Facts reports cholesterol in grams, like sodium.
+            "cholesterol": round(_nutrient(nutriments, "cholesterol_100g", "cholesterol") * 1000, 1),
             "saturated_fat": round(saturated_fat, 1),
             "trans_fat": _nutrient(nutriments, "trans-fat_100g", "trans-fat"),
         },
-        "ai_insights": insights[:4],
-        "analyzed_at": datetime.now(timezone.utc).isoformat(),
+        "ai_insights": [],
+        "analyzed_at": analyzed_at or datetime.now(timezone.utc).isoformat(),
         "image_processed": False,
         "image_url": image_url,
         "source": "openfoodfacts",
     }
+    result["ai_insights"] = nutrition_insights(
+        result, extra=[f"Category: {category}"] if category else None
+    ) or ["Nutrition data from Open Food Facts"]
+    return result
+
+
+def map_off_products(products: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """map_off_product over export rows, skipping rows without a barcode, a name or any nutriments."""
+    analyzed_at = datetime.now(timezone.utc).isoformat()
+    for product in products:
+        barcode = normalize_barcode(str(product.get("code") or ""))
+        if len(barcode) < 8 or not product.get("nutriments"):
+            continue
+        if not (product.get("product_name") or product.get("generic_name") or product.get("product_name_en")):
+            continue
+        yield map_off_product(barcode, product, analyzed_at)
+
+
+def normalize_barcode(barcode: str) -> str:
+    return "".join(ch for ch in barcode.strip() if ch.isalnum())
+
+
+def known_barcode(cleaned: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(True, product or None) when the local index or the cache can answer without the API."""
+    product = barcode_index.lookup(cleaned)
+    if product is not None:
+        CACHE_REQUESTS.labels(barcode_cache.name, "hit_index").inc()
+    else:
+        cached = barcode_cache.get(cleaned)
+        if cached is None:
+            return False, None
+        product = cached.get("product")
+    if product is not None:
+        product["analyzed_at"] = datetime.now(timezone.utc).isoformat()
+    return True, product
 
 
 async def lookup_barcode(barcode: str) -> Optional[Dict[str, Any]]:
-    """Fetch product nutrition by barcode from Open Food Facts."""
-    cleaned = "".join(ch for ch in barcode.strip() if ch.isalnum())
+    """Product nutrition by barcode, from the local index, the cache or Open Food Facts.
+
+    Found products are cached for BARCODE_CACHE_TTL_SECONDS, unknown barcodes
+    for BARCODE_CACHE_NEGATIVE_TTL_SECONDS. Upstream errors are not cached.
+    """
+    cleaned = normalize_barcode(barcode)
     if len(cleaned) < 8:
         return None
 
-    url = OPEN_FOOD_FACTS_URL.format(barcode=cleaned)
-    headers = {
-        "User-Agent": settings.OPEN_FOOD_FACTS_USER_AGENT,
-        "Accept": "application/json",
-    }
+    known, product = known_barcode(cleaned)
+    if known:
+        return product
+    return await fetch_barcode(cleaned)
 
+
+async def fetch_barcode(cleaned: str) -> Optional[Dict[str, Any]]:
+    """Ask Open Food Facts for a barcode known_barcode could not answer, caching the outcome."""
+    product = await _fetch_product(cleaned)
+    barcode_cache.set(
+        cleaned,
+        {"product": product},
+        ttl_seconds=None if product is not None else settings.BARCODE_CACHE_NEGATIVE_TTL_SECONDS,
+    )
+    return product
+
+
+async def _fetch_product(cleaned: str) -> Optional[Dict[str, Any]]:
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-            if response.status_code == 404:
-                return None
-            response.raise_for_status()
-            payload = response.json()
+        response = await outbound_clients.request(
+            OPEN_FOOD_FACTS, "GET", OPEN_FOOD_FACTS_PRODUCT_PATH.format(barcode=cleaned)
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        payload = response.json()
     except Exception as exc:
         logger.error("Open Food Facts lookup failed for %s: %s", cleaned, exc)
         raise
@@ -0,0 +1,132 @@
+"""Two-tier response cache: in-process LRU with optional Redis behind it."""
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from services.metrics_service import CACHE_REQUESTS
+from services.rate_limit import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded, TTL-aware LRU map. Values are deep-copied in and out."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ResponseCache:
+    """LRU tier in front of an optional shared Redis tier (used when REDIS_URL is set)."""
+
+    def __init__(self, name: str, *, max_entries: int, ttl_seconds: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def _redis_key(self, key: str) -> str:
+        return f"vitalplan:cache:{self.name}:{key}"
+
+    def fetch(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """(value, "memory" | "redis") or (None, None), without recording metrics."""
+        value = self.local.get(key)
+        if value is not None:
+            return value, "memory"
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                raw = redis_client.get(self._redis_key(key))
+            except Exception as exc:
+                logger.warning("Redis cache read failed for %s (%s)", self.name, exc)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                return value, "redis"
+        return None, None
+
+    def get(self, key: str) -> Optional[Any]:
+        value, tier = self.fetch(key)
+        CACHE_REQUESTS.labels(self.name, f"hit_{tier}" if tier else "miss").inc()
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.local.set(key, value, ttl)
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            redis_client.set(self._redis_key(key), json.dumps(value, default=str), ex=ttl)
+        except Exception as exc:
+            logger.warning("Redis cache write failed for %s (%s)", self.name, exc)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            redis_client.delete(self._redis_key(key))
+        except Exception as exc:
+            logger.warning("Redis cache delete failed for %s (%s)", self.name, exc)
+
+    def clear(self) -> None:
+        """Drop the local tier (tests / admin use)."""
+        self.local.clear()
+
+    def purge(self) -> None:
+        """Drop both tiers; other workers keep their local entries until they expire."""
+        self.local.clear()
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            keys = list(redis_client.scan_iter(match=self._redis_key("*"), count=500))
+            if keys:
+                redis_client.delete(*keys)
+        except Exception as exc:
+            logger.warning("Redis cache purge failed for %s (%s)", self.name, exc)
@@ -0,0 +1,172 @@
+"""Circuit breaker and bulkhead primitives for outbound AI provider calls."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque
+
+from services.metrics_service import AI_BULKHEAD_IN_FLIGHT, AI_BULKHEAD_QUEUED, AI_CIRCUIT_STATE
+
+
+class ProviderUnavailable(Exception):
+    """A provider call was rejected locally before reaching the provider."""
+
+
+class CircuitOpenError(ProviderUnavailable):
+    pass
+
+
+class BulkheadFullError(ProviderUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Closed -> open when the windowed failure rate crosses the threshold.
+
+    After ``open_seconds`` the breaker goes half-open and lets ``half_open_max_calls``
+    probes through; one success closes it again, one failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _GAUGE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate_threshold: float,
+        window: int,
+        min_calls: int,
+        open_seconds: float,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._results: Deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self) -> None:
+        AI_CIRCUIT_STATE.labels(self.name).set(self._GAUGE_VALUES[self._state])
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._set_state(self.HALF_OPEN)
+                self._half_open_in_flight = 0
+            if self._state == self.HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def release(self) -> None:
+        """Give back an allowed call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def _trip(self) -> None:
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        self._set_state(self.OPEN)
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if ok:
+                    self._results.clear()
+                    self._set_state(self.CLOSED)
+                else:
+                    self._trip()
+                return
+            if self._state == self.OPEN:
+                return
+            self._results.append(ok)
+            failures = sum(1 for result in self._results if not result)
+            if (
+                len(self._results) >= self.min_calls
+                and failures / len(self._results) >= self.failure_rate_threshold
+            ):
+                self._trip()
+
+
+class Bulkhead:
+    """Caps concurrent calls with a bounded FIFO wait queue."""
+
+    def __init__(self, name: str, *, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._publish()
+
+    def _publish(self) -> None:
+        AI_BULKHEAD_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        AI_BULKHEAD_QUEUED.labels(self.name).set(len(self._waiters))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise BulkheadFullError(f"{self.name}: {self.in_flight} in flight, queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise BulkheadFullError(f"{self.name}: waited {self.queue_timeout}s for a slot")
+        except BaseException:
+            # Cancelled after the slot was handed over: pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged.
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+        self._publish()
@@ -0,0 +1,179 @@
+"""Compact wire format for AI responses and its expansion to the API shapes.
+
+Providers are asked for short keys, positional macro arrays and enum codes,
+which roughly halves the generated tokens of a diet plan. The server
+validates that document strictly and expands it into the verbose DietPlan /
+FoodAnalysisResult dicts the rest of the app uses.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, conlist
+
+MEAL_TYPES = {"b": "breakfast", "l": "lunch", "d": "dinner", "s": "snack"}
+DIFFICULTIES = {"e": "easy", "m": "medium", "h": "hard"}
+# Order of the positional "nd" array.
+DETAIL_FIELDS = ("fiber", "sugar", "sodium", "cholesterol", "saturated_fat", "trans_fat")
+
+# Top-level array keys of a compact plan, mapped to the verbose key they expand to.
+COMPACT_PLAN_ARRAYS = {"m": "meals", "s": "supplements"}
+
+Macros = conlist(float, min_length=3, max_length=3)
+Details = conlist(float, min_length=len(DETAIL_FIELDS), max_length=len(DETAIL_FIELDS))
+
+
+class _Compact(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class CompactMeal(_Compact):
+    n: str = Field(min_length=1)
+    t: str = Field(pattern="^[blds]$")
+    d: str = ""
+    i: List[str] = Field(default_factory=list)
+    k: float = Field(ge=0)
+    mc: Macros
+    p: int = Field(default=0, ge=0)
+    df: str = Field(default="e", pattern="^[emh]$")
+    st: List[str] = Field(default_factory=list)
+    nd: Optional[Details] = None
+    vt: Dict[str, str] = Field(default_factory=dict)
+    mn: Dict[str, str] = Field(default_factory=dict)
+
+
+class CompactSupplement(_Compact):
+    n: str = Field(min_length=1)
+    d: str = ""
+    ds: str = ""
+    tm: str = ""
+    b: List[str] = Field(default_factory=list)
+    pr: Optional[float] = Field(default=None, ge=0)
+
+
+class CompactDietPlan(_Compact):
+    k: float = Field(ge=0)
+    mc: Macros
+    m: List[CompactMeal] = Field(min_length=1)
+    s: List[CompactSupplement] = Field(default_factory=list)
+    r: List[str] = Field(default_factory=list)
+
+
+class CompactFoodAnalysis(_Compact):
+    n: str = Field(min_length=1)
+    c: float = Field(ge=0, le=1)
+    sv: str = Field(min_length=1)
+    k: float = Field(ge=0)
+    mc: Macros
+    nd: Optional[Details] = None
+    vt: Dict[str, str] = Field(default_factory=dict)
+    mn: Dict[str, str] = Field(default_factory=dict)
+    r: List[str] = Field(default_factory=list)
+
+
+DIET_PLAN_FORMAT = """
+    Reply with compact JSON only, using exactly these keys:
+    {"k":2000,"mc":[150,200,67],
+     "m":[{"n":"Protein Breakfast Bowl","t":"b","d":"Greek yogurt with berries","i":["Greek yogurt 200g","Berries 100g"],
+           "k":485,"mc":[38,32,18],"p":5,"df":"e","st":["Add yogurt","Top with berries"],
+           "nd":[8.5,24,95,15,4.2,0],"vt":{"Vitamin C":"45mg"},"mn":{"Calcium":"320mg"}}],
+     "s":[{"n":"Omega-3 Fish Oil","d":"Heart health","ds":"2 capsules daily","tm":"With meals","b":["Heart health"],"pr":29.99}],
+     "r":["Focus on lean proteins"]}
+    k = kcal; mc = [protein g, carbs g, fat g]; t = b|l|d|s (breakfast, lunch, dinner, snack);
+    p = prep minutes; df = e|m|h (easy, medium, hard);
+    nd = [fiber g, sugar g, sodium mg, cholesterol mg, saturated fat g, trans fat g];
+    vt / mn = at most 2 vitamins / minerals. No ids, image URLs or extra keys.
+"""
+
+FOOD_ANALYSIS_FORMAT = """
+    Reply with compact JSON only, using exactly these keys:
+    {"n":"Apple","c":0.95,"sv":"1 medium apple (182g)","k":95,"mc":[0.5,25,0.3],
+     "nd":[4.4,19,2,0,0.1,0],"vt":{"Vitamin C":"14% DV"},"mn":{"Potassium":"6% DV"},
+     "r":["Rich in fiber"]}
+    n = food name; c = confidence 0-1; sv = serving size; k = kcal; mc = [protein g, carbs g, fat g];
+    nd = [fiber g, sugar g, sodium mg, cholesterol mg, saturated fat g, trans fat g];
+    vt / mn = at most 2 vitamins / minerals; r = up to 3 short health insights. No extra keys.
+"""
+
+
+def is_compact_plan(document: Any) -> bool:
+    return isinstance(document, dict) and "mc" in document and "macros" not in document
+
+
+def is_compact_food_analysis(document: Any) -> bool:
+    return isinstance(document, dict) and "mc" in document and "food_name" not in document
+
+
+def _validated(model: type, document: Any) -> Any:
+    try:
+        return model.model_validate(document)
+    except ValidationError as exc:
+        raise ValueError(f"Invalid compact AI response: {exc.error_count()} error(s): {exc.errors()[0]['msg']}")
+
+
+def _macros(values: List[float]) -> Dict[str, float]:
+    return {"protein": round(values[0], 1), "carbs": round(values[1], 1), "fat": round(values[2], 1)}
+
+
+def _details(values: Optional[List[float]], vitamins: Dict[str, str], minerals: Dict[str, str]) -> Dict[str, Any]:
+    details: Dict[str, Any] = {"vitamins": dict(vitamins), "minerals": dict(minerals)}
+    for field, value in zip(DETAIL_FIELDS, values or [0.0] * len(DETAIL_FIELDS)):
+        details[field] = round(value, 1)
+    return details
+
+
+def expand_meal(document: Any, index: int) -> Dict[str, Any]:
+    meal = _validated(CompactMeal, document)
+    return {
+        "id": f"meal-{index + 1}",
+        "name": meal.n,
+        "type": MEAL_TYPES[meal.t],
+        "description": meal.d,
+        "ingredients": meal.i,
+        "calories": int(round(meal.k)),
+        "macros": _macros(meal.mc),
+        "prep_time": meal.p,
+        "difficulty": DIFFICULTIES[meal.df],
+        "instructions": meal.st,
+        "nutrition_details": _details(meal.nd, meal.vt, meal.mn),
+    }
+
+
+def expand_supplement(document: Any, index: int) -> Dict[str, Any]:
+    supplement = _validated(CompactSupplement, document)
+    return {
+        "id": f"supp-{index + 1}",
+        "name": supplement.n,
+        "description": supplement.d,
+        "dosage": supplement.ds,
+        "timing": supplement.tm,
+        "benefits": supplement.b,
+        "price": supplement.pr,
+    }
+
+
+EXPANDERS = {"m": expand_meal, "s": expand_supplement}
+
+
+def expand_diet_plan(document: Any) -> Dict[str, Any]:
+    plan = _validated(CompactDietPlan, document)
+    return {
+        "total_calories": int(round(plan.k)),
+        "macros": _macros(plan.mc),
+        "meals": [expand_meal(meal.model_dump(), i) for i, meal in enumerate(plan.m)],
+        "supplements": [expand_supplement(s.model_dump(), i) for i, s in enumerate(plan.s)],
+        "ai_recommendations": plan.r,
+    }
+
+
+def expand_food_analysis(document: Any) -> Dict[str, Any]:
+    food = _validated(CompactFoodAnalysis, document)
+    return {
+        "food_name": food.n,
+        "confidence": food.c,
+        "serving_size": food.sv,
+        "calories": int(round(food.k)),
+        "macros": _macros(food.mc),
+        "nutrition_details": _details(food.nd, food.vt, food.mn),
+        "ai_insights": food.r,
+    }
@@ -25,3 +25,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_session_factory():
+    """Session factory for work that outlives the request (background jobs)."""
+    return SessionLocal
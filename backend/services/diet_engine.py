@@ -0,0 +1,399 @@
+"""Rule-based diet plan engine: energy targets plus a vectorized meal search.
+
+Builds plans in the same shape as AIService.generate_diet_plan from the
+bundled meal catalog, without calling a provider.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "meal_catalog.json"
+
+# Energy reference for %DV labels; used when the profile is too incomplete for BMR.
+REFERENCE_CALORIES = 2000
+MIN_CALORIES = 1200
+
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very-active": 1.9,
+}
+
+# Share of daily energy from protein / carbs / fat.
+DEFAULT_SPLIT = (0.25, 0.45, 0.30)
+GOAL_SPLITS = {
+    "muscle-building": (0.30, 0.45, 0.25),
+    "weight-loss": (0.35, 0.35, 0.30),
+}
+RESTRICTION_SPLITS = {
+    "keto": (0.25, 0.05, 0.70),
+    "low-carb": (0.30, 0.20, 0.50),
+}
+GOAL_CALORIE_FACTORS = {"muscle-building": 1.10, "weight-loss": 0.80}
+
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.30, "dinner": 0.30, "snack": 0.15}
+# Intermittent fasting: skip breakfast, eat inside a shorter window.
+FASTING_SLOT_SHARES = {"lunch": 0.40, "snack": 0.15, "dinner": 0.45}
+
+# Restrictions a meal must carry as a tag, and restrictions that exclude an allergen.
+TAG_RESTRICTIONS = {"vegetarian", "vegan", "keto", "paleo"}
+STYLE_RESTRICTIONS = {"keto", "paleo"}
+RESTRICTION_ALLERGENS = {"gluten-free": "wheat", "dairy-free": "dairy"}
+PREFERRED_TAGS = {"mediterranean", "low-carb"}
+
+ALLERGEN_ALIASES = {
+    "nut": "nuts",
+    "tree nuts": "nuts",
+    "peanut": "nuts",
+    "peanuts": "nuts",
+    "milk": "dairy",
+    "lactose": "dairy",
+    "egg": "eggs",
+    "gluten": "wheat",
+    "seafood": "shellfish",
+    "shrimp": "shellfish",
+    "soya": "soy",
+}
+
+# Candidate portion sizes for each catalog meal.
+PORTIONS = np.array([0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0], dtype=np.float32)
+# kcal per unit of [calories, protein g, carbs g, fat g]: errors are scored as a share of daily energy.
+ENERGY_PER_UNIT = np.array([1.0, 4.0, 4.0, 9.0], dtype=np.float32)
+# Error weights for calories, protein, carbs, fat.
+TARGET_WEIGHTS = np.array([4.0, 2.0, 1.0, 1.0], dtype=np.float32)
+# Options kept per slot before the combined search (bounds the search to K**slots).
+SLOT_CANDIDATES = 24
+
+
+def _slug(value: Any) -> str:
+    return "-".join(str(value).strip().lower().replace("_", " ").split())
+
+
+def _normalized_allergen(value: Any) -> str:
+    name = str(value).strip().lower()
+    return ALLERGEN_ALIASES.get(name, name)
+
+
+@functools.lru_cache(maxsize=1)
+def load_catalog(path: Optional[str] = None) -> Dict[str, Any]:
+    with open(path or CATALOG_PATH, encoding="utf-8") as fh:
+        catalog = json.load(fh)
+    meals = catalog["meals"]
+    # Per-serving [calories, protein, carbs, fat], one row per catalog meal.
+    catalog["nutrients"] = np.array(
+        [
+            [m["calories"], m["macros"]["protein"], m["macros"]["carbs"], m["macros"]["fat"]]
+            for m in meals
+        ],
+        dtype=np.float32,
+    )
+    return catalog
+
+
+def goal_keys(goals: Sequence[Dict[str, Any]]) -> Set[str]:
+    keys = set()
+    for goal in goals:
+        keys.add(_slug(goal.get("type") or ""))
+        text = f"{goal.get('title') or ''} {goal.get('description') or ''}".lower()
+        if any(phrase in text for phrase in ("weight loss", "lose weight", "fat loss", "lose fat")):
+            keys.add("weight-loss")
+    keys.discard("")
+    return keys
+
+
+def energy_targets(
+    user_data: Dict[str, Any],
+    goals: Sequence[Dict[str, Any]],
+    calories: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Daily calorie and macro targets (Mifflin-St Jeor BMR x activity factor, goal-adjusted).
+
+    A fixed ``calories`` target skips the estimate and only derives the macro split.
+    """
+    activity = _slug(user_data.get("activity_level") or "moderate")
+    factor = ACTIVITY_FACTORS.get(activity, ACTIVITY_FACTORS["moderate"])
+    try:
+        weight = float(user_data["weight"])
+        height = float(user_data["height"])
+        age = float(user_data["age"])
+    except (KeyError, TypeError, ValueError):
+        bmr = None
+        tdee = float(REFERENCE_CALORIES)
+    else:
+        gender = str(user_data.get("gender") or "").lower()
+        offset = {"male": 5.0, "female": -161.0}.get(gender, -78.0)
+        bmr = 10 * weight + 6.25 * height - 5 * age + offset
+        tdee = bmr * factor
+
+    user_goals = goal_keys(goals)
+    restrictions = {_slug(r) for r in user_data.get("dietary_restrictions") or []}
+    if calories is None:
+        calories = tdee
+        for key, adjustment in GOAL_CALORIE_FACTORS.items():
+            if key in user_goals:
+                calories *= adjustment
+        calories = max(MIN_CALORIES, int(round(calories / 10.0)) * 10)
+
+    split = DEFAULT_SPLIT
+    for key, goal_split in GOAL_SPLITS.items():
+        if key in user_goals:
+            split = goal_split
+    for key, restriction_split in RESTRICTION_SPLITS.items():
+        if key in restrictions:
+            split = restriction_split
+            break
+
+    protein_share, carb_share, fat_share = split
+    return {
+        "bmr": round(bmr) if bmr is not None else None,
+        "tdee": round(tdee),
+        "activity_factor": factor,
+        "calories": calories,
+        "macros": {
+            "protein": round(calories * protein_share / 4),
+            "carbs": round(calories * carb_share / 4),
+            "fat": round(calories * fat_share / 9),
+        },
+    }
+
+
+def _meal_allowed(
+    item: Dict[str, Any],
+    required_tags: Set[str],
+    excluded_allergens: Set[str],
+    allergy_words: Set[str],
+) -> bool:
+    if not required_tags.issubset(item.get("tags") or []):
+        return False
+    if excluded_allergens.intersection(item.get("allergens") or []):
+        return False
+    # Free-text allergies the catalog has no code for still rule out matching ingredients.
+    ingredients = " ".join(item.get("ingredients") or []).lower()
+    return not any(word in ingredients for word in allergy_words)
+
+
+def _exclusions(user_data: Dict[str, Any]) -> Tuple[Set[str], Set[str], Set[str]]:
+    restrictions = {_slug(r) for r in user_data.get("dietary_restrictions") or []}
+    required_tags = restrictions & TAG_RESTRICTIONS
+    excluded = {RESTRICTION_ALLERGENS[r] for r in restrictions if r in RESTRICTION_ALLERGENS}
+    allergy_words = set()
+    for allergy in user_data.get("allergies") or []:
+        if not str(allergy).strip():
+            continue
+        excluded.add(_normalized_allergen(allergy))
+        allergy_words.add(str(allergy).strip().lower())
+    return required_tags, excluded, allergy_words
+
+
+def _combine(options: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Every way to pick one row from each array: (summed rows, row index per array)."""
+    totals = np.zeros((1, 4), dtype=np.float32)
+    picks = np.zeros((1, 0), dtype=np.int64)
+    for vectors in options:
+        count = len(vectors)
+        totals = (totals[:, None, :] + vectors[None, :, :]).reshape(-1, 4)
+        picks = np.concatenate(
+            [np.repeat(picks, count, axis=0), np.tile(np.arange(count), len(picks))[:, None]],
+            axis=1,
+        )
+    return totals, picks
+
+
+def _energy_scale(target: np.ndarray) -> np.ndarray:
+    return ENERGY_PER_UNIT / max(float(target[0]), 1.0)
+
+
+def _search(slot_options: List[np.ndarray], target: np.ndarray) -> List[int]:
+    """Index into each slot's options minimizing the weighted squared error against ``target``.
+
+    Meet-in-the-middle: enumerate each half of the slots, then score every
+    (left, right) pair at once. With d = left - target, the weighted error
+    |d + right|^2 expands to |d|^2 + |right|^2 + 2 d.right, so the pairwise
+    term is a single matrix product.
+    """
+    scale = _energy_scale(target)
+    scaled = [options * scale for options in slot_options]
+    middle = len(scaled) // 2
+    left, left_picks = _combine(scaled[:middle])
+    right, right_picks = _combine(scaled[middle:])
+    left = left - target * scale
+    score = (
+        ((left * left) @ TARGET_WEIGHTS)[:, None]
+        + ((right * right) @ TARGET_WEIGHTS)[None, :]
+        + 2.0 * (left * TARGET_WEIGHTS) @ right.T
+    )
+    best_left, best_right = np.unravel_index(int(np.argmin(score)), score.shape)
+    return [*left_picks[best_left].tolist(), *right_picks[best_right].tolist()]
+
+
+def _slot_options(
+    indices: np.ndarray,
+    nutrients: np.ndarray,
+    slot_target: np.ndarray,
+    bonus: np.ndarray,
+    candidates: int = SLOT_CANDIDATES,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(meal index, portion, nutrient row) for each meal x portion, pruned to the closest ones."""
+    meal_idx = np.repeat(indices, len(PORTIONS))
+    portions = np.tile(PORTIONS, len(indices))
+    vectors = nutrients[meal_idx] * portions[:, None]
+    error = (vectors - slot_target) * _energy_scale(slot_target)
+    score = (error * error) @ TARGET_WEIGHTS - bonus[meal_idx]
+    if len(score) > candidates:
+        keep = np.argpartition(score, candidates)[:candidates]
+        meal_idx, portions, vectors = meal_idx[keep], portions[keep], vectors[keep]
+    return meal_idx, portions, vectors
+
+
+def _plan_meal(item: Dict[str, Any], portion: float) -> Dict[str, Any]:
+    meal = {k: v for k, v in item.items() if k not in ("tags", "allergens")}
+    meal["servings"] = float(portion)
+    meal["calories"] = int(round(item["calories"] * portion))
+    meal["macros"] = {k: int(round(v * portion)) for k, v in item["macros"].items()}
+    meal["nutrition_details"] = {
+        k: round(v * portion, 1) if isinstance(v, (int, float)) else v
+        for k, v in (item.get("nutrition_details") or {}).items()
+    }
+    return meal
+
+
+def catalog_meal(meal_id: str, portion: float, catalog: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """A catalog meal scaled to ``portion`` servings, as it appears in a plan."""
+    catalog = catalog or load_catalog()
+    item = next((m for m in catalog["meals"] if m["id"] == meal_id), None)
+    if item is None:
+        raise KeyError(f"Unknown catalog meal: {meal_id}")
+    return _plan_meal(item, portion)
+
+
+def _public_supplement(supplement: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in supplement.items() if k not in ("goals", "restrictions", "tags", "allergens", "default")}
+
+
+def catalog_supplement(supplement_id: str, catalog: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    catalog = catalog or load_catalog()
+    item = next((s for s in catalog.get("supplements") or [] if s["id"] == supplement_id), None)
+    if item is None:
+        raise KeyError(f"Unknown catalog supplement: {supplement_id}")
+    return _public_supplement(item)
+
+
+def _pick_supplements(
+    catalog: Dict[str, Any],
+    user_goals: Set[str],
+    user_data: Dict[str, Any],
+    limit: int = 3,
+) -> List[Dict[str, Any]]:
+    restrictions = {_slug(r) for r in user_data.get("dietary_restrictions") or []}
+    required_tags = restrictions & {"vegetarian", "vegan"}
+    _, excluded, _ = _exclusions(user_data)
+    scored = []
+    for order, supplement in enumerate(catalog.get("supplements") or []):
+        if not _meal_allowed(supplement, required_tags, excluded, set()):
+            continue
+        score = 2 * len(user_goals.intersection(supplement.get("goals") or []))
+        score += 2 * len(restrictions.intersection(supplement.get("restrictions") or []))
+        score += 1 if supplement.get("default") else 0
+        if score:
+            scored.append((-score, order, supplement))
+    scored.sort(key=lambda row: row[:2])
+    return [_public_supplement(supplement) for _, _, supplement in scored[:limit]]
+
+
+def build_local_plan(
+    user_data: Dict[str, Any],
+    goals: List[Dict[str, Any]],
+    catalog: Optional[Dict[str, Any]] = None,
+    *,
+    calories: Optional[int] = None,
+    slot_candidates: int = SLOT_CANDIDATES,
+) -> Dict[str, Any]:
+    """Personalized plan from the bundled catalog, shaped like an AI-generated plan.
+
+    ``calories`` pins the daily target; a larger ``slot_candidates`` searches
+    more combinations (offline template builds can afford it).
+    """
+    catalog = catalog or load_catalog()
+    meals = catalog["meals"]
+    nutrients = catalog["nutrients"]
+    targets = energy_targets(user_data, goals, calories)
+    user_goals = goal_keys(goals)
+    restrictions = {_slug(r) for r in user_data.get("dietary_restrictions") or []}
+    required_tags, excluded, allergy_words = _exclusions(user_data)
+
+    shares = FASTING_SLOT_SHARES if "intermittent-fasting" in restrictions else SLOT_SHARES
+    bonus = np.array(
+        [0.05 * len(PREFERRED_TAGS.intersection(restrictions, m.get("tags") or [])) for m in meals],
+        dtype=np.float32,
+    )
+    day_target = np.array(
+        [targets["calories"], *(targets["macros"][k] for k in ("protein", "carbs", "fat"))],
+        dtype=np.float32,
+    )
+
+    notes: List[str] = []
+    slots: List[Tuple[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = []
+    for slot in shares:
+        allowed = [
+            i for i, m in enumerate(meals)
+            if m["type"] == slot and _meal_allowed(m, required_tags, excluded, allergy_words)
+        ]
+        if not allowed and required_tags & STYLE_RESTRICTIONS:
+            # Keep allergy and vegetarian/vegan rules; relax keto/paleo before dropping the slot.
+            relaxed = required_tags - STYLE_RESTRICTIONS
+            allowed = [
+                i for i, m in enumerate(meals)
+                if m["type"] == slot and _meal_allowed(m, relaxed, excluded, allergy_words)
+            ]
+            if allowed:
+                notes.append(f"No {slot} in the catalog matches every restriction; picked the closest fit")
+        if not allowed:
+            notes.append(f"No {slot} option fits your allergies and restrictions")
+            continue
+        slot_target = day_target * shares[slot]
+        slots.append((slot, _slot_options(np.array(allowed), nutrients, slot_target, bonus, slot_candidates)))
+
+    plan_meals: List[Dict[str, Any]] = []
+    if slots:
+        covered = sum(shares[slot] for slot, _ in slots)
+        picks = _search([vectors for _, (_, _, vectors) in slots], day_target * covered)
+        for (slot, (meal_idx, portions, _)), pick in zip(slots, picks):
+            plan_meals.append(_plan_meal(meals[int(meal_idx[pick])], portions[pick]))
+
+    planned_calories = sum(m["calories"] for m in plan_meals)
+    planned_protein = sum(m["macros"]["protein"] for m in plan_meals)
+    recommendations = [
+        f"Daily target: {targets['calories']} kcal "
+        + (
+            f"(BMR {targets['bmr']} kcal x activity factor {targets['activity_factor']})"
+            if targets["bmr"] is not None
+            else "(add age, height and weight to your profile for a personal estimate)"
+        ),
+        f"Planned meals provide {planned_calories} kcal and {planned_protein}g protein",
+        f"Plan tailored for: {', '.join(g.get('title') or g.get('type') or 'goal' for g in goals) or 'general wellness'}",
+        *notes,
+    ]
+
+    return {
+        "total_calories": targets["calories"],
+        "macros": targets["macros"],
+        "meals": plan_meals,
+        "supplements": _pick_supplements(catalog, user_goals, user_data),
+        "ai_recommendations": recommendations,
+        "energy": {k: targets[k] for k in ("bmr", "tdee", "activity_factor")},
+        "engine": "local",
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "user_id": user_data.get("id"),
+        "goals": goals,
+    }
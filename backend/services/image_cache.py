@@ -0,0 +1,120 @@
+"""Exact and near-duplicate cache for food image analysis results."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from services.cache_service import ResponseCache
+from services.image_processing import ImageFingerprint
+from services.metrics_service import CACHE_REQUESTS
+
+DHASH_BITS = 64
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _band_masks(max_distance: int) -> List[Tuple[int, int]]:
+    """(shift, mask) for ``max_distance + 1`` bands covering the 64 dHash bits.
+
+    Two hashes within ``max_distance`` bits of each other differ in at most that
+    many bands, so at least one band matches exactly (pigeonhole).
+    """
+    bands = min(DHASH_BITS, max_distance + 1)
+    masks = []
+    start = 0
+    for band in range(bands):
+        width = DHASH_BITS // bands + (band < DHASH_BITS % bands)
+        masks.append((start, (1 << width) - 1))
+        start += width
+    return masks
+
+
+class ImageAnalysisCache:
+    """Answers byte-identical uploads by SHA-256 and look-alikes by dHash distance."""
+
+    def __init__(self, *, max_entries: int, ttl_seconds: int, max_distance: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.results = ResponseCache("food_image", max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._hashes: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._bands = _band_masks(max_distance) if max_distance >= 0 else []
+        # One map per band: band value -> SHA-256s of stored hashes with that value.
+        self._index: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+
+    def _band_keys(self, dhash: int) -> List[int]:
+        return [(dhash >> shift) & mask for shift, mask in self._bands]
+
+    def _forget(self, sha: str) -> None:
+        _, dhash = self._hashes.pop(sha)
+        for bucket, key in zip(self._index, self._band_keys(dhash)):
+            shas = bucket.get(key)
+            if shas is not None:
+                shas.discard(sha)
+                if not shas:
+                    del bucket[key]
+
+    def _nearest(self, dhash: int) -> Optional[str]:
+        now = time.monotonic()
+        best: Optional[Tuple[int, str]] = None
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._index, self._band_keys(dhash)):
+                candidates.update(bucket.get(key, ()))
+            for sha in candidates:
+                expires_at, candidate = self._hashes[sha]
+                if expires_at < now:
+                    self._forget(sha)
+                    continue
+                distance = hamming_distance(dhash, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, sha)
+        return best[1] if best else None
+
+    def lookup(self, fingerprint: ImageFingerprint) -> Optional[Dict[str, Any]]:
+        result, tier = self.results.fetch(fingerprint.sha256)
+        if result is not None:
+            CACHE_REQUESTS.labels(self.results.name, f"hit_{tier}").inc()
+            return result
+        if self.max_distance >= 0:
+            neighbour = self._nearest(fingerprint.dhash)
+            if neighbour is not None:
+                result, _ = self.results.fetch(neighbour)
+                if result is not None:
+                    CACHE_REQUESTS.labels(self.results.name, "hit_near").inc()
+                    return result
+        CACHE_REQUESTS.labels(self.results.name, "miss").inc()
+        return None
+
+    def store(self, fingerprint: ImageFingerprint, result: Dict[str, Any]) -> None:
+        self.results.set(fingerprint.sha256, result)
+        if self.max_distance < 0:
+            return
+        with self._lock:
+            if fingerprint.sha256 in self._hashes:
+                self._forget(fingerprint.sha256)
+            self._hashes[fingerprint.sha256] = (time.monotonic() + self.ttl_seconds, fingerprint.dhash)
+            for bucket, key in zip(self._index, self._band_keys(fingerprint.dhash)):
+                bucket.setdefault(key, set()).add(fingerprint.sha256)
+            while len(self._hashes) > self.max_entries:
+                self._forget(next(iter(self._hashes)))
+
+    def clear(self) -> None:
+        self.results.clear()
+        with self._lock:
+            self._hashes.clear()
+            for bucket in self._index:
+                bucket.clear()
+
+
+image_analysis_cache = ImageAnalysisCache(
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.IMAGE_CACHE_TTL_SECONDS,
+    max_distance=settings.IMAGE_CACHE_MAX_HAMMING_DISTANCE,
+)
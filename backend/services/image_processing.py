@@ -0,0 +1,114 @@
+"""CPU-bound image work (decode, downscale, re-encode, hashing) off the event loop.
+
+The module-level functions here are pure so they can run in a worker process;
+they must not depend on app settings or other services.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import io
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DHASH_SIZE = 8
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    sha256: str
+    dhash: int
+
+
+def difference_hash(image: Image.Image, size: int = DHASH_SIZE) -> int:
+    """64-bit dHash: compares horizontally adjacent pixels of a tiny grayscale copy."""
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def fingerprint_image(image_data: bytes, sha256: Optional[str] = None) -> ImageFingerprint:
+    """SHA-256 of the upload (``sha256`` if already known) plus a perceptual hash of the upright image."""
+    digest = sha256 or hashlib.sha256(image_data).hexdigest()
+    image = Image.open(io.BytesIO(image_data))
+    # JPEG draft mode decodes at a reduced scale, which is all a 9x8 hash needs.
+    image.draft("L", (64, 64))
+    image = ImageOps.exif_transpose(image)
+    return ImageFingerprint(sha256=digest, dhash=difference_hash(image))
+
+
+def encode_for_vision(image_data: bytes, max_side: int = 1024, quality: int = 85) -> bytes:
+    """Decode, fix EXIF orientation, downscale to ``max_side`` and re-encode as compact JPEG."""
+    image = Image.open(io.BytesIO(image_data))
+    # For JPEGs, let libjpeg decode at the smallest 1/2^n scale still >= max_side.
+    image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size[0] > max_side or image.size[1] > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ImageProcessor:
+    """Runs image functions on a process pool (or a thread when ``workers`` is 0)."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+
+    def _pool(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``func`` off the loop; a pool broken by a dead worker is replaced and the call retried once."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        for attempt in range(2):
+            pool = self._pool()
+            try:
+                return await loop.run_in_executor(pool, call)
+            except BrokenProcessPool:
+                self._discard(pool)
+                if attempt:
+                    raise
+                logger.warning("Image worker process died; restarting the pool and retrying")
+
+    def _discard(self, pool: Optional[Executor]) -> None:
+        # Concurrent callers all see the same broken pool; only the first replaces it.
+        if pool is not None and pool is self._executor:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _build_processor() -> ImageProcessor:
+    from config import settings
+
+    return ImageProcessor(settings.IMAGE_PROCESS_WORKERS)
+
+
+image_processor = _build_processor()
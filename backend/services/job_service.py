@@ -0,0 +1,176 @@
+"""Bounded in-process background jobs with optional Redis-shared status."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.rate_limit import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+SHUTDOWN_ERROR = "Server shutting down"
+
+
+class JobQueueFull(Exception):
+    """Raised when the pending job limit is reached."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobManager:
+    """Runs at most ``max_workers`` jobs concurrently and admits at most ``max_pending``.
+
+    Job records live in memory and are mirrored to Redis when REDIS_URL is set,
+    so any API worker can answer status polls.
+    """
+
+    def __init__(self, *, max_workers: int, max_pending: int, ttl_seconds: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._expires: Dict[str, float] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _redis_key(job_id: str) -> str:
+        return f"vitalplan:job:{job_id}"
+
+    def pending_count(self) -> int:
+        return len(self._tasks)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for job_id, expires_at in list(self._expires.items()):
+            if expires_at < now:
+                self._expires.pop(job_id, None)
+                self._jobs.pop(job_id, None)
+                self._done.pop(job_id, None)
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        self._jobs[record["id"]] = record
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            redis_client.set(
+                self._redis_key(record["id"]),
+                json.dumps(record, default=str),
+                ex=self.ttl_seconds,
+            )
+        except Exception as exc:
+            logger.warning("Redis job status write failed (%s)", exc)
+
+    def submit(
+        self,
+        kind: str,
+        user_id: int,
+        work: Callable[[], Awaitable[Any]],
+    ) -> Dict[str, Any]:
+        """Queue ``work`` and return the job record immediately."""
+        self._prune()
+        if self.pending_count() >= self.max_pending:
+            raise JobQueueFull(f"{self.pending_count()} jobs pending")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        record = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "user_id": user_id,
+            "status": "queued",
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self._save(record)
+        self._done[record["id"]] = asyncio.Event()
+        task = asyncio.create_task(self._run(record, work))
+        self._tasks[record["id"]] = task
+        return dict(record)
+
+    async def _run(self, record: Dict[str, Any], work: Callable[[], Awaitable[Any]]) -> None:
+        job_id = record["id"]
+        try:
+            async with self._semaphore:
+                self._save({**record, "status": "running", "started_at": _now()})
+                record = self._jobs[job_id]
+                try:
+                    result = await work()
+                except Exception as exc:
+                    logger.exception("Job %s (%s) failed", job_id, record["kind"])
+                    self._save({**record, "status": "failed", "error": str(exc), "finished_at": _now()})
+                else:
+                    self._save({**record, "status": "succeeded", "result": result, "finished_at": _now()})
+        except asyncio.CancelledError:
+            # Only aclose() cancels jobs; don't leave pollers (or the Redis copy) waiting on a dead job.
+            current = self._jobs.get(job_id, record)
+            self._save({**current, "status": "failed", "error": SHUTDOWN_ERROR, "finished_at": _now()})
+            raise
+        finally:
+            self._tasks.pop(job_id, None)
+            self._expires[job_id] = time.monotonic() + self.ttl_seconds
+            event = self._done.get(job_id)
+            if event is not None:
+                event.set()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        record = self._jobs.get(job_id)
+        if record is not None:
+            return dict(record)
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return None
+        try:
+            raw = redis_client.get(self._redis_key(job_id))
+        except Exception as exc:
+            logger.warning("Redis job status read failed (%s)", exc)
+            return None
+        return json.loads(raw) if raw else None
+
+    async def wait(self, job_id: str, timeout: float, poll_interval: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Return the record once terminal (or the latest record on timeout)."""
+        event = self._done.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.get(job_id)
+
+        # Job owned by another worker: poll the shared record.
+        deadline = time.monotonic() + timeout
+        record = self.get(job_id)
+        while record and record["status"] not in TERMINAL_STATUSES and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+            record = self.get(job_id)
+        return record
+
+    async def aclose(self) -> None:
+        """Cancel queued and running jobs, which are recorded as failed (app shutdown)."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._semaphore = None
+
+
+job_manager = JobManager(
+    max_workers=settings.AI_JOB_WORKERS,
+    max_pending=settings.AI_JOB_MAX_PENDING,
+    ttl_seconds=settings.AI_JOB_TTL_SECONDS,
+)
@@ -5,7 +5,7 @@ import time
 from typing import Callable
 
 from fastapi import Request, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 from starlette.middleware.base import BaseHTTPMiddleware
 
 REQUEST_COUNT = Counter(
@@ -19,6 +19,81 @@ REQUEST_LATENCY = Histogram(
     ["method", "path"],
     buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
 )
+CACHE_REQUESTS = Counter(
+    "vitalplan_cache_requests_total",
+    "Response cache lookups by tier outcome",
+    ["cache", "result"],
+)
+
+AI_COALESCED_REQUESTS = Counter(
+    "vitalplan_ai_coalesced_requests_total",
+    "AI requests answered by an identical in-flight request",
+    ["name", "source"],
+)
+AI_CIRCUIT_STATE = Gauge(
+    "vitalplan_ai_circuit_state",
+    "AI provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["provider"],
+)
+AI_BULKHEAD_IN_FLIGHT = Gauge(
+    "vitalplan_ai_bulkhead_in_flight",
+    "AI provider calls currently in flight",
+    ["provider"],
+)
+AI_BULKHEAD_QUEUED = Gauge(
+    "vitalplan_ai_bulkhead_queued",
+    "AI provider calls waiting for a bulkhead slot",
+    ["provider"],
+)
+AI_CALLS_REJECTED = Counter(
+    "vitalplan_ai_calls_rejected_total",
+    "AI provider calls shed locally",
+    ["provider", "reason"],
+)
+
+AI_CALLS = Counter(
+    "vitalplan_ai_calls_total",
+    "AI task outcomes (provider call ok/error, cache hit, demo fallback)",
+    ["provider", "task", "outcome"],
+)
+AI_CALL_LATENCY = Histogram(
+    "vitalplan_ai_call_duration_seconds",
+    "AI provider call latency in seconds",
+    ["provider", "model", "task"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+AI_TOKENS = Counter(
+    "vitalplan_ai_tokens_total",
+    "Tokens reported by AI providers",
+    ["provider", "model", "task", "kind"],
+)
+
+AI_REQUESTS_ABANDONED = Counter(
+    "vitalplan_ai_requests_abandoned_total",
+    "AI work cancelled because the client disconnected",
+    ["task"],
+)
+
+AI_SCHEDULER_IN_FLIGHT = Gauge(
+    "vitalplan_ai_scheduler_in_flight",
+    "AI requests holding a global scheduler slot",
+)
+AI_SCHEDULER_QUEUED = Gauge(
+    "vitalplan_ai_scheduler_queued",
+    "AI requests waiting for a global scheduler slot",
+    ["priority"],
+)
+AI_SCHEDULER_WAIT = Histogram(
+    "vitalplan_ai_scheduler_wait_seconds",
+    "Time AI requests waited for a global scheduler slot",
+    ["priority"],
+    buckets=(0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+AI_SCHEDULER_SHED = Counter(
+    "vitalplan_ai_scheduler_shed_total",
+    "AI requests refused by the global scheduler",
+    ["priority", "reason"],
+)
 
 
 def _normalize_path(path: str) -> str:
@@ -0,0 +1,84 @@
+"""Per-task model profiles: which model, token budget, temperature and timeout each AI task uses.
+
+Profiles are read from settings (AI_<TASK>_MODEL / _MAX_TOKENS / _TEMPERATURE /
+_TIMEOUT_SECONDS) on every call, and any field can be overridden per request
+through the service method's ``model`` / ``max_tokens`` / ``temperature`` /
+``timeout`` keyword arguments.
+
+A model setting is a comma-separated ``provider:model`` list, e.g.
+``groq:llama-3.1-8b-instant,openai:gpt-4o-mini``, optionally with one bare
+name that takes precedence for the preferred provider. Providers without an
+entry use their default model.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional
+
+from config import settings
+from models.ai_provider import AIProvider
+
+INSIGHTS = "insights"
+FOOD_VISION = "food_vision"
+DIET_PLAN = "diet_plan"
+
+# Settings prefix for each task.
+TASK_SETTINGS = {
+    INSIGHTS: "AI_INSIGHTS",
+    FOOD_VISION: "AI_VISION",
+    DIET_PLAN: "AI_PLAN",
+}
+
+
+def parse_model_setting(value: str) -> Dict[Optional[str], str]:
+    """``{provider value or None: model}``; the None entry is a bare model name."""
+    models: Dict[Optional[str], str] = {}
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        provider, sep, model = entry.partition(":")
+        if sep and provider.strip() in {p.value for p in AIProvider}:
+            models[provider.strip()] = model.strip()
+        else:
+            models[None] = entry
+    return models
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    task: str
+    max_tokens: int
+    temperature: float
+    timeout_seconds: Optional[float] = None
+    models: Dict[Optional[str], str] = field(default_factory=dict)
+
+    def model_for(self, provider: AIProvider, preferred: AIProvider) -> Optional[str]:
+        """Model to request from ``provider``; None means that provider's default model."""
+        if provider == preferred and None in self.models:
+            return self.models[None]
+        return self.models.get(provider.value)
+
+    def with_overrides(self, **kwargs: Any) -> "ModelProfile":
+        changes: Dict[str, Any] = {}
+        if kwargs.get("model"):
+            changes["models"] = {**self.models, **parse_model_setting(kwargs["model"])}
+        if kwargs.get("max_tokens") is not None:
+            changes["max_tokens"] = int(kwargs["max_tokens"])
+        if kwargs.get("temperature") is not None:
+            changes["temperature"] = float(kwargs["temperature"])
+        if kwargs.get("timeout") is not None:
+            changes["timeout_seconds"] = float(kwargs["timeout"])
+        return replace(self, **changes) if changes else self
+
+
+def model_profile(task: str, **overrides: Any) -> ModelProfile:
+    prefix = TASK_SETTINGS[task]
+    profile = ModelProfile(
+        task=task,
+        max_tokens=getattr(settings, f"{prefix}_MAX_TOKENS"),
+        temperature=getattr(settings, f"{prefix}_TEMPERATURE"),
+        timeout_seconds=getattr(settings, f"{prefix}_TIMEOUT_SECONDS") or None,
+        models=parse_model_setting(getattr(settings, f"{prefix}_MODEL")),
+    )
+    return profile.with_overrides(**overrides)
@@ -0,0 +1,113 @@
+"""Rule-based nutrition insights driven by data/nutrition_rules.json.
+
+Each rule tests one nutrient against absolute (``min``/``max``) or %DV
+(``min_dv``/``max_dv``) bounds; ``min`` bounds are inclusive, ``max`` bounds
+exclusive. Fired rules are ranked by ``weight`` times the largest multiplier
+among the user's goals.
+"""
+from __future__ import annotations
+
+import functools
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from services.diet_engine import goal_keys
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "data" / "nutrition_rules.json"
+
+DEFAULT_INSIGHTS = [
+    "Include a variety of colorful vegetables",
+    "Balance protein, carbs, and healthy fats",
+]
+
+
+@functools.lru_cache(maxsize=1)
+def load_rules(path: Optional[str] = None) -> Dict[str, Any]:
+    with open(path or RULES_PATH, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return None if value is None or value == "" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def nutrient_values(nutrition: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten a FoodAnalysisResult-shaped dict into {nutrient: amount}; unknown values are omitted."""
+    macros = nutrition.get("macros") or {}
+    details = nutrition.get("nutrition_details") or {}
+    candidates = {
+        "calories": nutrition.get("calories"),
+        "protein": macros.get("protein"),
+        "carbs": macros.get("carbs"),
+        "fat": macros.get("fat"),
+        **{
+            key: details.get(key)
+            for key in ("fiber", "sugar", "sodium", "cholesterol", "saturated_fat", "trans_fat")
+        },
+    }
+    return {key: number for key, value in candidates.items() if (number := _number(value)) is not None}
+
+
+def percent_daily_values(nutrition: Dict[str, Any], rules: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    daily_values = (rules or load_rules())["daily_values"]
+    return {
+        key: int(round(value / daily_values[key] * 100))
+        for key, value in nutrient_values(nutrition).items()
+        if daily_values.get(key)
+    }
+
+
+def _fires(rule: Dict[str, Any], value: float, dv: Optional[float]) -> bool:
+    if "min" in rule and value < rule["min"]:
+        return False
+    if "max" in rule and value >= rule["max"]:
+        return False
+    if "min_dv" in rule or "max_dv" in rule:
+        if dv is None:
+            return False
+        if "min_dv" in rule and dv < rule["min_dv"]:
+            return False
+        if "max_dv" in rule and dv >= rule["max_dv"]:
+            return False
+    return True
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.1f}"
+
+
+def nutrition_insights(
+    nutrition: Dict[str, Any],
+    goals: Optional[Sequence[Dict[str, Any]]] = None,
+    *,
+    extra: Optional[Iterable[str]] = None,
+    limit: int = 4,
+    rules: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """Fired rule messages, most relevant to ``goals`` first, followed by any new ``extra`` lines."""
+    rules = rules or load_rules()
+    daily_values = rules["daily_values"]
+    values = nutrient_values(nutrition)
+    user_goals = goal_keys(goals or [])
+
+    fired = []
+    for order, rule in enumerate(rules["rules"]):
+        value = values.get(rule["nutrient"])
+        if value is None:
+            continue
+        dv = value / daily_values[rule["nutrient"]] * 100 if daily_values.get(rule["nutrient"]) else None
+        if not _fires(rule, value, dv):
+            continue
+        multiplier = max((rule.get("goals") or {}).get(goal, 1.0) for goal in user_goals) if user_goals else 1.0
+        message = rule["message"].format(value=_format_value(value), dv=int(round(dv or 0)))
+        fired.append((-rule.get("weight", 1.0) * multiplier, order, message))
+
+    insights = [message for _, _, message in sorted(fired)]
+    for line in extra or []:
+        if line and line not in insights:
+            insights.append(line)
+    return insights[:limit]
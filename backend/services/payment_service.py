@@ -9,9 +9,8 @@ import time
 import uuid
 from typing import Any, Dict, Optional, Tuple
 
-import httpx
-
 from config import settings
+from utils.http_clients import STRIPE, outbound_clients
 
 logger = logging.getLogger(__name__)
 
@@ -108,34 +107,37 @@ async def create_payment_intent(
             "status": "requires_confirmation",
         }
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.post(
-            "https://api.stripe.com/v1/payment_intents",
-            data={
-                "amount": str(amount_cents),
-                "currency": currency,
-                "automatic_payment_methods[enabled]": "true",
-                "receipt_email": customer_email,
-                "metadata[order_id]": str(order_id),
-                "metadata[email]": customer_email,
-                **{f"metadata[{k}]": v for k, v in (metadata or {}).items()},
-            },
-            auth=(settings.STRIPE_SECRET_KEY, ""),
-        )
-        if response.status_code >= 400:
-            logger.error("Stripe PaymentIntent failed: %s", response.text)
-            raise RuntimeError("Unable to create Stripe payment")
-
-        payload = response.json()
-        return {
-            "provider": "stripe",
-            "payment_intent_id": payload["id"],
-            "client_secret": payload["client_secret"],
-            "amount": amount,
+    response = await outbound_clients.request(
+        STRIPE,
+        "POST",
+        "/v1/payment_intents",
+        data={
+            "amount": str(amount_cents),
             "currency": currency,
-            "status": payload.get("status", "requires_payment_method"),
-            "publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
-        }
+            "automatic_payment_methods[enabled]": "true",
+            "receipt_email": customer_email,
+            "metadata[order_id]": str(order_id),
+            "metadata[email]": customer_email,
+            **{f"metadata[{k}]": v for k, v in (metadata or {}).items()},
+        },
+        auth=(settings.STRIPE_SECRET_KEY, ""),
+        # Lets retries of this call reuse the intent Stripe may already have created.
+        headers={"Idempotency-Key": f"order-{order_id}-{uuid.uuid4().hex}"},
+    )
+    if response.status_code >= 400:
+        logger.error("Stripe PaymentIntent failed: %s", response.text)
+        raise RuntimeError("Unable to create Stripe payment")
+
+    payload = response.json()
+    return {
+        "provider": "stripe",
+        "payment_intent_id": payload["id"],
+        "client_secret": payload["client_secret"],
+        "amount": amount,
+        "currency": currency,
+        "status": payload.get("status", "requires_payment_method"),
+        "publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
+    }
 
 
 async def confirm_payment(payment_intent_id: str) -> Dict[str, Any]:
@@ -154,25 +156,26 @@ async def confirm_payment(payment_intent_id: str) -> Dict[str, Any]:
     if not payments_enabled():
         raise RuntimeError("Stripe is not configured")
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.get(
-            f"https://api.stripe.com/v1/payment_intents/{payment_intent_id}",
-            auth=(settings.STRIPE_SECRET_KEY, ""),
-        )
-        if response.status_code >= 400:
-            logger.error("Stripe retrieve failed: %s", response.text)
-            raise RuntimeError("Unable to confirm Stripe payment")
-
-        payload = response.json()
-        status = payload.get("status")
-        if status not in {"succeeded", "processing"}:
-            raise RuntimeError(f"Payment not completed (status={status})")
+    response = await outbound_clients.request(
+        STRIPE,
+        "GET",
+        f"/v1/payment_intents/{payment_intent_id}",
+        auth=(settings.STRIPE_SECRET_KEY, ""),
+    )
+    if response.status_code >= 400:
+        logger.error("Stripe retrieve failed: %s", response.text)
+        raise RuntimeError("Unable to confirm Stripe payment")
+
+    payload = response.json()
+    status = payload.get("status")
+    if status not in {"succeeded", "processing"}:
+        raise RuntimeError(f"Payment not completed (status={status})")
 
-        return {
-            "provider": "stripe",
-            "payment_intent_id": payment_intent_id,
-            "status": status,
-        }
+    return {
+        "provider": "stripe",
+        "payment_intent_id": payment_intent_id,
+        "status": status,
+    }
 
 
 async def cancel_payment_intent(payment_intent_id: str) -> None:
@@ -182,18 +185,21 @@ async def cancel_payment_intent(payment_intent_id: str) -> None:
     if not payments_enabled():
         return
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.post(
-            f"https://api.stripe.com/v1/payment_intents/{payment_intent_id}/cancel",
-            auth=(settings.STRIPE_SECRET_KEY, ""),
+    response = await outbound_clients.request(
+        STRIPE,
+        "POST",
+        f"/v1/payment_intents/{payment_intent_id}/cancel",
+        auth=(settings.STRIPE_SECRET_KEY, ""),
+        # Cancelling twice is harmless; the key makes the retry explicit to Stripe.
+        headers={"Idempotency-Key": f"cancel-{payment_intent_id}"},
+    )
+    # Already canceled / succeeded intents are fine to ignore for local order cancel.
+    if response.status_code >= 400:
+        logger.warning(
+            "Stripe PaymentIntent cancel skipped for %s: %s",
+            payment_intent_id,
+            response.text,
         )
-        # Already canceled / succeeded intents are fine to ignore for local order cancel.
-        if response.status_code >= 400:
-            logger.warning(
-                "Stripe PaymentIntent cancel skipped for %s: %s",
-                payment_intent_id,
-                response.text,
-            )
 
 
 def payment_public_config() -> Dict[str, Any]:
@@ -0,0 +1,212 @@
+"""Precomputed diet plan templates per goal combination and calorie band.
+
+``scripts/build_plan_templates.py`` runs the diet engine offline with a wider
+search for every combination of the common goal types and every calorie band,
+and writes compact references (catalog ids + portions) to
+data/plan_templates.json. At runtime :class:`PlanTemplateStore` hydrates them
+into memory once and answers eligible requests without a search or a provider
+call. Personalization is applied later as a diff (:func:`plan_diff`).
+"""
+from __future__ import annotations
+
+import copy
+import itertools
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from services.diet_engine import (
+    build_local_plan,
+    catalog_meal,
+    catalog_supplement,
+    energy_targets,
+    goal_keys,
+    load_catalog,
+)
+from services.metrics_service import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_PATH = Path(__file__).resolve().parent.parent / "data" / "plan_templates.json"
+TEMPLATES_VERSION = 1
+
+# Goal types offered in the app (see models.goal.Goal.type).
+TEMPLATE_GOALS = ("muscle-building", "glowing-skin", "healthy-aging", "health-conditions")
+CALORIE_BANDS = tuple(range(1400, 3801, 200))
+# Offline builds search this many options per meal slot (the request path uses 24).
+TEMPLATE_SLOT_CANDIDATES = 48
+
+GOAL_TITLES = {
+    "muscle-building": "Building Muscle",
+    "glowing-skin": "Glowing Skin",
+    "healthy-aging": "Healthy Aging",
+    "health-conditions": "Health Conditions",
+}
+PLAN_FIELDS = ("total_calories", "macros", "meals", "supplements", "ai_recommendations")
+
+
+def calorie_band(calories: float) -> int:
+    return min(CALORIE_BANDS, key=lambda band: (abs(band - calories), band))
+
+
+def template_key(goal_types: Sequence[str], band: int) -> str:
+    return f"{'+'.join(sorted(goal_types)) or 'general'}@{band}"
+
+
+def goal_combinations() -> Iterator[Tuple[str, ...]]:
+    for size in range(len(TEMPLATE_GOALS) + 1):
+        yield from itertools.combinations(TEMPLATE_GOALS, size)
+
+
+def template_eligible(user_data: Dict[str, Any], goals: Sequence[Dict[str, Any]]) -> bool:
+    """Templates ignore restrictions and allergies, so only unrestricted profiles may use them."""
+    if user_data.get("dietary_restrictions") or user_data.get("allergies"):
+        return False
+    return goal_keys(goals).issubset(TEMPLATE_GOALS)
+
+
+def build_templates(catalog: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Offline step: one stored template per goal combination x calorie band."""
+    catalog = catalog or load_catalog()
+    templates: Dict[str, Any] = {}
+    for combination in goal_combinations():
+        goals = [{"type": goal, "title": GOAL_TITLES[goal]} for goal in combination]
+        for band in CALORIE_BANDS:
+            plan = build_local_plan(
+                {}, goals, catalog, calories=band, slot_candidates=TEMPLATE_SLOT_CANDIDATES
+            )
+            templates[template_key(combination, band)] = {
+                "total_calories": plan["total_calories"],
+                "macros": plan["macros"],
+                "meals": [{"id": meal["id"], "servings": meal["servings"]} for meal in plan["meals"]],
+                "supplements": [supplement["id"] for supplement in plan["supplements"]],
+                "ai_recommendations": plan["ai_recommendations"][1:],
+            }
+    return {
+        "version": TEMPLATES_VERSION,
+        "catalog_version": catalog.get("version"),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "templates": templates,
+    }
+
+
+def _hydrate(stored: Dict[str, Any], catalog: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "total_calories": stored["total_calories"],
+        "macros": stored["macros"],
+        "meals": [catalog_meal(meal["id"], meal["servings"], catalog) for meal in stored["meals"]],
+        "supplements": [catalog_supplement(supplement_id, catalog) for supplement_id in stored["supplements"]],
+        "ai_recommendations": stored["ai_recommendations"],
+    }
+
+
+class PlanTemplateStore:
+    """Hydrated templates kept in memory; loaded lazily on first use."""
+
+    def __init__(self, path: Path = TEMPLATES_PATH):
+        self.path = path
+        self._templates: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        catalog = load_catalog()
+        templates: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                document = json.load(fh)
+        except FileNotFoundError:
+            logger.warning("No plan templates at %s; run scripts/build_plan_templates.py", self.path)
+            document = None
+        if document is not None:
+            if document.get("version") != TEMPLATES_VERSION or document.get("catalog_version") != catalog.get("version"):
+                logger.warning("Plan templates at %s are stale; rebuild them", self.path)
+            else:
+                for key, stored in document["templates"].items():
+                    try:
+                        templates[key] = _hydrate(stored, catalog)
+                    except KeyError as exc:
+                        logger.warning("Skipping plan template %s: %s", key, exc)
+        with self._lock:
+            self._templates = templates
+        return len(templates)
+
+    def __len__(self) -> int:
+        return len(self._loaded())
+
+    def _loaded(self) -> Dict[str, Dict[str, Any]]:
+        if self._templates is None:
+            self.load()
+        return self._templates or {}
+
+    def lookup(self, user_data: Dict[str, Any], goals: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The template plan for this profile, shaped like a generated plan, or None."""
+        if not template_eligible(user_data, goals):
+            CACHE_REQUESTS.labels("plan_template", "skip").inc()
+            return None
+        targets = energy_targets(user_data, goals)
+        key = template_key(goal_keys(goals), calorie_band(targets["calories"]))
+        template = self._loaded().get(key)
+        if template is None:
+            CACHE_REQUESTS.labels("plan_template", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels("plan_template", "hit").inc()
+        return {
+            **copy.deepcopy(template),
+            "energy": {k: targets[k] for k in ("bmr", "tdee", "activity_factor")},
+            "engine": "template",
+            "template": key,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "user_id": user_data.get("id"),
+            "goals": goals,
+        }
+
+
+def _list_diff(path: str, base: List[Any], target: List[Any]) -> List[Dict[str, Any]]:
+    ops = [
+        {"op": "replace", "path": f"{path}/{index}", "value": new}
+        for index, (old, new) in enumerate(zip(base, target))
+        if old != new
+    ]
+    ops.extend({"op": "add", "path": f"{path}/-", "value": new} for new in target[len(base):])
+    # Highest index first so earlier removals do not shift later paths.
+    ops.extend({"op": "remove", "path": f"{path}/{index}"} for index in range(len(base) - 1, len(target) - 1, -1))
+    return ops
+
+
+def plan_diff(base: Dict[str, Any], target: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """JSON Patch (RFC 6902 subset) turning ``base`` into ``target`` over the plan fields."""
+    ops: List[Dict[str, Any]] = []
+    for field in PLAN_FIELDS:
+        old, new = base.get(field), target.get(field)
+        if old == new:
+            continue
+        if field in ("meals", "supplements") and isinstance(old, list) and isinstance(new, list):
+            ops.extend(_list_diff(f"/{field}", old, new))
+        else:
+            ops.append({"op": "replace", "path": f"/{field}", "value": new})
+    return ops
+
+
+def apply_plan_diff(plan: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    patched = copy.deepcopy(plan)
+    for op in ops:
+        field, _, index = op["path"].lstrip("/").partition("/")
+        if not index:
+            patched[field] = copy.deepcopy(op["value"])
+            continue
+        items = patched.setdefault(field, [])
+        if op["op"] == "add":
+            items.append(copy.deepcopy(op["value"]))
+        elif op["op"] == "replace":
+            items[int(index)] = copy.deepcopy(op["value"])
+        elif op["op"] == "remove":
+            del items[int(index)]
+        else:
+            raise ValueError(f"Unsupported plan diff op: {op['op']}")
+    return patched
+
+
+plan_template_store = PlanTemplateStore()
@@ -0,0 +1,365 @@
+"""Latency-aware AI provider selection with failover and optional hedged requests."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from config import settings
+from models.ai_provider import AIProvider
+from services.circuit_breaker import Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError
+from services.metrics_service import AI_CALLS_REJECTED
+from services.request_deadline import DeadlineExceeded, bounded_timeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Providers the router may pick, in default preference order.
+ROUTABLE_PROVIDERS = (AIProvider.AZURE_OPENAI, AIProvider.GROQ, AIProvider.OPENAI)
+
+
+def provider_configured(provider: AIProvider) -> bool:
+    if provider == AIProvider.AZURE_OPENAI:
+        return bool(settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT)
+    if provider == AIProvider.GROQ:
+        return bool(settings.GROQ_API_KEY)
+    if provider == AIProvider.OPENAI:
+        return bool(settings.OPENAI_API_KEY)
+    return False
+
+
+async def _bounded_call(
+    call: Callable[[AIProvider], Awaitable[T]],
+    provider: AIProvider,
+    timeout: Optional[float],
+) -> T:
+    """Await ``call(provider)`` within ``timeout`` clipped to the request deadline.
+
+    Raises DeadlineExceeded rather than a plain TimeoutError when it was the
+    request deadline, not the provider's own timeout, that ran out.
+    """
+    bounded = bounded_timeout(timeout)
+    if not bounded:
+        return await call(provider)
+    try:
+        return await asyncio.wait_for(call(provider), bounded)
+    except asyncio.TimeoutError:
+        if timeout is None or bounded < timeout:
+            raise DeadlineExceeded("request deadline exceeded") from None
+        raise
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ProviderStats:
+    """Rolling window of (latency_seconds, succeeded) samples for one provider."""
+
+    def __init__(self, window: int):
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((latency, ok))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+        latencies = sorted(latency for latency, ok in samples if ok)
+        errors = sum(1 for _, ok in samples if not ok)
+        return {
+            "samples": len(samples),
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "error_rate": errors / len(samples) if samples else 0.0,
+        }
+
+
+class ProviderRouter:
+    """Orders configured providers by health and p50 latency and fails over between them."""
+
+    def __init__(
+        self,
+        *,
+        window: int,
+        min_samples: int,
+        max_error_rate: float,
+        hedge_delay_seconds: float,
+        call_timeout_seconds: Optional[float] = None,
+        breaker_factory: Optional[Callable[[str], CircuitBreaker]] = None,
+        bulkhead_factory: Optional[Callable[[str], Bulkhead]] = None,
+    ):
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.call_timeout_seconds = call_timeout_seconds
+        self._window = window
+        self._breaker_factory = breaker_factory or _settings_breaker
+        self._bulkhead_factory = bulkhead_factory or _settings_bulkhead
+        self._stats: Dict[AIProvider, ProviderStats] = {}
+        self._breakers: Dict[AIProvider, CircuitBreaker] = {}
+        self._bulkheads: Dict[AIProvider, Bulkhead] = {}
+
+    def stats(self, provider: AIProvider) -> ProviderStats:
+        if provider not in self._stats:
+            self._stats[provider] = ProviderStats(self._window)
+        return self._stats[provider]
+
+    def breaker(self, provider: AIProvider) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = self._breaker_factory(provider.value)
+        return self._breakers[provider]
+
+    def bulkhead(self, provider: AIProvider) -> Bulkhead:
+        if provider not in self._bulkheads:
+            self._bulkheads[provider] = self._bulkhead_factory(provider.value)
+        return self._bulkheads[provider]
+
+    def reset(self) -> None:
+        """Forget collected samples and breaker state (tests only)."""
+        self._stats.clear()
+        self._breakers.clear()
+        self._bulkheads.clear()
+
+    def healthy(self, provider: AIProvider) -> bool:
+        if self.breaker(provider).state == CircuitBreaker.OPEN:
+            return False
+        snap = self.stats(provider).snapshot()
+        return snap["samples"] < self.min_samples or snap["error_rate"] <= self.max_error_rate
+
+    def ranked(
+        self,
+        preferred: Optional[AIProvider] = None,
+        allowed: Optional[Iterable[AIProvider]] = None,
+    ) -> List[AIProvider]:
+        """Healthy providers first, fastest p50 first; providers without enough data keep preference order."""
+        pool = list(ROUTABLE_PROVIDERS)
+        if preferred is not None:
+            pool = [preferred] + [p for p in pool if p != preferred]
+        if allowed is not None:
+            allowed_set = set(allowed)
+            pool = [p for p in pool if p in allowed_set]
+        candidates = [p for p in pool if provider_configured(p)]
+
+        def sort_key(item: Tuple[int, AIProvider]) -> Tuple[int, float, int]:
+            order, provider = item
+            snap = self.stats(provider).snapshot()
+            p50 = snap["p50"] if snap["samples"] >= self.min_samples and snap["p50"] is not None else 0.0
+            return (0 if self.healthy(provider) else 1, p50, order)
+
+        return [p for _, p in sorted(enumerate(candidates), key=sort_key)]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            provider.value: {
+                **self.stats(provider).snapshot(),
+                "healthy": self.healthy(provider),
+                "circuit": self.breaker(provider).state,
+                "in_flight": self.bulkhead(provider).in_flight,
+                "queued": self.bulkhead(provider).queued,
+            }
+            for provider in ROUTABLE_PROVIDERS
+            if provider_configured(provider)
+        }
+
+    @asynccontextmanager
+    async def guard(self, provider: AIProvider) -> AsyncIterator[None]:
+        """Admit one call through the provider's circuit breaker and bulkhead, recording its outcome.
+
+        Cancellation and the request deadline running out say nothing about the
+        provider, so they free the slot without counting as a failure.
+        """
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            AI_CALLS_REJECTED.labels(provider.value, "circuit_open").inc()
+            raise CircuitOpenError(f"{provider.value} circuit is open")
+        bulkhead = self.bulkhead(provider)
+        try:
+            await bulkhead.acquire()
+        except BaseException as exc:
+            breaker.release()
+            if isinstance(exc, BulkheadFullError):
+                AI_CALLS_REJECTED.labels(provider.value, "bulkhead_full").inc()
+            raise
+
+        started = time.perf_counter()
+        try:
+            yield
+        except (asyncio.CancelledError, DeadlineExceeded):
+            breaker.release()
+            raise
+        except Exception:
+            self.stats(provider).record(time.perf_counter() - started, False)
+            breaker.record(False)
+            raise
+        else:
+            self.stats(provider).record(time.perf_counter() - started, True)
+            breaker.record(True)
+        finally:
+            bulkhead.release()
+
+    async def _timed(
+        self,
+        provider: AIProvider,
+        call: Callable[[AIProvider], Awaitable[T]],
+        timeout: Optional[float] = None,
+    ) -> T:
+        async with self.guard(provider):
+            return await _bounded_call(call, provider, timeout or self.call_timeout_seconds)
+
+    async def _hedged(
+        self,
+        primary: AIProvider,
+        secondary: AIProvider,
+        call: Callable[[AIProvider], Awaitable[T]],
+        tried: List[AIProvider],
+        timeout: Optional[float] = None,
+    ) -> T:
+        first = asyncio.create_task(self._timed(primary, call, timeout))
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay_seconds)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+
+        logger.info(
+            "Hedging AI request: %s slow after %.2fs, also trying %s",
+            primary.value,
+            self.hedge_delay_seconds,
+            secondary.value,
+        )
+        tried.append(secondary)
+        pending = {first, asyncio.create_task(self._timed(secondary, call, timeout))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error  # type: ignore[misc]
+
+    async def call(
+        self,
+        call: Callable[[AIProvider], Awaitable[T]],
+        *,
+        preferred: Optional[AIProvider] = None,
+        allowed: Optional[Iterable[AIProvider]] = None,
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Run ``call(provider)`` on the best provider, failing over (and hedging) as configured.
+
+        ``timeout`` bounds each attempt (default: ``call_timeout_seconds``), and is
+        further shortened to the time left before the request deadline.
+        """
+        candidates = self.ranked(preferred, allowed)
+        if not candidates:
+            raise RuntimeError("No AI provider configured")
+
+        tried: List[AIProvider] = []
+        last_error: Optional[Exception] = None
+        for provider in candidates:
+            if provider in tried:
+                continue
+            tried.append(provider)
+            remaining = [p for p in candidates if p not in tried]
+            try:
+                if self.hedge_delay_seconds > 0 and remaining:
+                    return await self._hedged(provider, remaining[0], call, tried, timeout)
+                return await self._timed(provider, call, timeout)
+            except DeadlineExceeded:
+                raise
+            except Exception as exc:
+                logger.warning("AI provider %s failed (%s); trying next provider", provider.value, exc)
+                last_error = exc
+        raise last_error  # type: ignore[misc]
+
+    async def attempt(
+        self,
+        call: Callable[[AIProvider], Awaitable[T]],
+        *,
+        preferred: Optional[AIProvider] = None,
+        allowed: Optional[Iterable[AIProvider]] = None,
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Run ``call(provider)`` once on the best provider whose circuit is not open.
+
+        No failover, hedging, stats or breaker accounting: for calls that can fail
+        for reasons other than provider health (e.g. the provider fetching a URL we
+        gave it). The bulkhead still bounds concurrency.
+        """
+        candidates = [
+            provider
+            for provider in self.ranked(preferred, allowed)
+            if self.breaker(provider).state != CircuitBreaker.OPEN
+        ]
+        if not candidates:
+            raise CircuitOpenError("No AI provider available")
+        provider = candidates[0]
+        bulkhead = self.bulkhead(provider)
+        try:
+            await bulkhead.acquire()
+        except BulkheadFullError:
+            AI_CALLS_REJECTED.labels(provider.value, "bulkhead_full").inc()
+            raise
+        try:
+            return await _bounded_call(call, provider, timeout or self.call_timeout_seconds)
+        finally:
+            bulkhead.release()
+
+
+def _settings_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate_threshold=settings.AI_BREAKER_FAILURE_RATE,
+        window=settings.AI_BREAKER_WINDOW,
+        min_calls=settings.AI_BREAKER_MIN_CALLS,
+        open_seconds=settings.AI_BREAKER_OPEN_SECONDS,
+        half_open_max_calls=settings.AI_BREAKER_HALF_OPEN_CALLS,
+    )
+
+
+def _settings_bulkhead(name: str) -> Bulkhead:
+    return Bulkhead(
+        name,
+        max_concurrent=settings.AI_BULKHEAD_MAX_CONCURRENT,
+        max_queue=settings.AI_BULKHEAD_MAX_QUEUE,
+        queue_timeout=settings.AI_BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+    )
+
+
+provider_router = ProviderRouter(
+    window=settings.AI_ROUTER_WINDOW,
+    min_samples=settings.AI_ROUTER_MIN_SAMPLES,
+    max_error_rate=settings.AI_ROUTER_MAX_ERROR_RATE,
+    hedge_delay_seconds=settings.AI_HEDGE_DELAY_SECONDS,
+    call_timeout_seconds=settings.AI_CALL_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,103 @@
+"""Request-scoped deadlines for AI work and cancellation on client disconnect.
+
+A deadline set with :func:`deadline_scope` lives in a context variable, so it
+follows the request into the provider router, which shortens per-attempt
+timeouts to the time left. :func:`run_for_request` also watches the client
+connection and cancels the work when the client goes away, releasing the
+provider's bulkhead slot instead of finishing a reply nobody will read.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from fastapi import Request
+
+from config import settings
+from services.metrics_service import AI_REQUESTS_ABANDONED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Nginx's "client closed request"; never reaches the client, but shows up in logs and metrics.
+CLIENT_CLOSED_REQUEST = 499
+DEADLINE_HEADER = "X-Request-Timeout"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before an AI call could start."""
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection while AI work was in flight."""
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Bound AI calls in this context to ``seconds`` from now; an earlier outer deadline wins."""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def bounded_timeout(timeout: Optional[float]) -> Optional[float]:
+    """``timeout`` shortened to the time left before the current deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(timeout, left) if timeout else left
+
+
+def request_budget(request: Request) -> float:
+    """AI_REQUEST_DEADLINE_SECONDS, or less when the client asks for it via X-Request-Timeout."""
+    budget = settings.AI_REQUEST_DEADLINE_SECONDS
+    try:
+        asked = float(request.headers.get(DEADLINE_HEADER, ""))
+    except ValueError:
+        return budget
+    return min(budget, asked) if asked > 0 else budget
+
+
+async def run_for_request(request: Request, work: Awaitable[T], *, task: str) -> T:
+    """Await ``work`` under the request deadline; cancel it and raise ClientDisconnected on disconnect."""
+    with deadline_scope(request_budget(request)):
+        # The task copies the current context, deadline included.
+        inner = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({inner}, timeout=settings.AI_DISCONNECT_POLL_SECONDS)
+            if done:
+                return inner.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        inner.cancel()
+        raise
+
+    inner.cancel()
+    with contextlib.suppress(BaseException):
+        await inner
+    AI_REQUESTS_ABANDONED.labels(task).inc()
+    logger.info("Client disconnected; cancelled in-flight %s", task)
+    raise ClientDisconnected(task)
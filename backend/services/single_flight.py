@@ -0,0 +1,171 @@
+"""Coalesce identical in-flight requests so they share one upstream call."""
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.metrics_service import AI_COALESCED_REQUESTS
+from services.rate_limit import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key await one shared result.
+
+    In-process, followers await the leader's future. When REDIS_URL is set, a
+    short-lived ``SET NX`` lock elects one leader across workers; the leader
+    publishes its outcome under a result key named after its lock token, so
+    followers poll for that flight's outcome and never a previous one. A
+    follower whose leader failed runs the work itself. Results must be
+    JSON-serializable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        lock_seconds: int,
+        result_seconds: int,
+        poll_seconds: float,
+        enabled: bool = True,
+    ):
+        self.name = name
+        self.lock_seconds = lock_seconds
+        self.result_seconds = result_seconds
+        self.poll_seconds = poll_seconds
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _lock_key(self, key: str) -> str:
+        return f"vitalplan:flight:{self.name}:{key}:lock"
+
+    def _result_key(self, key: str, token: str) -> str:
+        return f"vitalplan:flight:{self.name}:{key}:result:{token}"
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``work`` once per ``key`` at a time; concurrent callers get a copy of its result."""
+        if not self.enabled:
+            return await work()
+
+        existing = self._inflight.get(key)
+        while existing is not None:
+            try:
+                result = await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                if not existing.cancelled():
+                    raise
+                # The leader's caller went away; take over (or follow the next leader).
+                existing = self._inflight.get(key)
+                continue
+            AI_COALESCED_REQUESTS.labels(self.name, "local").inc()
+            return copy.deepcopy(result)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._lead(key, work)
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                # Mark it retrieved so a future with no followers does not log a warning.
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _lead(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return await work()
+
+        token = uuid.uuid4().hex
+        try:
+            acquired = redis_client.set(self._lock_key(key), token, nx=True, ex=self.lock_seconds)
+        except Exception as exc:
+            logger.warning("Redis single-flight lock failed for %s (%s)", self.name, exc)
+            return await work()
+        if not acquired:
+            outcome = await self._await_remote(redis_client, key)
+            if outcome is not None and outcome.get("ok"):
+                AI_COALESCED_REQUESTS.labels(self.name, "redis").inc()
+                return outcome["value"]
+            # The other worker failed or went away; its error may not be ours to share.
+            return await work()
+
+        try:
+            result = await work()
+        except Exception as exc:
+            # Published so followers stop polling now rather than when the lock lapses.
+            self._publish(redis_client, key, token, {"ok": False, "error": str(exc)})
+            raise
+        else:
+            self._publish(redis_client, key, token, {"ok": True, "value": result})
+            return result
+        finally:
+            self._unlock(redis_client, key, token)
+
+    async def _await_remote(self, redis_client: Any, key: str) -> Optional[Dict[str, Any]]:
+        """Poll for the current leader's outcome; None if its lock lapsed or changed hands without one."""
+        try:
+            token = redis_client.get(self._lock_key(key))
+        except Exception as exc:
+            logger.warning("Redis single-flight poll failed for %s (%s)", self.name, exc)
+            return None
+        if token is None:
+            return None
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            try:
+                raw = redis_client.get(self._result_key(key, token))
+                if raw is not None:
+                    return json.loads(raw)
+                if redis_client.get(self._lock_key(key)) != token:
+                    # Check once more: the leader publishes before it unlocks.
+                    raw = redis_client.get(self._result_key(key, token))
+                    return json.loads(raw) if raw is not None else None
+            except Exception as exc:
+                logger.warning("Redis single-flight poll failed for %s (%s)", self.name, exc)
+                return None
+            await asyncio.sleep(self.poll_seconds)
+        return None
+
+    def _publish(self, redis_client: Any, key: str, token: str, outcome: Dict[str, Any]) -> None:
+        try:
+            redis_client.set(
+                self._result_key(key, token), json.dumps(outcome, default=str), ex=self.result_seconds
+            )
+        except Exception as exc:
+            logger.warning("Redis single-flight publish failed for %s (%s)", self.name, exc)
+
+    def _unlock(self, redis_client: Any, key: str, token: str) -> None:
+        try:
+            if redis_client.get(self._lock_key(key)) == token:
+                redis_client.delete(self._lock_key(key))
+        except Exception as exc:
+            logger.warning("Redis single-flight unlock failed for %s (%s)", self.name, exc)
+
+
+def single_flight(name: str) -> SingleFlight:
+    return SingleFlight(
+        name,
+        lock_seconds=settings.AI_SINGLE_FLIGHT_LOCK_SECONDS,
+        result_seconds=settings.AI_SINGLE_FLIGHT_RESULT_SECONDS,
+        poll_seconds=settings.AI_SINGLE_FLIGHT_POLL_SECONDS,
+        enabled=settings.AI_SINGLE_FLIGHT_ENABLED,
+    )
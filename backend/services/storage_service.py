@@ -151,3 +151,15 @@ def public_upload_url(relative_key: Optional[str], *, ttl_seconds: int = 86400)
     sig = _sign_payload(relative_key, exp)
     query = urlencode({"exp": exp, "sig": sig})
     return f"/api/uploads/{relative_key}?{query}"
+
+
+def vision_image_url(relative_key: Optional[str]) -> Optional[str]:
+    """Short-lived absolute URL an AI provider can fetch, or None when uploads are not reachable from outside."""
+    if not relative_key:
+        return None
+    ttl_seconds = settings.VISION_IMAGE_URL_TTL_SECONDS
+    if s3_enabled():
+        return public_upload_url(relative_key, ttl_seconds=ttl_seconds)
+    if not settings.PUBLIC_API_URL:
+        return None
+    return f"{settings.PUBLIC_API_URL.rstrip('/')}{public_upload_url(relative_key, ttl_seconds=ttl_seconds)}"
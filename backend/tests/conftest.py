@@ -5,7 +5,14 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from config import settings
+from models.ai_provider import AIProvider
+from services.ai_ledger import ai_ledger
+from services.ai_service import ai_service, diet_plan_cache
+from services.barcode_service import barcode_cache
 from services.database import Base, get_db
+from services.image_cache import image_analysis_cache
+from services.provider_router import provider_router
 from services.rate_limit import (
     ai_rate_limiter,
     auth_rate_limiter,
@@ -25,6 +32,29 @@ def _reset_rate_limiters():
         limiter.reset()
 
 
+def _reset_ai_state():
+    for cache in (diet_plan_cache, image_analysis_cache, barcode_cache):
+        cache.clear()
+    provider_router.reset()
+    ai_ledger.clear()
+
+
+@pytest.fixture()
+def fresh_ai_state():
+    """Empty AI response caches, routing stats, breakers and ledger, before and after the test."""
+    _reset_ai_state()
+    yield
+    _reset_ai_state()
+
+
+@pytest.fixture()
+def groq_provider(monkeypatch, fresh_ai_state):
+    """ai_service configured for Groq (fake key); mock ChatCompletionFactory to answer calls."""
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "gsk_test")
+    monkeypatch.setattr(ai_service, "provider", AIProvider.GROQ)
+    return ai_service
+
+
 @pytest.fixture()
 def db_session():
     engine = create_engine(
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.orm import sessionmaker
+
+from config import settings
+from services.ai_ledger import AICallLedger, AICallRecord, ai_ledger, summarize, usage_tokens
+from tests.test_ops_slice import _admin_headers
+from utils.chat_completion_factory import ChatCompletionFactory
+
+
+def test_usage_tokens_reads_openai_and_anthropic_shapes():
+    assert usage_tokens(SimpleNamespace(prompt_tokens=12, completion_tokens=34)) == (12, 34)
+    assert usage_tokens({"input_tokens": 5, "output_tokens": 6}) == (5, 6)
+    assert usage_tokens(None) == (None, None)
+
+
+def test_summarize_groups_and_prices():
+    records = [
+        AICallRecord("groq", "llama", "insights", latency_seconds=0.2, prompt_tokens=100, completion_tokens=50),
+        AICallRecord("groq", "llama", "insights", latency_seconds=0.4, error_class="TimeoutError"),
+        AICallRecord("groq", "llama", "insights", cache_hit=True),
+        AICallRecord("groq", "llama", "insights", demo_fallback=True, error_class="ValueError"),
+    ]
+
+    [row] = summarize(records, {"llama": [1.0, 2.0]})
+
+    assert (row["calls"], row["errors"], row["cache_hits"], row["demo_fallbacks"]) == (4, 1, 1, 1)
+    assert row["error_classes"] == {"TimeoutError": 1, "ValueError": 1}
+    assert (row["latency_p50"], row["latency_max"]) == (0.2, 0.4)
+    assert row["estimated_cost_usd"] == 0.0002
+
+
+def test_service_records_provider_calls_cache_hits_and_fallbacks(groq_provider):
+    usage = SimpleNamespace(prompt_tokens=900, completion_tokens=400)
+    plan = json.dumps({"k": 2000, "mc": [150, 200, 67], "m": [{"n": "Eggs", "t": "b", "k": 400, "mc": [30, 5, 25]}]})
+
+    with patch.object(
+        ChatCompletionFactory,
+        "acreate_completion",
+        new_callable=AsyncMock,
+        side_effect=[{"content": plan, "usage": usage}, RuntimeError("provider down")],
+    ):
+        asyncio.run(groq_provider.generate_diet_plan({"age": 30}, []))
+        asyncio.run(groq_provider.generate_diet_plan({"age": 30}, []))
+        asyncio.run(groq_provider.generate_diet_plan({"age": 30}, [{"type": "glowing-skin"}]))
+
+    outcomes = [(r.task, r.outcome, r.prompt_tokens, r.error_class) for r in ai_ledger._recent]
+    assert outcomes == [
+        ("diet_plan", "ok", 900, None),
+        ("diet_plan", "cache_hit", None, None),
+        ("diet_plan", "error", None, "RuntimeError"),
+        ("diet_plan", "demo", None, "RuntimeError"),
+    ]
+
+
+def test_table_sink_backs_the_summary(db_session):
+    factory = sessionmaker(bind=db_session.get_bind())
+    ledger = AICallLedger(sink="table", session_factory=factory)
+    records = [
+        AICallRecord("openai", "gpt-4o-mini", "food_vision", latency_seconds=1.5, completion_tokens=80),
+        AICallRecord("openai", "gpt-4o-mini", "food_vision", latency_seconds=0.5, prompt_tokens=20),
+        AICallRecord("openai", "gpt-4o-mini", "food_vision", latency_seconds=3.0, error_class="TimeoutError"),
+        AICallRecord("openai", "gpt-4o-mini", "food_vision", cache_hit=True),
+        AICallRecord("groq", None, "insights", demo_fallback=True, error_class="ValueError"),
+    ]
+    for record in records:
+        ledger.record(record)
+    ledger.record(
+        AICallRecord("openai", "gpt-4o-mini", "food_vision", at=datetime.now(timezone.utc) - timedelta(hours=5))
+    )
+    ledger.clear()
+
+    summary = ledger.summary(hours=1)
+
+    assert summary["source"] == "table"
+    assert summary["total_calls"] == 5
+    # The database aggregates match what summarize() computes from the records themselves.
+    assert summary["groups"] == summarize(records, settings.AI_MODEL_PRICES_PER_MTOK)
+    vision = summary["groups"][0]
+    assert (vision["calls"], vision["errors"], vision["cache_hits"], vision["completion_tokens"]) == (4, 1, 1, 80)
+    assert (vision["latency_p50"], vision["latency_max"]) == (1.5, 3.0)
+
+
+def test_ndjson_sink_samples(tmp_path):
+    path = tmp_path / "calls.ndjson"
+    ledger = AICallLedger(sink="ndjson", ndjson_path=str(path), sample_rate=1.0)
+    ledger.record(AICallRecord("groq", "llama", "insights", latency_seconds=0.1))
+    AICallLedger(sink="ndjson", ndjson_path=str(path), sample_rate=0.0).record(
+        AICallRecord("groq", "llama", "insights")
+    )
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["outcome"] == "ok"
+
+
+def test_sink_writes_are_batched_off_the_event_loop(tmp_path):
+    path = tmp_path / "calls.ndjson"
+    ledger = AICallLedger(sink="ndjson", ndjson_path=str(path), flush_seconds=60)
+
+    async def scenario():
+        for _ in range(3):
+            ledger.record(AICallRecord("groq", "llama", "insights", latency_seconds=0.1))
+        # Queued for the background flusher, not written inline.
+        assert not path.exists()
+        await ledger.aclose()
+
+    asyncio.run(scenario())
+
+    assert len(path.read_text().splitlines()) == 3
+    assert ledger.flush() == 0
+
+
+def test_admin_ai_call_summary(client, db_session, fresh_ai_state):
+    headers, _admin = _admin_headers(db_session, email="ledger-admin@example.com")
+    ai_ledger.record(AICallRecord("groq", "llama", "insights", latency_seconds=0.3, prompt_tokens=40))
+
+    response = client.get("/api/admin/ai-calls/summary?hours=2", headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["source"] == "memory"
+    assert body["groups"][0]["prompt_tokens"] == 40
+    assert client.get("/api/admin/ai-calls/summary", headers={}).status_code in (401, 403)
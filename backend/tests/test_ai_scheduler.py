@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from services import ai_scheduler as scheduler_module
+from services.ai_scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    PAID,
+    AIOverloaded,
+    AIScheduler,
+    current_priority,
+    priority_scope,
+)
+
+
+def _scheduler(**overrides):
+    options = {"max_concurrent": 1, "max_queue": 4, "queue_timeout": 1.0, "retry_after": 7}
+    options.update(overrides)
+    return AIScheduler(**options)
+
+
+def test_priority_scope_sets_and_restores():
+    assert current_priority() == INTERACTIVE
+    with priority_scope(BACKGROUND):
+        assert current_priority() == BACKGROUND
+    assert current_priority() == INTERACTIVE
+    with pytest.raises(ValueError):
+        with priority_scope("vip"):
+            pass
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = _scheduler()
+    served = []
+
+    async def waiter(name, priority):
+        async with scheduler.slot(priority):
+            served.append(name)
+
+    async def run():
+        await scheduler.acquire(INTERACTIVE)
+        tasks = [
+            asyncio.create_task(waiter("bulk", BACKGROUND)),
+            asyncio.create_task(waiter("scan-1", INTERACTIVE)),
+            asyncio.create_task(waiter("paid", PAID)),
+            asyncio.create_task(waiter("scan-2", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 4
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert served == ["paid", "scan-1", "scan-2", "bulk"]
+    assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+
+
+def test_full_queue_sheds_the_lowest_priority_first():
+    scheduler = _scheduler(max_queue=1)
+
+    async def run():
+        await scheduler.acquire(INTERACTIVE)
+        bulk = asyncio.create_task(scheduler.acquire(BACKGROUND))
+        await asyncio.sleep(0)
+
+        # A paid request displaces the queued background one...
+        paid = asyncio.create_task(scheduler.acquire(PAID))
+        await asyncio.sleep(0)
+        with pytest.raises(AIOverloaded):
+            await bulk
+
+        # ...but an interactive one cannot displace a paid one.
+        with pytest.raises(AIOverloaded) as refused:
+            await scheduler.acquire(INTERACTIVE)
+        assert refused.value.retry_after == 7
+
+        scheduler.release()
+        await paid
+        scheduler.release()
+
+    asyncio.run(run())
+    assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+
+
+def test_queue_wait_is_bounded():
+    scheduler = _scheduler(queue_timeout=0.02)
+
+    async def run():
+        await scheduler.acquire()
+        with pytest.raises(AIOverloaded):
+            await scheduler.acquire()
+        scheduler.release()
+
+    asyncio.run(run())
+    assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+
+
+def test_generate_returns_503_with_retry_after_when_saturated(client, auth_headers, monkeypatch, groq_provider):
+    saturated = _scheduler(max_concurrent=0, max_queue=0, retry_after=3)
+    monkeypatch.setattr(scheduler_module, "ai_scheduler", saturated)
+    monkeypatch.setattr("services.ai_service.ai_scheduler", saturated)
+
+    response = client.post(
+        "/api/diet-plans/generate?bypass_cache=true",
+        headers=auth_headers,
+        json={"goals": [{"type": "weight-loss", "title": "Lose weight", "priority": "high"}]},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json()["error"]["type"] == "overloaded"
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from groq.resources.chat.completions import AsyncCompletions
+
+from models.ai_provider import AIProvider
+from services.ai_service import _diet_plan_prompt, diet_plan_fingerprint
+from utils.ai_clients import AIClientRegistry, ai_client_registry
+from utils.chat_completion_factory import ChatCompletionFactory, close_ai_clients
+
+
+def test_ai_service_awaits_async_completion(groq_provider):
+    with patch.object(
+        ChatCompletionFactory,
+        "acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": '["Eat more greens"]', "usage": None},
+    ) as mock_completion:
+        insights = asyncio.run(groq_provider.get_nutrition_insights({"calories": 120}, enrich=True))
+
+    assert insights == ["Eat more greens"]
+    mock_completion.assert_awaited_once()
+    assert mock_completion.await_args.kwargs["provider"] == AIProvider.GROQ
+
+
+def test_nutrition_insights_skip_provider_unless_enriched(groq_provider):
+    with patch.object(ChatCompletionFactory, "acreate_completion", new_callable=AsyncMock) as mock_completion:
+        insights = asyncio.run(
+            groq_provider.get_nutrition_insights({"calories": 250, "macros": {"protein": 24}})
+        )
+
+    mock_completion.assert_not_awaited()
+    assert insights == ["Good source of protein (24g, 48% DV)"]
+
+
+def test_threaded_provider_runs_off_event_loop():
+    seen = {}
+
+    def fake_gemini(messages, **kwargs):
+        seen["thread"] = threading.current_thread().name
+        return {"content": "ok", "usage": None}
+
+    with patch.object(ChatCompletionFactory, "_gemini_completion", side_effect=fake_gemini):
+        result = asyncio.run(
+            ChatCompletionFactory.acreate_completion(
+                AIProvider.GEMINI, [{"role": "user", "content": "hi"}]
+            )
+        )
+
+    assert result["content"] == "ok"
+    assert seen["thread"].startswith("ai-sync")
+
+
+def test_provider_clients_are_pooled_and_closed(groq_provider):
+    create = AsyncMock(
+        return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))],
+            usage=None,
+        )
+    )
+
+    async def run():
+        with patch.object(AsyncCompletions, "create", create):
+            for _ in range(3):
+                await ChatCompletionFactory.acreate_completion(
+                    AIProvider.GROQ, [{"role": "user", "content": "hi"}]
+                )
+        size = len(ai_client_registry)
+        await close_ai_clients()
+        return size
+
+    assert asyncio.run(run()) == 1
+    assert len(ai_client_registry) == 0
+    assert create.await_count == 3
+
+
+def test_client_close_failures_do_not_log_api_keys(caplog):
+    registry = AIClientRegistry()
+    registry.get(("groq", "gsk_secret"), lambda: SimpleNamespace(close=AsyncMock(side_effect=RuntimeError("boom"))))
+
+    with caplog.at_level("WARNING", logger="utils.ai_clients"):
+        asyncio.run(registry.aclose())
+
+    assert "Failed to close AI client groq: boom" in caplog.text
+    assert "gsk_secret" not in caplog.text
+
+
+def test_profiles_sharing_a_plan_cache_key_get_the_same_prompt():
+    goals = [{"type": "weight-loss", "title": "Lose Weight", "priority": "high"}]
+    first = {"age": 29, "gender": "female", "height": 171, "weight": 62.4}
+    second = {"age": 31, "gender": "female", "height": 169, "weight": 58}
+
+    assert diet_plan_fingerprint(first, goals, provider=AIProvider.GROQ, model="m") == diet_plan_fingerprint(
+        second, goals, provider=AIProvider.GROQ, model="m"
+    )
+    assert _diet_plan_prompt(first, goals) == _diet_plan_prompt(second, goals)
+    assert "- Height: 170cm" in _diet_plan_prompt(first, goals)
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+from config import settings
+from services.barcode_service import barcode_cache, lookup_barcode
+from tests.test_ops_slice import _admin_headers
+
+PRODUCT = {"food_name": "Protein Bar", "barcode": "5000112637922", "analyzed_at": "2026-01-01T00:00:00+00:00"}
+
+
+def test_lookup_caches_products_and_unknown_barcodes(fresh_ai_state):
+    with patch(
+        "services.barcode_service._fetch_product",
+        new_callable=AsyncMock,
+        side_effect=[dict(PRODUCT), None],
+    ) as mock_fetch:
+        first = asyncio.run(lookup_barcode("5000112637922"))
+        second = asyncio.run(lookup_barcode(" 5000-1126-37922 "))
+        missing = asyncio.run(lookup_barcode("0000000000000"))
+        missing_again = asyncio.run(lookup_barcode("0000000000000"))
+
+    assert mock_fetch.await_count == 2
+    assert first["food_name"] == second["food_name"] == "Protein Bar"
+    assert second["analyzed_at"] != PRODUCT["analyzed_at"]
+    assert missing is None and missing_again is None
+
+    # Unknown barcodes expire on the shorter negative TTL.
+    expires = {key: entry[0] for key, entry in barcode_cache.local._entries.items()}
+    now = time.monotonic()
+    assert expires["0000000000000"] - now <= settings.BARCODE_CACHE_NEGATIVE_TTL_SECONDS
+    assert expires["5000112637922"] - now > settings.BARCODE_CACHE_NEGATIVE_TTL_SECONDS
+
+
+def test_upstream_errors_are_not_cached(fresh_ai_state):
+    with patch(
+        "services.barcode_service._fetch_product",
+        new_callable=AsyncMock,
+        side_effect=[RuntimeError("timeout"), dict(PRODUCT)],
+    ) as mock_fetch:
+        try:
+            asyncio.run(lookup_barcode("5000112637922"))
+        except RuntimeError:
+            pass
+        assert asyncio.run(lookup_barcode("5000112637922"))["food_name"] == "Protein Bar"
+
+    assert mock_fetch.await_count == 2
+
+
+def test_admin_purges_barcode_cache(client, db_session, fresh_ai_state):
+    headers, _admin = _admin_headers(db_session, email="barcode-admin@example.com")
+    barcode_cache.set("5000112637922", {"product": PRODUCT})
+    barcode_cache.set("0000000000000", {"product": None})
+
+    one = client.delete("/api/admin/barcode-cache?barcode=5000112637922", headers=headers)
+    assert one.status_code == 200
+    assert barcode_cache.get("5000112637922") is None
+    assert barcode_cache.get("0000000000000") == {"product": None}
+
+    everything = client.delete("/api/admin/barcode-cache", headers=headers)
+    assert everything.status_code == 200
+    assert len(barcode_cache.local) == 0
+    assert client.delete("/api/admin/barcode-cache", headers={}).status_code in (401, 403)
@@ -0,0 +1,77 @@
+import asyncio
+import gzip
+import json
+from unittest.mock import AsyncMock, patch
+
+from config import settings
+from services.barcode_index import (
+    BarcodeIndex,
+    iter_csv_products,
+    iter_jsonl_products,
+    open_dump,
+    write_index,
+)
+from services.barcode_service import lookup_barcode, map_off_products
+
+JSONL_PRODUCTS = [
+    {
+        "code": "3017620422003",
+        "product_name": "Nutella",
+        "brands": "Ferrero",
+        "nutriments": {"energy-kcal_100g": 539},
+    },
+    {"code": "123", "product_name": "Too short", "nutriments": {"fat_100g": 1}},
+    {"code": "5000112637922", "product_name": "No nutrition", "nutriments": {}},
+]
+
+CSV_DUMP = (
+    "code\tproduct_name\tbrands\tserving_size\tenergy-kcal_100g\tproteins_100g\n"
+    "5701234567890\tSkyr\tArla\t150 g\t63\t11\n"
+    "\tNameless\t\t\t10\t1\n"
+)
+
+
+def test_import_streams_jsonl_and_csv_exports(tmp_path):
+    jsonl = tmp_path / "products.jsonl.gz"
+    with gzip.open(jsonl, "wt", encoding="utf-8") as fh:
+        for product in JSONL_PRODUCTS:
+            fh.write(json.dumps(product) + "\n")
+        fh.write("{not json\n")
+    csv_path = tmp_path / "products.csv"
+    csv_path.write_text(CSV_DUMP, encoding="utf-8")
+
+    with open_dump(str(jsonl)) as stream:
+        from_jsonl = list(map_off_products(iter_jsonl_products(stream)))
+    with open_dump(str(csv_path)) as stream:
+        from_csv = list(map_off_products(iter_csv_products(stream)))
+
+    assert [p["barcode"] for p in from_jsonl] == ["3017620422003"]
+    assert from_jsonl[0]["calories"] == 539
+    assert [(p["food_name"], p["brand"], p["macros"]["protein"]) for p in from_csv] == [("Skyr", "Arla", 11.0)]
+
+    path = tmp_path / "index.sqlite"
+    assert write_index(path, [*from_jsonl, *from_csv], source="test") == 2
+    index = BarcodeIndex(path)
+    assert index.lookup("5701234567890")["serving_size"] == "150 g"
+    assert index.lookup("0000000000000") is None
+    assert index.metadata()["products"] == "2"
+
+    # A rebuilt index is picked up without restarting.
+    write_index(path, from_csv)
+    assert index.lookup("3017620422003") is None
+    index.close()
+
+
+def test_lookup_barcode_prefers_the_local_index(tmp_path, monkeypatch, fresh_ai_state):
+    path = tmp_path / "off.sqlite"
+    write_index(path, map_off_products(JSONL_PRODUCTS))
+    monkeypatch.setattr(settings, "BARCODE_INDEX_PATH", str(path))
+
+    with patch("services.barcode_service._fetch_product", new_callable=AsyncMock, return_value=None) as mock_fetch:
+        indexed = asyncio.run(lookup_barcode("3017620422003"))
+        missing = asyncio.run(lookup_barcode("4000000000000"))
+
+    assert indexed["food_name"] == "Nutella"
+    assert indexed["barcode"] == "3017620422003"
+    assert missing is None
+    mock_fetch.assert_awaited_once_with("4000000000000")
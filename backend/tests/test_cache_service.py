@@ -0,0 +1,63 @@
+import json
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from services import cache_service
+from services.cache_service import LRUCache
+from services.image_cache import ImageAnalysisCache
+from services.image_processing import ImageFingerprint
+
+
+def test_lru_cache_evicts_oldest_and_expires():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+
+    cache.set("stale", {"v": 4}, ttl_seconds=-1)
+    assert cache.get("stale") is None
+
+
+def test_lru_cache_returns_copies():
+    cache = LRUCache(max_entries=4, ttl_seconds=60)
+    cache.set("plan", {"meals": []})
+    cached = cache.get("plan")
+    cached["meals"].append("mutated")
+    assert cache.get("plan") == {"meals": []}
+
+
+def _cache_count(outcome):
+    return REGISTRY.get_sample_value("vitalplan_cache_requests_total", {"cache": "food_image", "result": outcome}) or 0
+
+
+def test_image_cache_finds_near_duplicates_and_counts_one_outcome(fresh_ai_state):
+    cache = ImageAnalysisCache(max_entries=16, ttl_seconds=60, max_distance=6)
+    base = 0x0F0F_F0F0_AAAA_5555
+    cache.store(ImageFingerprint("a" * 64, base), {"food_name": "Apple"})
+    cache.store(ImageFingerprint("b" * 64, ~base & (2**64 - 1)), {"food_name": "Pear"})
+    before = {outcome: _cache_count(outcome) for outcome in ("miss", "hit_near")}
+
+    # Flips one bit in each of six different bands.
+    near = ImageFingerprint("c" * 64, base ^ 0x8040_2010_0804_0000)
+    assert cache.lookup(near) == {"food_name": "Apple"}
+    assert cache.lookup(ImageFingerprint("d" * 64, base ^ 0xFF00)) is None
+
+    assert _cache_count("hit_near") - before["hit_near"] == 1
+    assert _cache_count("miss") - before["miss"] == 1
+
+
+def test_image_cache_near_match_falls_back_to_shared_tier(monkeypatch, fresh_ai_state):
+    cache = ImageAnalysisCache(max_entries=16, ttl_seconds=60, max_distance=6)
+    cache.store(ImageFingerprint("a" * 64, 0x1234), {"food_name": "Apple"})
+    # The local tier dropped the result, but Redis still has it.
+    cache.results.local.clear()
+    shared = {cache.results._redis_key("a" * 64): json.dumps({"food_name": "Apple"})}
+    monkeypatch.setattr(
+        cache_service, "get_redis_client", lambda: SimpleNamespace(get=shared.get, set=lambda *a, **kw: None)
+    )
+
+    assert cache.lookup(ImageFingerprint("b" * 64, 0x1235)) == {"food_name": "Apple"}
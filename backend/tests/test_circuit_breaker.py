@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from config import settings
+from models.ai_provider import AIProvider
+from services.circuit_breaker import Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError
+from services.provider_router import ProviderRouter
+
+
+def _breaker(**overrides):
+    options = {"failure_rate_threshold": 0.5, "window": 10, "min_calls": 4, "open_seconds": 0.05}
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def test_breaker_trips_then_half_opens_and_closes_on_success():
+    breaker = _breaker()
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(ok)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is False
+
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    # Only one half-open probe at a time.
+    assert breaker.allow() is False
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = _breaker(min_calls=1)
+    breaker.allow()
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_bulkhead_queues_then_rejects():
+    bulkhead = Bulkhead("test", max_concurrent=1, max_queue=1, queue_timeout=1.0)
+
+    async def run():
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        assert bulkhead.queued == 1
+        with pytest.raises(BulkheadFullError):
+            await bulkhead.acquire()
+        bulkhead.release()
+        await waiter
+        assert (bulkhead.in_flight, bulkhead.queued) == (1, 0)
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_router_skips_provider_with_open_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "")
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "gsk_test")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk_test")
+    router = ProviderRouter(
+        window=20,
+        min_samples=50,
+        max_error_rate=0.5,
+        hedge_delay_seconds=0,
+        breaker_factory=lambda name: _breaker(min_calls=2, open_seconds=60),
+    )
+    calls = []
+
+    async def call(provider):
+        calls.append(provider)
+        if provider == AIProvider.GROQ:
+            raise RuntimeError("groq down")
+        return provider.value
+
+    for _ in range(3):
+        assert asyncio.run(router.call(call, preferred=AIProvider.GROQ)) == "openai"
+
+    assert calls.count(AIProvider.GROQ) == 2
+    assert router.snapshot()["groq"]["circuit"] == CircuitBreaker.OPEN
+
+    async def only_groq():
+        async with router.guard(AIProvider.GROQ):
+            pass
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(only_groq())
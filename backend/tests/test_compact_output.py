@@ -0,0 +1,125 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from config import settings
+from services.compact_output import expand_diet_plan, expand_food_analysis, expand_meal
+
+COMPACT_MEAL = {
+    "n": "Protein Breakfast Bowl",
+    "t": "b",
+    "d": "Greek yogurt with berries and granola",
+    "i": ["Greek yogurt 200g", "Mixed berries 100g", "Granola 30g"],
+    "k": 485,
+    "mc": [38, 32, 18],
+    "p": 5,
+    "df": "e",
+    "st": ["Add yogurt to bowl", "Top with berries and granola"],
+    "nd": [8.5, 24, 95, 15, 4.2, 0],
+    "vt": {"Vitamin C": "45mg"},
+    "mn": {"Calcium": "320mg"},
+}
+COMPACT_PLAN = {
+    "k": 2000,
+    "mc": [150, 200, 67],
+    "m": [COMPACT_MEAL, {**COMPACT_MEAL, "n": "Chicken Rice Bowl", "t": "l", "df": "m"}],
+    "s": [
+        {
+            "n": "Omega-3 Fish Oil",
+            "d": "Supports heart health",
+            "ds": "2 capsules daily",
+            "tm": "With meals",
+            "b": ["Heart health", "Brain function"],
+            "pr": 29.99,
+        }
+    ],
+    "r": ["Focus on lean proteins"],
+}
+
+
+def test_expand_diet_plan_restores_verbose_shape():
+    plan = expand_diet_plan(COMPACT_PLAN)
+
+    assert plan["total_calories"] == 2000
+    assert plan["macros"] == {"protein": 150, "carbs": 200, "fat": 67}
+    assert [meal["id"] for meal in plan["meals"]] == ["meal-1", "meal-2"]
+    assert [meal["type"] for meal in plan["meals"]] == ["breakfast", "lunch"]
+    assert plan["meals"][1]["difficulty"] == "medium"
+    details = plan["meals"][0]["nutrition_details"]
+    assert details["sodium"] == 95
+    assert details["saturated_fat"] == 4.2
+    assert details["vitamins"] == {"Vitamin C": "45mg"}
+    assert plan["supplements"][0]["id"] == "supp-1"
+    assert plan["supplements"][0]["dosage"] == "2 capsules daily"
+    assert plan["ai_recommendations"] == ["Focus on lean proteins"]
+
+
+def test_expand_food_analysis():
+    result = expand_food_analysis(
+        {"n": "Apple", "c": 0.95, "sv": "1 medium apple (182g)", "k": 95, "mc": [0.5, 25, 0.3], "r": ["Fiber"]}
+    )
+
+    assert result["food_name"] == "Apple"
+    assert result["macros"]["carbs"] == 25
+    assert result["nutrition_details"]["fiber"] == 0
+    assert result["ai_insights"] == ["Fiber"]
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {**COMPACT_MEAL, "t": "brunch"},
+        {**COMPACT_MEAL, "mc": [38, 32]},
+        {**COMPACT_MEAL, "nd": [1, 2, 3]},
+        {**COMPACT_MEAL, "image_url": "https://example.com/a.jpg"},
+        {key: value for key, value in COMPACT_MEAL.items() if key != "k"},
+    ],
+)
+def test_expand_meal_rejects_malformed_documents(document):
+    with pytest.raises(ValueError):
+        expand_meal(document, 0)
+
+
+def test_compact_plan_is_much_smaller_than_verbose():
+    compact = json.dumps(COMPACT_PLAN, separators=(",", ":"))
+    verbose = json.dumps(expand_diet_plan(COMPACT_PLAN), separators=(",", ":"))
+
+    # Free text is identical in both; the saving is all keys, ids and nesting.
+    assert len(compact) <= 0.65 * len(verbose)
+
+
+def test_generate_diet_plan_expands_compact_reply(monkeypatch, groq_provider):
+    monkeypatch.setattr(settings, "DIET_PLAN_ENGINE", "ai")
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": json.dumps(COMPACT_PLAN), "usage": None},
+    ) as mock_completion:
+        plan = asyncio.run(groq_provider.generate_diet_plan({"age": 30}, [{"type": "weight-loss"}]))
+
+    prompt = mock_completion.await_args.kwargs["messages"][-1]["content"]
+    assert '"mc":[150,200,67]' in prompt
+    assert plan["meals"][0]["name"] == "Protein Breakfast Bowl"
+    assert plan["supplements"][0]["price"] == 29.99
+
+
+def test_stream_diet_plan_expands_compact_items(groq_provider):
+    document = json.dumps(COMPACT_PLAN)
+
+    async def fake_stream(*args, **kwargs):
+        for start in range(0, len(document), 16):
+            yield document[start : start + 16]
+
+    async def collect():
+        return [event async for event in groq_provider.stream_diet_plan({"age": 30}, [{"type": "weight-loss"}])]
+
+    with patch("services.ai_service.ChatCompletionFactory.astream_completion", side_effect=fake_stream):
+        events = asyncio.run(collect())
+
+    assert [name for name, _ in events] == ["meal", "meal", "supplement", "plan"]
+    assert events[0][1]["id"] == "meal-1"
+    assert events[1][1]["type"] == "lunch"
+    assert events[-1][1]["meals"][1]["name"] == "Chicken Rice Bowl"
@@ -0,0 +1,70 @@
+from services.diet_engine import build_local_plan, energy_targets, load_catalog
+
+
+def _profile(**overrides):
+    profile = {
+        "id": 7,
+        "age": 30,
+        "height": 180,
+        "weight": 80,
+        "gender": "male",
+        "activity_level": "moderate",
+        "dietary_restrictions": [],
+        "allergies": [],
+    }
+    profile.update(overrides)
+    return profile
+
+
+def test_energy_targets_use_mifflin_st_jeor_and_goals():
+    targets = energy_targets(_profile(), [])
+    # 10*80 + 6.25*180 - 5*30 + 5 = 1780; x1.55 moderate
+    assert targets["bmr"] == 1780
+    assert targets["calories"] == 2760
+    assert targets["macros"]["protein"] == round(2760 * 0.25 / 4)
+
+    bulking = energy_targets(_profile(), [{"type": "muscle-building"}])
+    assert bulking["calories"] == 3030
+
+    cutting = energy_targets(_profile(gender="female"), [{"type": "healthy-aging", "title": "Lose weight"}])
+    assert cutting["calories"] < energy_targets(_profile(gender="female"), [])["calories"]
+
+
+def test_incomplete_profile_uses_reference_calories():
+    targets = energy_targets({"activity_level": "active"}, [])
+    assert targets["bmr"] is None
+    assert targets["calories"] == 2000
+
+
+def test_local_plan_respects_restrictions_and_allergies():
+    catalog = load_catalog()
+    by_id = {meal["id"]: meal for meal in catalog["meals"]}
+    plan = build_local_plan(
+        _profile(dietary_restrictions=["Vegan", "Gluten-Free"], allergies=["Nuts", "Soy"]),
+        [{"type": "healthy-aging", "title": "Healthy Aging"}],
+    )
+
+    assert [meal["type"] for meal in plan["meals"]] == ["breakfast", "lunch", "dinner", "snack"]
+    for meal in plan["meals"]:
+        source = by_id[meal["id"]]
+        assert "vegan" in source["tags"]
+        assert not {"wheat", "nuts", "soy"} & set(source["allergens"])
+    names = {supplement["name"] for supplement in plan["supplements"]}
+    assert "Omega-3 Fish Oil" not in names
+    assert "Vitamin B12" in names
+
+
+def test_local_plan_matches_ai_plan_shape_and_hits_calorie_target():
+    plan = build_local_plan(_profile(), [{"type": "muscle-building", "title": "Build"}])
+    for key in ("total_calories", "macros", "meals", "supplements", "ai_recommendations", "user_id", "goals"):
+        assert key in plan
+    assert plan["engine"] == "local"
+    planned = sum(meal["calories"] for meal in plan["meals"])
+    assert abs(planned - plan["total_calories"]) / plan["total_calories"] < 0.1
+    for meal in plan["meals"]:
+        assert {"id", "name", "type", "calories", "macros", "ingredients", "servings"} <= set(meal)
+
+
+def test_intermittent_fasting_skips_breakfast():
+    plan = build_local_plan(_profile(dietary_restrictions=["Intermittent Fasting"]), [])
+    assert "breakfast" not in [meal["type"] for meal in plan["meals"]]
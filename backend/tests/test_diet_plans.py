@@ -1,3 +1,16 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+from config import settings
+from main import app
+from models.user import User
+from services import request_deadline
+from services.database import get_session_factory
+from services.job_service import SHUTDOWN_ERROR, JobManager, job_manager
+
+
 def test_generate_diet_plan_demo_mode(client, auth_headers):
     response = client.post(
         "/api/diet-plans/generate",
@@ -15,10 +28,297 @@ def test_generate_diet_plan_demo_mode(client, auth_headers):
     )
     assert response.status_code == 200
     body = response.json()
-    assert body["total_calories"] == 2000
+    # Profile has no age/height/weight: 2000 kcal reference, +10% for muscle building.
+    assert body["total_calories"] == 2200
     assert isinstance(body["meals"], list)
     assert len(body["meals"]) >= 1
 
     listed = client.get("/api/diet-plans/", headers=auth_headers)
     assert listed.status_code == 200
     assert len(listed.json()) >= 1
+
+
+def test_generate_diet_plan_served_from_cache(client, auth_headers, groq_provider):
+    plan = {
+        "total_calories": 2300,
+        "macros": {"protein": 160, "carbs": 240, "fat": 70},
+        "meals": [{"id": "meal-1", "name": "Oats", "type": "breakfast", "calories": 400}],
+        "supplements": [],
+        "ai_recommendations": ["Eat oats"],
+    }
+    payload = {"goals": [{"type": "muscle-building", "title": "Building Muscle", "priority": "high"}]}
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": json.dumps(plan), "usage": None},
+    ) as mock_completion:
+        first = client.post("/api/diet-plans/generate", headers=auth_headers, json=payload)
+        second = client.post("/api/diet-plans/generate", headers=auth_headers, json=payload)
+        bypassed = client.post(
+            "/api/diet-plans/generate?bypass_cache=true", headers=auth_headers, json=payload
+        )
+
+    assert first.status_code == second.status_code == bypassed.status_code == 200
+    assert second.json()["total_calories"] == 2300
+    assert mock_completion.await_count == 2
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_diet_plan_demo_mode(client, auth_headers):
+    response = client.post(
+        "/api/diet-plans/generate/stream",
+        headers=auth_headers,
+        json={"goals": [{"type": "healthy-aging", "title": "Healthy Aging"}]},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names.count("meal") == 4
+    assert names[-1] == "plan"
+    assert events[-1][1]["id"] >= 1
+
+    listed = client.get("/api/diet-plans/", headers=auth_headers)
+    assert [plan["id"] for plan in listed.json()] == [events[-1][1]["id"]]
+
+
+def test_stream_diet_plan_proxies_provider_deltas(client, auth_headers, groq_provider):
+    document = json.dumps(
+        {
+            "total_calories": 2100,
+            "macros": {"protein": 140, "carbs": 220, "fat": 70},
+            "meals": [{"id": "m1", "name": "Eggs"}, {"id": "m2", "name": "Rice bowl"}],
+            "supplements": [{"id": "s1", "name": "Creatine"}],
+            "ai_recommendations": ["Lift"],
+        }
+    )
+
+    async def fake_stream(*args, **kwargs):
+        for start in range(0, len(document), 16):
+            yield document[start : start + 16]
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.astream_completion",
+        side_effect=fake_stream,
+    ):
+        response = client.post(
+            "/api/diet-plans/generate/stream",
+            headers=auth_headers,
+            json={"goals": [{"type": "muscle-building", "title": "Building Muscle"}]},
+        )
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["meal", "meal", "supplement", "plan"]
+    assert events[-1][1]["total_calories"] == 2100
+
+
+def test_stream_diet_plan_sends_local_draft_first(client, auth_headers, groq_provider):
+    document = json.dumps({"total_calories": 2100, "meals": [{"id": "m1", "name": "Eggs"}], "supplements": []})
+
+    async def fake_stream(*args, **kwargs):
+        yield document
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.astream_completion",
+        side_effect=fake_stream,
+    ):
+        response = client.post(
+            "/api/diet-plans/generate/stream?draft=true",
+            headers=auth_headers,
+            json={"goals": [{"type": "muscle-building", "title": "Building Muscle"}]},
+        )
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["draft", "meal", "plan"]
+    assert events[0][1]["engine"] == "template"
+    assert len(events[0][1]["meals"]) == 4
+
+
+def test_stream_diet_plan_runs_under_the_request_deadline(client, auth_headers):
+    seen = []
+
+    async def fake_stream(*args, **kwargs):
+        seen.append(request_deadline.remaining())
+        yield "error", {"message": "stop"}
+
+    with patch("routers.diet_plans.ai_service.stream_diet_plan", side_effect=fake_stream):
+        response = client.post(
+            "/api/diet-plans/generate/stream",
+            headers={**auth_headers, request_deadline.DEADLINE_HEADER: "5"},
+            json={"goals": [{"type": "healthy-aging", "title": "Healthy Aging"}]},
+        )
+
+    assert _parse_sse(response.text) == [("error", {"message": "stop"})]
+    assert seen[0] is not None and 0 < seen[0] <= 5
+
+
+def test_generate_diet_plan_past_the_deadline_is_a_timeout_not_a_demo_plan(client, auth_headers, groq_provider):
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(5)
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        side_effect=slow_completion,
+    ):
+        response = client.post(
+            "/api/diet-plans/generate",
+            headers={**auth_headers, request_deadline.DEADLINE_HEADER: "0.05"},
+            json={"goals": [{"type": "healthy-aging", "title": "Healthy Aging"}]},
+        )
+
+    assert response.status_code == 504
+    assert response.json()["error"]["type"] == "deadline_exceeded"
+    assert client.get("/api/diet-plans/", headers=auth_headers).json() == []
+
+
+def test_generate_diet_plan_async_job(client, auth_headers, db_session):
+    app.dependency_overrides[get_session_factory] = lambda: (lambda: db_session)
+    accepted = client.post(
+        "/api/diet-plans/generate?async=true",
+        headers=auth_headers,
+        json={"goals": [{"type": "glowing-skin", "title": "Glowing Skin"}]},
+    )
+    assert accepted.status_code == 202
+    job_id = accepted.json()["job_id"]
+
+    events = client.get(f"/api/diet-plans/jobs/{job_id}/events", headers=auth_headers)
+    assert events.status_code == 200
+    assert "event: done" in events.text
+
+    for _ in range(50):
+        job = client.get(f"/api/diet-plans/jobs/{job_id}", headers=auth_headers).json()
+        if job["status"] == "succeeded":
+            break
+        time.sleep(0.05)
+    assert job["status"] == "succeeded"
+    assert job["result"]["total_calories"] == 2000
+
+    missing = client.get("/api/diet-plans/jobs/unknown", headers=auth_headers)
+    assert missing.status_code == 404
+
+
+def test_generation_job_fails_cleanly_when_the_user_is_gone(client, auth_headers, db_session):
+    app.dependency_overrides[get_session_factory] = lambda: (lambda: db_session)
+
+    async def generate_after_account_deletion(*args, **kwargs):
+        db_session.query(User).filter(User.email == "user@example.com").delete()
+        db_session.commit()
+        return {"total_calories": 2000, "meals": []}
+
+    with patch("routers.diet_plans.ai_service.generate_diet_plan", side_effect=generate_after_account_deletion):
+        accepted = client.post(
+            "/api/diet-plans/generate?async=true",
+            headers=auth_headers,
+            json={"goals": [{"type": "glowing-skin", "title": "Glowing Skin"}]},
+        )
+        assert accepted.status_code == 202
+        job_id = accepted.json()["job_id"]
+        for _ in range(50):
+            job = job_manager.get(job_id)
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+
+    assert job["status"] == "failed"
+    assert job["error"] == "User no longer exists; diet plan not saved"
+
+
+def test_shutdown_marks_queued_and_running_jobs_failed():
+    manager = JobManager(max_workers=1, max_pending=4, ttl_seconds=60)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(60)
+
+        running = manager.submit("diet_plan.generate", 1, work)
+        queued = manager.submit("diet_plan.generate", 1, work)
+        await started.wait()
+        await manager.aclose()
+        return running["id"], queued["id"]
+
+    for job_id in asyncio.run(scenario()):
+        job = manager.get(job_id)
+        assert (job["status"], job["error"]) == ("failed", SHUTDOWN_ERROR)
+        assert job["finished_at"] is not None
+    assert manager.pending_count() == 0
+
+
+def _instant_plan(client, auth_headers, db_session):
+    app.dependency_overrides[get_session_factory] = lambda: (lambda: db_session)
+    response = client.post(
+        "/api/diet-plans/generate?instant=true",
+        headers=auth_headers,
+        json={"goals": [{"type": "muscle-building", "title": "Building Muscle"}]},
+    )
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["description"] == "Diet plan (personalizing...)"
+    assert plan["total_calories"] == 2200
+    return plan, response.headers["X-Personalization-Job"]
+
+
+def _finished_job(client, auth_headers, job_id):
+    for _ in range(50):
+        job = client.get(f"/api/diet-plans/jobs/{job_id}", headers=auth_headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    return job
+
+
+def test_generate_diet_plan_instant_template_then_personalized(client, auth_headers, db_session, groq_provider):
+    ai_plan = {"k": 2450, "mc": [180, 250, 80], "m": [{"n": "Salmon bowl", "t": "l", "k": 650, "mc": [45, 60, 20]}]}
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": json.dumps(ai_plan), "usage": None},
+    ):
+        plan, job_id = _instant_plan(client, auth_headers, db_session)
+        job = _finished_job(client, auth_headers, job_id)
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["plan_id"] == plan["id"]
+    assert (job["result"]["applied"], job["result"]["fallback"]) == (True, False)
+    paths = {op["path"] for op in job["result"]["diff"]}
+    assert "/total_calories" in paths and any(path.startswith("/meals") for path in paths)
+
+    personalized = client.get(f"/api/diet-plans/{plan['id']}", headers=auth_headers).json()
+    assert personalized["description"] == "AI-generated personalized diet plan"
+    assert personalized["total_calories"] == 2450
+    assert [meal["name"] for meal in personalized["meals"]] == ["Salmon bowl"]
+
+
+def test_instant_plan_keeps_the_template_when_ai_falls_back(client, auth_headers, db_session):
+    # No provider credentials: generate_diet_plan returns the demo plan.
+    plan, job_id = _instant_plan(client, auth_headers, db_session)
+    job = _finished_job(client, auth_headers, job_id)
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"plan_id": plan["id"], "applied": False, "fallback": True, "diff": []}
+    kept = client.get(f"/api/diet-plans/{plan['id']}", headers=auth_headers).json()
+    assert kept["description"] == "Diet plan (AI personalization unavailable)"
+    assert (kept["total_calories"], kept["meals"]) == (plan["total_calories"], plan["meals"])
+
+
+def test_instant_plan_personalized_by_local_engine_is_not_labelled_ai(client, auth_headers, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "DIET_PLAN_ENGINE", "local")
+    plan, job_id = _instant_plan(client, auth_headers, db_session)
+    job = _finished_job(client, auth_headers, job_id)
+
+    assert job["status"] == "succeeded"
+    assert (job["result"]["applied"], job["result"]["fallback"]) == (True, False)
+    personalized = client.get(f"/api/diet-plans/{plan['id']}", headers=auth_headers).json()
+    assert personalized["description"] == "Rule-based personalized diet plan"
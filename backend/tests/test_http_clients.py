@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+
+from config import settings
+from services.barcode_service import lookup_barcode
+from services.payment_service import confirm_payment, create_payment_intent
+from utils.http_clients import OPEN_FOOD_FACTS, STRIPE, OutboundClients, Upstream, outbound_clients
+
+
+def _mock_client(handler, base_url="https://upstream.test"):
+    return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOUND_RETRY_BACKOFF_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "OUTBOUND_RETRIES", 2)
+
+
+def test_clients_are_pooled_per_upstream_and_closed():
+    clients = OutboundClients({"api": Upstream(base_url="https://upstream.test", timeout_seconds=3)})
+    first = clients.get("api")
+    assert clients.get("api") is first
+    assert str(first.base_url) == "https://upstream.test"
+    assert first.timeout.read == 3
+
+    asyncio.run(clients.aclose())
+    assert first.is_closed
+    assert clients.get("api") is not first
+
+
+def test_idempotent_requests_retry_transient_failures(no_backoff):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            raise httpx.ConnectError("reset", request=request)
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    clients = OutboundClients()
+    clients.override("api", _mock_client(handler))
+
+    response = asyncio.run(clients.request("api", "GET", "/thing"))
+
+    assert response.json() == {"ok": True}
+    assert calls == ["GET", "GET", "GET"]
+
+
+def test_posts_retry_only_with_an_idempotency_key(no_backoff):
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("Idempotency-Key"))
+        return httpx.Response(503)
+
+    clients = OutboundClients()
+    clients.override("api", _mock_client(handler))
+
+    assert asyncio.run(clients.request("api", "POST", "/charge")).status_code == 503
+    assert calls == [None]
+
+    calls.clear()
+    asyncio.run(clients.request("api", "POST", "/charge", headers={"Idempotency-Key": "k1"}))
+    assert calls == ["k1", "k1", "k1"]
+
+
+def test_barcode_lookup_uses_the_injected_client(fresh_ai_state):
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return httpx.Response(
+            200,
+            json={"status": 1, "product": {"product_name": "Skyr", "nutriments": {"proteins_100g": 11}}},
+        )
+
+    outbound_clients.override(OPEN_FOOD_FACTS, _mock_client(handler, "https://world.openfoodfacts.org"))
+    try:
+        product = asyncio.run(lookup_barcode("5701234567890"))
+    finally:
+        outbound_clients.override(OPEN_FOOD_FACTS, None)
+
+    assert seen == ["/api/v2/product/5701234567890.json"]
+    assert (product["food_name"], product["macros"]["protein"]) == ("Skyr", 11.0)
+
+
+def test_stripe_calls_share_the_pooled_client(monkeypatch):
+    monkeypatch.setattr(settings, "STRIPE_SECRET_KEY", "sk_test_123")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.method == "POST":
+            return httpx.Response(
+                200, json={"id": "pi_1", "client_secret": "pi_1_secret", "status": "requires_payment_method"}
+            )
+        return httpx.Response(200, json={"id": "pi_1", "status": "succeeded"})
+
+    outbound_clients.override(STRIPE, _mock_client(handler, "https://api.stripe.com"))
+    try:
+        intent = asyncio.run(create_payment_intent(amount=12.5, order_id=7, customer_email="a@example.com"))
+        confirmed = asyncio.run(confirm_payment("pi_1"))
+    finally:
+        outbound_clients.override(STRIPE, None)
+
+    assert intent["payment_intent_id"] == "pi_1"
+    assert confirmed["status"] == "succeeded"
+    assert [r.url.path for r in requests] == ["/v1/payment_intents", "/v1/payment_intents/pi_1"]
+    assert requests[0].headers["Idempotency-Key"].startswith("order-7-")
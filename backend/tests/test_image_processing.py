@@ -0,0 +1,66 @@
+import asyncio
+import io
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from PIL import Image
+
+from services.image_processing import ImageProcessor, encode_for_vision, fingerprint_image
+
+
+def _photo_bytes(size, orientation=None):
+    image = Image.new("RGB", size, color=(10, 200, 30))
+    buffer = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, format="JPEG", exif=exif)
+    else:
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_encode_for_vision_downscales_and_applies_exif_orientation():
+    rotated = encode_for_vision(_photo_bytes((3000, 1500), orientation=6), max_side=1024)
+    image = Image.open(io.BytesIO(rotated))
+    assert image.format == "JPEG"
+    assert image.size == (512, 1024)
+
+
+def test_image_processor_runs_in_worker_process():
+    processor = ImageProcessor(workers=1)
+    try:
+        data = _photo_bytes((200, 100))
+        fingerprint = asyncio.run(processor.run(fingerprint_image, data))
+        encoded = asyncio.run(processor.run(encode_for_vision, data, max_side=64))
+    finally:
+        processor.shutdown()
+
+    assert fingerprint == fingerprint_image(data)
+    assert Image.open(io.BytesIO(encoded)).size == (64, 32)
+
+
+def test_image_processor_replaces_pool_after_worker_dies():
+    processor = ImageProcessor(workers=1)
+    data = _photo_bytes((200, 100))
+
+    async def run():
+        worker = await processor.run(os.getpid)
+        os.kill(worker, signal.SIGKILL)
+        # The pool is broken now; the call is retried once on a fresh one.
+        fingerprint = await processor.run(fingerprint_image, data)
+        with pytest.raises(BrokenProcessPool):
+            # Kills every worker it runs on, so the retry fails too.
+            await processor.run(os._exit, 1)
+        return worker, fingerprint, await processor.run(os.getpid)
+
+    try:
+        worker, fingerprint, replacement = asyncio.run(run())
+    finally:
+        processor.shutdown()
+
+    assert fingerprint == fingerprint_image(data)
+    assert replacement not in (worker, os.getpid())
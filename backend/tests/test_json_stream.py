@@ -0,0 +1,29 @@
+import json
+
+from utils.json_stream import StreamingArrayParser
+
+
+def test_streaming_parser_emits_items_as_they_close():
+    document = "```json\n" + json.dumps(
+        {
+            "total_calories": 1800,
+            "meals": [
+                {"id": "meal-1", "name": "Oats {with} \"honey\"", "macros": {"protein": 10}},
+                {"id": "meal-2", "name": "Soup", "ingredients": ["a", "b"]},
+            ],
+            "supplements": [{"id": "supp-1", "name": "D3"}],
+            "ai_recommendations": [{"ignored": True}],
+        }
+    ) + "\n```"
+    parser = StreamingArrayParser(["meals", "supplements"])
+
+    emitted = []
+    for start in range(0, len(document), 7):
+        emitted.extend(parser.feed(document[start : start + 7]))
+
+    assert [(key, item["id"]) for key, item in emitted] == [
+        ("meals", "meal-1"),
+        ("meals", "meal-2"),
+        ("supplements", "supp-1"),
+    ]
+    assert emitted[0][1]["name"] == 'Oats {with} "honey"'
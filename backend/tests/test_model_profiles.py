@@ -0,0 +1,77 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from config import settings
+from models.ai_provider import AIProvider
+from services.model_profiles import INSIGHTS, model_profile, parse_model_setting
+from utils.chat_completion_factory import ChatCompletionFactory
+
+
+def test_parse_model_setting():
+    assert parse_model_setting("") == {}
+    assert parse_model_setting("gpt-4o") == {None: "gpt-4o"}
+    assert parse_model_setting("groq:llama-3.1-8b-instant, openai:gpt-4o-mini") == {
+        "groq": "llama-3.1-8b-instant",
+        "openai": "gpt-4o-mini",
+    }
+    # Colons inside a model name are not mistaken for a provider prefix.
+    assert parse_model_setting("ft:gpt-4o-mini:acme") == {None: "ft:gpt-4o-mini:acme"}
+
+
+def test_profile_reads_settings_and_accepts_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "AI_INSIGHTS_MODEL", "groq:llama-3.1-8b-instant,openai:gpt-4o-mini")
+    monkeypatch.setattr(settings, "AI_INSIGHTS_MAX_TOKENS", 300)
+    monkeypatch.setattr(settings, "AI_INSIGHTS_TIMEOUT_SECONDS", 0)
+
+    profile = model_profile(INSIGHTS)
+    assert profile.max_tokens == 300
+    assert profile.timeout_seconds is None
+    assert profile.model_for(AIProvider.GROQ, AIProvider.AZURE_OPENAI) == "llama-3.1-8b-instant"
+    assert profile.model_for(AIProvider.AZURE_OPENAI, AIProvider.AZURE_OPENAI) is None
+
+    overridden = model_profile(INSIGHTS, model="llama-3.3-70b-versatile", max_tokens=50, timeout=2)
+    assert overridden.model_for(AIProvider.GROQ, AIProvider.GROQ) == "llama-3.3-70b-versatile"
+    assert overridden.model_for(AIProvider.OPENAI, AIProvider.GROQ) == "gpt-4o-mini"
+    assert (overridden.max_tokens, overridden.timeout_seconds) == (50, 2.0)
+
+
+def test_tasks_use_their_own_profile(monkeypatch, groq_provider):
+    monkeypatch.setattr(settings, "AI_INSIGHTS_MODEL", "groq:llama-3.1-8b-instant")
+    monkeypatch.setattr(settings, "AI_INSIGHTS_MAX_TOKENS", 200)
+    monkeypatch.setattr(settings, "AI_PLAN_MODEL", "")
+    monkeypatch.setattr(settings, "AI_PLAN_MAX_TOKENS", 3000)
+
+    with patch.object(
+        ChatCompletionFactory,
+        "acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": '["Eat more greens"]', "usage": None},
+    ) as mock_completion:
+        asyncio.run(groq_provider.get_nutrition_insights({"calories": 120}, enrich=True))
+        insights_call = mock_completion.await_args.kwargs
+        asyncio.run(groq_provider.get_nutrition_insights({"calories": 120}, enrich=True, max_tokens=64))
+        override_call = mock_completion.await_args.kwargs
+        asyncio.run(groq_provider.generate_diet_plan({"age": 30}, [], bypass_cache=True))
+        plan_call = mock_completion.await_args.kwargs
+
+    assert (insights_call["model"], insights_call["max_tokens"]) == ("llama-3.1-8b-instant", 200)
+    assert override_call["max_tokens"] == 64
+    assert (plan_call["model"], plan_call["max_tokens"]) == (settings.GROQ_MODEL, 3000)
+
+
+def test_profile_timeout_bounds_the_provider_call(groq_provider):
+    async def slow_completion(*args, **kwargs):
+        await asyncio.sleep(1)
+        return {"content": "[]", "usage": None}
+
+    async def run():
+        with patch.object(ChatCompletionFactory, "acreate_completion", side_effect=slow_completion):
+            await groq_provider.generate_chat_completion(
+                messages=[{"role": "user", "content": "hi"}],
+                profile=model_profile(INSIGHTS, timeout=0.05),
+            )
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
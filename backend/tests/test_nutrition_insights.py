@@ -0,0 +1,63 @@
+from services.barcode_service import map_off_product
+from services.nutrition_insights import nutrition_insights, percent_daily_values
+
+
+SNACK_BAR = {
+    "calories": 210,
+    "macros": {"protein": 12, "carbs": 24, "fat": 8},
+    "nutrition_details": {"fiber": 1, "sugar": 18, "sodium": 520, "saturated_fat": 2, "trans_fat": 0},
+}
+
+
+def test_percent_daily_values():
+    dv = percent_daily_values(SNACK_BAR)
+    assert dv["sodium"] == 23
+    assert dv["protein"] == 24
+    assert "trans_fat" not in dv
+
+
+def test_rules_fire_in_weight_order():
+    assert nutrition_insights(SNACK_BAR) == [
+        "High in sodium (520mg, 23% DV) — consider moderating intake",
+        "Higher sugar content (18g)",
+        "Good source of protein (12g, 24% DV)",
+    ]
+
+
+def test_goals_reweight_insights_and_extra_lines_follow():
+    insights = nutrition_insights(
+        SNACK_BAR,
+        [{"type": "muscle-building", "title": "Build muscle"}],
+        extra=["Higher sugar content (18g)", "Pairs well with fruit"],
+    )
+    assert insights[0] == "Good source of protein (12g, 24% DV)"
+    assert insights[-1] == "Pairs well with fruit"
+    assert insights.count("Higher sugar content (18g)") == 1
+
+
+def test_missing_values_do_not_fire_low_rules():
+    assert nutrition_insights({"calories": 0, "nutrition_details": {"sodium": 0}}) == []
+
+
+def test_map_off_product_uses_rule_engine():
+    result = map_off_product(
+        "3017620422003",
+        {
+            "product_name": "Hazelnut spread",
+            "categories": "Spreads, Sweet spreads",
+            "nutriments": {
+                "energy-kcal_100g": 539,
+                "sugars_100g": 56.3,
+                "fat_100g": 30.9,
+                "saturated-fat_100g": 10.6,
+                "proteins_100g": 6.3,
+                "sodium_100g": 0.041,
+            },
+        },
+    )
+    assert result["ai_insights"] == [
+        "High in saturated fat (10.6g, 53% DV)",
+        "Higher sugar content (56.3g)",
+        "Low in sodium (41mg)",
+        "Category: Spreads",
+    ]
@@ -0,0 +1,61 @@
+from services.diet_engine import build_local_plan
+from services.plan_templates import (
+    CALORIE_BANDS,
+    TEMPLATE_GOALS,
+    apply_plan_diff,
+    calorie_band,
+    plan_diff,
+    plan_template_store,
+    template_key,
+)
+
+MUSCLE = [{"type": "muscle-building", "title": "Building Muscle"}]
+
+
+def test_calorie_band_snaps_and_clamps():
+    assert calorie_band(2190) == 2200
+    assert calorie_band(2300) == 2200
+    assert calorie_band(900) == CALORIE_BANDS[0]
+    assert calorie_band(6000) == CALORIE_BANDS[-1]
+    assert template_key(["muscle-building", "glowing-skin"], 2200) == "glowing-skin+muscle-building@2200"
+    assert template_key([], 1800) == "general@1800"
+
+
+def test_bundled_templates_cover_every_goal_combination_and_band():
+    assert len(plan_template_store) == 2 ** len(TEMPLATE_GOALS) * len(CALORIE_BANDS)
+
+
+def test_lookup_serves_template_for_unrestricted_profiles():
+    profile = {"id": 7, "age": 30, "gender": "male", "height": 180, "weight": 80, "activity_level": "moderate"}
+
+    plan = plan_template_store.lookup(profile, MUSCLE)
+
+    assert plan["engine"] == "template"
+    assert plan["template"] == f"muscle-building@{calorie_band(plan['energy']['tdee'] * 1.1)}"
+    assert plan["user_id"] == 7
+    assert len(plan["meals"]) == 4
+    assert all(meal["calories"] > 0 for meal in plan["meals"])
+    # Callers get their own copy.
+    plan["meals"].clear()
+    assert len(plan_template_store.lookup(profile, MUSCLE)["meals"]) == 4
+
+
+def test_lookup_skips_restricted_profiles_and_unknown_goals():
+    assert plan_template_store.lookup({"allergies": ["peanuts"]}, MUSCLE) is None
+    assert plan_template_store.lookup({"dietary_restrictions": ["vegan"]}, MUSCLE) is None
+    assert plan_template_store.lookup({}, [{"type": "weight-loss"}]) is None
+
+
+def test_plan_diff_round_trips():
+    base = plan_template_store.lookup({}, MUSCLE)
+    target = build_local_plan({"age": 40, "gender": "female", "height": 165, "weight": 60}, MUSCLE)
+    target["meals"] = target["meals"][:3]
+    target["supplements"].append({"id": "supp-extra", "name": "Extra"})
+
+    ops = plan_diff(base, target)
+    patched = apply_plan_diff(base, ops)
+
+    for field in ("total_calories", "macros", "meals", "supplements", "ai_recommendations"):
+        assert patched[field] == target[field]
+    assert {"op": "remove", "path": "/meals/3"} in ops
+    assert plan_diff(base, base) == []
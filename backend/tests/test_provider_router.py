@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from models.ai_provider import AIProvider
+from services.provider_router import ProviderRouter
+
+
+@pytest.fixture()
+def two_providers(monkeypatch):
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "")
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "gsk_test")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk_test")
+
+
+def _router(**overrides):
+    options = {"window": 20, "min_samples": 2, "max_error_rate": 0.5, "hedge_delay_seconds": 0}
+    options.update(overrides)
+    return ProviderRouter(**options)
+
+
+def test_router_fails_over_and_demotes_unhealthy_provider(two_providers):
+    router = _router()
+    calls = []
+
+    async def call(provider):
+        calls.append(provider)
+        if provider == AIProvider.GROQ:
+            raise RuntimeError("groq brownout")
+        return provider.value
+
+    for _ in range(3):
+        assert asyncio.run(router.call(call, preferred=AIProvider.GROQ)) == "openai"
+
+    assert calls[:2] == [AIProvider.GROQ, AIProvider.OPENAI]
+    assert router.ranked(AIProvider.GROQ) == [AIProvider.OPENAI, AIProvider.GROQ]
+    assert router.snapshot()["groq"]["healthy"] is False
+
+
+def test_router_prefers_lower_latency(two_providers):
+    router = _router()
+    for _ in range(3):
+        router.stats(AIProvider.GROQ).record(2.0, True)
+        router.stats(AIProvider.OPENAI).record(0.4, True)
+    assert router.ranked(AIProvider.GROQ) == [AIProvider.OPENAI, AIProvider.GROQ]
+
+
+def test_router_hedges_slow_primary_and_cancels_loser(two_providers):
+    router = _router(hedge_delay_seconds=0.05)
+    cancelled = []
+
+    async def call(provider):
+        try:
+            await asyncio.sleep(1.0 if provider == AIProvider.GROQ else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(provider)
+            raise
+        return provider.value
+
+    async def run():
+        result = await router.call(call, preferred=AIProvider.GROQ)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "openai"
+    assert cancelled == [AIProvider.GROQ]
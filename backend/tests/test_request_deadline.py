@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from models.ai_provider import AIProvider
+from services.circuit_breaker import CircuitBreaker
+from services.provider_router import ProviderRouter
+from services.request_deadline import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    bounded_timeout,
+    deadline_scope,
+    remaining,
+    request_budget,
+    run_for_request,
+)
+
+
+class _FakeRequest:
+    def __init__(self, disconnect_after=None, headers=None):
+        self.headers = headers or {}
+        self.polls = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.disconnect_after is not None and self.polls >= self.disconnect_after
+
+
+def test_deadline_scope_nests_and_bounds_timeouts():
+    assert remaining() is None
+    assert bounded_timeout(30) == 30
+    with deadline_scope(10):
+        assert 9 < bounded_timeout(30) <= 10
+        with deadline_scope(60):
+            # The outer, earlier deadline still applies.
+            assert bounded_timeout(None) <= 10
+        assert bounded_timeout(2) == 2
+    assert remaining() is None
+
+    with deadline_scope(0.001):
+        asyncio.run(asyncio.sleep(0.01))
+        with pytest.raises(DeadlineExceeded):
+            bounded_timeout(30)
+
+
+def test_request_budget_honours_shorter_client_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "AI_REQUEST_DEADLINE_SECONDS", 90.0)
+    assert request_budget(SimpleNamespace(headers={})) == 90.0
+    assert request_budget(SimpleNamespace(headers={"X-Request-Timeout": "12.5"})) == 12.5
+    assert request_budget(SimpleNamespace(headers={"X-Request-Timeout": "900"})) == 90.0
+    assert request_budget(SimpleNamespace(headers={"X-Request-Timeout": "soon"})) == 90.0
+
+
+def test_router_attempts_stop_at_the_request_deadline(groq_provider):
+    router = ProviderRouter(window=10, min_samples=1, max_error_rate=0.5, hedge_delay_seconds=0)
+
+    async def slow(provider):
+        await asyncio.sleep(5)
+
+    async def run():
+        with deadline_scope(0.05):
+            await router.call(slow, allowed=[AIProvider.GROQ])
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    assert router.bulkhead(AIProvider.GROQ).in_flight == 0
+
+
+def test_client_deadline_does_not_count_against_provider_health(groq_provider):
+    router = ProviderRouter(
+        window=10,
+        min_samples=1,
+        max_error_rate=0.5,
+        hedge_delay_seconds=0,
+        call_timeout_seconds=30,
+        breaker_factory=lambda name: CircuitBreaker(
+            name, failure_rate_threshold=0.5, window=10, min_calls=3, open_seconds=60
+        ),
+    )
+
+    async def slow(provider):
+        await asyncio.sleep(5)
+
+    async def run():
+        with deadline_scope(0.05):
+            await router.call(slow, allowed=[AIProvider.GROQ])
+
+    for _ in range(3):
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+
+    assert router.breaker(AIProvider.GROQ).state == CircuitBreaker.CLOSED
+    assert router.stats(AIProvider.GROQ).snapshot()["samples"] == 0
+    assert router.bulkhead(AIProvider.GROQ).in_flight == 0
+
+
+def test_run_for_request_cancels_work_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(settings, "AI_DISCONNECT_POLL_SECONDS", 0.01)
+    seen = {}
+
+    async def work():
+        seen["deadline"] = remaining()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    request = _FakeRequest(disconnect_after=2, headers={"X-Request-Timeout": "20"})
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(run_for_request(request, work(), task="diet_plan"))
+
+    assert seen["cancelled"] is True
+    assert 19 < seen["deadline"] <= 20
+
+
+def test_run_for_request_returns_result_while_connected(monkeypatch):
+    monkeypatch.setattr(settings, "AI_DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def work():
+        await asyncio.sleep(0.03)
+        return {"ok": True}
+
+    assert asyncio.run(run_for_request(_FakeRequest(), work(), task="diet_plan")) == {"ok": True}
@@ -1,6 +1,27 @@
+import asyncio
+import io
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+
+from config import settings
+from models.ai_provider import AIProvider
+from services import request_deadline
+from services.barcode_index import barcode_index
+from services.barcode_service import barcode_cache, map_off_product
+from services.circuit_breaker import CircuitBreaker
+from services.provider_router import provider_router
 from tests.helpers import make_test_image_bytes
 
 
+@pytest.fixture(autouse=True)
+def _upload_dir(monkeypatch, tmp_path):
+    """Scans are saved on upload; keep them out of the source tree."""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+
 def test_analyze_food_image_demo_mode(client, auth_headers):
     image_bytes = make_test_image_bytes()
     response = client.post(
@@ -17,3 +38,194 @@ def test_analyze_food_image_demo_mode(client, auth_headers):
     history = client.get("/api/scanner/history", headers=auth_headers)
     assert history.status_code == 200
     assert len(history.json()) >= 1
+
+
+def test_analyze_food_image_reuses_cached_analysis(client, auth_headers, groq_provider):
+    analysis = {
+        "food_name": "Apple",
+        "confidence": 0.9,
+        "serving_size": "1 apple",
+        "calories": 95,
+        "macros": {"protein": 0.5, "carbs": 25, "fat": 0.3},
+        "nutrition_details": {"fiber": 4.4},
+        "ai_insights": ["Fiber rich"],
+    }
+
+    original = Image.new("RGB", (64, 64), color=(200, 100, 50))
+    for x in range(32):
+        for y in range(64):
+            original.putpixel((x, y), (20, 120, 40))
+    first_bytes = io.BytesIO()
+    original.save(first_bytes, format="JPEG", quality=95)
+    recompressed = io.BytesIO()
+    original.save(recompressed, format="JPEG", quality=60)
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        return_value={"content": json.dumps(analysis), "usage": None},
+    ) as mock_completion:
+        for payload in (first_bytes.getvalue(), first_bytes.getvalue(), recompressed.getvalue()):
+            response = client.post(
+                "/api/scanner/analyze-image",
+                headers=auth_headers,
+                files={"file": ("food.jpg", payload, "image/jpeg")},
+            )
+            assert response.status_code == 200
+            assert response.json()["food_name"] == "Apple"
+
+    assert mock_completion.await_count == 1
+
+
+def test_analyze_food_images_batch(client, auth_headers):
+    image_bytes = make_test_image_bytes()
+    response = client.post(
+        "/api/scanner/analyze-images",
+        headers=auth_headers,
+        files=[
+            ("files", ("one.jpg", image_bytes, "image/jpeg")),
+            ("files", ("two.jpg", image_bytes, "image/jpeg")),
+            ("files", ("notes.txt", b"not an image", "text/plain")),
+        ],
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["analyzed"] == 2
+    assert body["failed"] == 1
+    assert [item["filename"] for item in body["items"]] == ["one.jpg", "two.jpg", "notes.txt"]
+    assert body["items"][2]["result"] is None
+    assert "Invalid file type" in body["items"][2]["error"]
+
+    history = client.get("/api/scanner/history", headers=auth_headers)
+    assert len(history.json()) == 2
+
+
+def test_analyze_food_images_batch_checks_rate_limit_once(client, auth_headers):
+    image_bytes = make_test_image_bytes()
+    with patch("routers.scanner.ai_rate_limiter.check") as check:
+        response = client.post(
+            "/api/scanner/analyze-images",
+            headers=auth_headers,
+            files=[("files", (f"{n}.jpg", image_bytes, "image/jpeg")) for n in range(3)],
+        )
+
+    assert response.status_code == 200
+    check.assert_called_once()
+
+
+def test_analyze_food_images_batch_runs_under_the_request_deadline(client, auth_headers):
+    seen = []
+
+    async def analyze(image_data, **kwargs):
+        seen.append(request_deadline.remaining())
+        raise request_deadline.DeadlineExceeded("request deadline exceeded")
+
+    with patch("routers.scanner.ai_service.analyze_food_image", side_effect=analyze):
+        response = client.post(
+            "/api/scanner/analyze-images",
+            headers={**auth_headers, request_deadline.DEADLINE_HEADER: "5"},
+            files=[("files", ("one.jpg", make_test_image_bytes(), "image/jpeg"))],
+        )
+
+    assert response.status_code == 200
+    assert response.json()["failed"] == 1
+    assert "did not respond in time" in response.json()["items"][0]["error"]
+    assert seen[0] is not None and 0 < seen[0] <= 5
+
+
+def test_analyze_food_image_sends_stored_upload_by_url(client, auth_headers, monkeypatch, groq_provider):
+    monkeypatch.setattr(settings, "VISION_IMAGE_SOURCE", "url")
+    monkeypatch.setattr(settings, "PUBLIC_API_URL", "https://api.example.com")
+    analysis = {"n": "Apple", "c": 0.9, "sv": "1 apple", "k": 95, "mc": [0.5, 25, 0.3]}
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        side_effect=[RuntimeError("could not download image"), {"content": json.dumps(analysis), "usage": None}],
+    ) as mock_completion:
+        response = client.post(
+            "/api/scanner/analyze-image?bypass_cache=true",
+            headers=auth_headers,
+            files={"file": ("food.jpg", make_test_image_bytes(), "image/jpeg")},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["food_name"] == "Apple"
+    urls = [
+        call.kwargs["messages"][0]["content"][1]["image_url"]["url"] for call in mock_completion.await_args_list
+    ]
+    assert urls[0].startswith("https://api.example.com/api/uploads/scans/")
+    # The provider could not fetch it, so the retry inlines the image.
+    assert urls[1].startswith("data:image/jpeg;base64,")
+
+
+def test_vision_url_failure_leaves_provider_health_alone(monkeypatch, groq_provider):
+    monkeypatch.setattr(settings, "AI_BREAKER_MIN_CALLS", 1)
+    analysis = {"n": "Apple", "c": 0.9, "sv": "1 apple", "k": 95, "mc": [0.5, 25, 0.3]}
+
+    with patch(
+        "services.ai_service.ChatCompletionFactory.acreate_completion",
+        new_callable=AsyncMock,
+        side_effect=[RuntimeError("could not download image"), {"content": json.dumps(analysis), "usage": None}],
+    ) as mock_completion:
+        result = asyncio.run(
+            groq_provider.analyze_food_image(
+                make_test_image_bytes(), image_url="https://api.example.com/scan.jpg", bypass_cache=True
+            )
+        )
+
+    assert result["food_name"] == "Apple"
+    assert mock_completion.await_count == 2
+    # Only the inline retry is a provider outcome; the failed fetch neither tripped
+    # the breaker (one failure would, with min_calls=1) nor failed over.
+    assert provider_router.breaker(AIProvider.GROQ).state == CircuitBreaker.CLOSED
+    assert provider_router.stats(AIProvider.GROQ).snapshot()["samples"] == 1
+    assert {call.kwargs["provider"] for call in mock_completion.await_args_list} == {AIProvider.GROQ}
+
+
+def test_batch_barcode_lookup_dedupes_and_reports_partial_failures(client, auth_headers, fresh_ai_state):
+    cached = map_off_product("3017620422003", {"product_name": "Nutella", "nutriments": {"energy-kcal_100g": 539}})
+    barcode_cache.set("3017620422003", {"product": cached})
+    barcode_cache.set("0000000000000", {"product": None})
+
+    async def fetch(barcode):
+        if barcode == "5701234567890":
+            return map_off_product(barcode, {"product_name": "Skyr", "nutriments": {"proteins_100g": 11}})
+        raise RuntimeError("upstream timeout")
+
+    with (
+        patch("services.barcode_service._fetch_product", new_callable=AsyncMock, side_effect=fetch) as mock_fetch,
+        patch.object(barcode_index, "lookup", wraps=barcode_index.lookup) as index_lookup,
+    ):
+        response = client.post(
+            "/api/scanner/barcodes",
+            headers=auth_headers,
+            json={
+                "barcodes": [
+                    "3017620422003",
+                    "5701234567890",
+                    "3017-6204-22003",
+                    "0000000000000",
+                    "4006381333931",
+                    "12",
+                ]
+            },
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["found"], body["failed"]) == (2, 3)
+    by_barcode = {item["barcode"]: item for item in body["items"]}
+    assert list(by_barcode) == ["3017620422003", "5701234567890", "0000000000000", "4006381333931", "12"]
+    assert by_barcode["3017620422003"]["result"]["food_name"] == "Nutella"
+    assert by_barcode["5701234567890"]["result"]["macros"]["protein"] == 11.0
+    assert by_barcode["0000000000000"]["error"] == "Product not found for this barcode"
+    assert by_barcode["4006381333931"]["error"].startswith("Failed to scan barcode")
+    assert by_barcode["12"]["error"] == "Invalid barcode"
+    # Only the two barcodes unknown to the cache reached Open Food Facts.
+    assert sorted(call.args[0] for call in mock_fetch.await_args_list) == ["4006381333931", "5701234567890"]
+    # Misses are not probed again on their way upstream.
+    assert index_lookup.call_count == 4
+
+    history = client.get("/api/scanner/history", headers=auth_headers).json()
+    assert {item["name"] for item in history} >= {"Nutella", "Skyr"}
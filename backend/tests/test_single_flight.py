@@ -0,0 +1,153 @@
+import asyncio
+
+from services import single_flight as single_flight_module
+from services.single_flight import SingleFlight
+
+
+def _flight():
+    return SingleFlight("test", lock_seconds=5, result_seconds=5, poll_seconds=0.01)
+
+
+class _FakeRedis:
+    """Just enough of redis.Redis for the single-flight lock/result protocol."""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = _flight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"meals": ["oats"]}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("same", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"meals": ["oats"]} for result in results)
+    # Followers get copies, so one caller mutating its plan cannot affect another.
+    assert len({id(result) for result in results}) == 5
+    assert flight.inflight_count() == 0
+
+
+def test_leader_error_reaches_followers_and_next_call_retries():
+    flight = _flight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def ok():
+        return "fresh"
+
+    assert asyncio.run(flight.do("k", ok)) == "fresh"
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    flight = _flight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_redis_follower_reads_other_workers_result(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(single_flight_module, "get_redis_client", lambda: fake)
+    worker_a, worker_b = _flight(), _flight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"calories": 420}
+
+    async def run():
+        return await asyncio.gather(worker_a.do("k", work), worker_b.do("k", work))
+
+    assert asyncio.run(run()) == [{"calories": 420}, {"calories": 420}]
+    assert len(calls) == 1
+    assert not any(key.endswith(":lock") for key in fake.values)
+
+
+def test_redis_follower_ignores_old_results_and_recomputes_after_leader_error(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(single_flight_module, "get_redis_client", lambda: fake)
+    worker_a, worker_b = _flight(), _flight()
+
+    async def old():
+        return "old"
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("provider down")
+
+    async def fresh():
+        return "fresh"
+
+    async def run():
+        await worker_a.do("k", old)
+        leader = asyncio.create_task(worker_a.do("k", failing))
+        await asyncio.sleep(0.01)
+        follower = await worker_b.do("k", fresh)
+        return await asyncio.gather(leader, return_exceptions=True), follower
+
+    [leader_error], follower = asyncio.run(run())
+    assert isinstance(leader_error, ValueError)
+    # Neither the earlier flight's result nor the leader's error is handed to the follower.
+    assert follower == "fresh"
+
+
+def test_disabled_flight_runs_every_call():
+    flight = SingleFlight("test", lock_seconds=5, result_seconds=5, poll_seconds=0.01, enabled=False)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def run():
+        await asyncio.gather(flight.do("k", work), flight.do("k", work))
+
+    asyncio.run(run())
+    assert len(calls) == 2
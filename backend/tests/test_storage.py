@@ -1,6 +1,6 @@
 from unittest.mock import MagicMock, patch
 
-from services.storage_service import public_upload_url, save_upload, s3_enabled
+from services.storage_service import public_upload_url, save_upload, s3_enabled, vision_image_url
 from config import settings
 
 
@@ -31,3 +31,17 @@ def test_s3_save_upload(monkeypatch):
         mock_client.put_object.assert_called_once()
         assert public_upload_url(key) == f"https://cdn.example.com/{key}"
         assert s3_enabled() is True
+
+
+def test_vision_image_url_needs_a_reachable_origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "S3_BUCKET", "")
+    key = save_upload(b"hello", "image/jpeg", subdir="scans")
+
+    monkeypatch.setattr(settings, "PUBLIC_API_URL", "")
+    assert vision_image_url(key) is None
+
+    monkeypatch.setattr(settings, "PUBLIC_API_URL", "https://api.example.com/")
+    url = vision_image_url(key)
+    assert url.startswith(f"https://api.example.com/api/uploads/{key}?")
+    assert "sig=" in url
@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+
+from config import settings
+from tests.helpers import make_test_image_bytes
+from utils.uploads import UnsupportedUpload, UploadTooLarge, read_upload, sniff_image_type
+
+ALLOWED = ["image/jpeg", "image/png", "image/webp"]
+
+
+class _CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def _upload(data, size=None):
+    stream = _CountingStream(data)
+    return UploadFile(stream, size=size, filename="food.jpg"), stream
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(make_test_image_bytes()[:12]) == "image/jpeg"
+    assert sniff_image_type(b"\x89PNG\r\n\x1a\n\x00\x00\x00\r") == "image/png"
+    assert sniff_image_type(b"RIFF\x10\x00\x00\x00WEBP") == "image/webp"
+    assert sniff_image_type(b"GIF89a\x01\x00\x01\x00\x00\x00") is None
+
+
+def test_read_upload_hashes_and_sniffs_in_chunks():
+    data = make_test_image_bytes()
+    upload, _ = _upload(data)
+
+    result = asyncio.run(read_upload(upload, max_bytes=1024 * 1024, allowed_types=ALLOWED, chunk_size=100))
+
+    assert result.data == data
+    assert result.content_type == "image/jpeg"
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+
+
+def test_read_upload_stops_at_the_size_cap():
+    data = b"\xff\xd8\xff" + b"\x00" * 10_000
+    upload, stream = _upload(data)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=1000, allowed_types=ALLOWED, chunk_size=256))
+    assert stream.bytes_read <= 1024
+
+    # A declared size over the cap is refused before reading anything.
+    upload, stream = _upload(data, size=len(data))
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=1000, allowed_types=ALLOWED))
+    assert stream.bytes_read == 0
+
+
+def test_read_upload_ignores_the_declared_type():
+    upload, stream = _upload(b"<html>" + b" " * 10_000)
+    with pytest.raises(UnsupportedUpload):
+        asyncio.run(read_upload(upload, max_bytes=1024 * 1024, allowed_types=ALLOWED, chunk_size=256))
+    assert stream.bytes_read == 256
+
+    with pytest.raises(UnsupportedUpload):
+        asyncio.run(read_upload(_upload(b"")[0], max_bytes=10, allowed_types=ALLOWED))
+
+
+def test_scan_uses_the_sniffed_type(client, auth_headers, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    png = io.BytesIO()
+    Image.new("RGB", (32, 32), color=(10, 200, 30)).save(png, format="PNG")
+
+    accepted = client.post(
+        "/api/scanner/analyze-image",
+        headers=auth_headers,
+        files={"file": ("food", png.getvalue(), "application/octet-stream")},
+    )
+    disguised = client.post(
+        "/api/scanner/analyze-image",
+        headers=auth_headers,
+        files={"file": ("food.jpg", b"#!/bin/sh\necho hi\n", "image/jpeg")},
+    )
+
+    assert accepted.status_code == 200
+    assert [path.suffix for path in (tmp_path / "scans").iterdir()] == [".png"]
+    assert disguised.status_code == 400
+    assert "Invalid file type" in disguised.json()["error"]["message"]
@@ -0,0 +1,81 @@
+"""Process-wide registry of long-lived AI provider SDK clients."""
+from __future__ import annotations
+
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.AI_HTTP_TIMEOUT, connect=settings.AI_HTTP_CONNECT_TIMEOUT)
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """Pooled async transport handed to OpenAI-compatible SDK clients."""
+    return httpx.AsyncClient(limits=http_limits(), timeout=http_timeout())
+
+
+def sync_http_client() -> httpx.Client:
+    return httpx.Client(limits=http_limits(), timeout=http_timeout())
+
+
+def _key_label(key: Hashable) -> Hashable:
+    # Keys carry the API key after the provider name; only the name is safe to log.
+    return key[0] if isinstance(key, tuple) else key
+
+
+class AIClientRegistry:
+    """Lazily builds one SDK client per (provider, credentials) key and reuses it."""
+
+    def __init__(self) -> None:
+        self._clients: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = builder()
+                self._clients[key] = client
+                logger.info("Created AI client %s", _key_label(key))
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def aclose(self) -> None:
+        """Close every pooled client (app shutdown)."""
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for key, client in clients:
+            close = getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as exc:
+                logger.warning("Failed to close AI client %s: %s", _key_label(key), exc)
+
+
+ai_client_registry = AIClientRegistry()
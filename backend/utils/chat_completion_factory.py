@@ -1,6 +1,47 @@
-from typing import Dict, Any
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 from models.ai_provider import AIProvider
 from config import settings
+from utils.ai_clients import ai_client_registry, async_http_client, sync_http_client
+
+# Providers served through the OpenAI chat.completions API shape (incl. streaming).
+OPENAI_COMPATIBLE_PROVIDERS = {
+    AIProvider.AZURE_OPENAI,
+    AIProvider.OPENAI,
+    AIProvider.GROQ,
+}
+
+# Providers whose SDKs are driven from a worker thread instead of an async client.
+THREADED_PROVIDERS = {
+    AIProvider.GEMINI,
+    AIProvider.COHERE,
+    AIProvider.HUGGING_FACE,
+    AIProvider.MISTRAL,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _sync_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for blocking SDK calls so they never run on the event loop."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.AI_SYNC_EXECUTOR_WORKERS,
+            thread_name_prefix="ai-sync",
+        )
+    return _executor
+
+
+async def close_ai_clients() -> None:
+    """Release pooled provider clients and the blocking-call thread pool."""
+    global _executor
+    await ai_client_registry.aclose()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
 
 
 class ChatCompletionFactory:
@@ -25,14 +66,144 @@ class ChatCompletionFactory:
         else:
             raise ValueError(f"Unsupported provider: {provider}")
 
+    @staticmethod
+    async def acreate_completion(provider: AIProvider, messages: list, **kwargs) -> Dict[str, Any]:
+        """Async counterpart of create_completion; never blocks the event loop."""
+        if provider in OPENAI_COMPATIBLE_PROVIDERS:
+            return await ChatCompletionFactory._openai_compatible_acompletion(provider, messages, **kwargs)
+        elif provider == AIProvider.ANTHROPIC:
+            return await ChatCompletionFactory._anthropic_acompletion(messages, **kwargs)
+        elif provider in THREADED_PROVIDERS:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _sync_executor(),
+                functools.partial(ChatCompletionFactory.create_completion, provider, messages, **kwargs),
+            )
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+    @staticmethod
+    async def astream_completion(provider: AIProvider, messages: list, **kwargs) -> AsyncIterator[str]:
+        """Yield content deltas as the provider generates them.
+
+        Providers without an OpenAI-compatible streaming API yield the full completion once.
+        """
+        if provider in OPENAI_COMPATIBLE_PROVIDERS:
+            client, params = ChatCompletionFactory._openai_compatible_client(provider, **kwargs)
+            stream = await client.chat.completions.create(messages=messages, stream=True, **params)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            return
+
+        result = await ChatCompletionFactory.acreate_completion(provider, messages, **kwargs)
+        yield result.get("content") or ""
+
+    @staticmethod
+    def _openai_compatible_client(provider: AIProvider, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+        """Pooled async client plus default request params for Azure OpenAI, OpenAI and Groq."""
+        if provider == AIProvider.AZURE_OPENAI:
+            from openai import AsyncAzureOpenAI
+
+            api_key = settings.AZURE_OPENAI_API_KEY or kwargs.get("api_key")
+            api_version = settings.AZURE_OPENAI_API_VERSION or kwargs.get("api_version", "2024-02-01")
+            azure_endpoint = settings.AZURE_OPENAI_ENDPOINT or kwargs.get("azure_endpoint")
+            client = ai_client_registry.get(
+                ("azure_openai:async", api_key, api_version, azure_endpoint),
+                lambda: AsyncAzureOpenAI(
+                    api_key=api_key,
+                    api_version=api_version,
+                    azure_endpoint=azure_endpoint,
+                    max_retries=settings.AI_MAX_RETRIES,
+                    http_client=async_http_client(),
+                ),
+            )
+            params = {
+                "model": kwargs.get("model") or settings.AZURE_OPENAI_MODEL,
+                "temperature": kwargs.get("temperature", settings.AZURE_OPENAI_TEMPERATURE),
+                "max_tokens": kwargs.get("max_tokens", settings.AZURE_OPENAI_MAX_TOKENS),
+            }
+        elif provider == AIProvider.OPENAI:
+            from openai import AsyncOpenAI
+
+            api_key = kwargs.get("api_key") or settings.OPENAI_API_KEY
+            client = ai_client_registry.get(
+                ("openai:async", api_key),
+                lambda: AsyncOpenAI(
+                    api_key=api_key,
+                    max_retries=settings.AI_MAX_RETRIES,
+                    http_client=async_http_client(),
+                ),
+            )
+            params = {
+                "model": kwargs.get("model") or settings.OPENAI_MODEL,
+                "temperature": kwargs.get("temperature", 0.7),
+                "max_tokens": kwargs.get("max_tokens", 1000),
+            }
+        elif provider == AIProvider.GROQ:
+            from groq import AsyncGroq
+
+            api_key = settings.GROQ_API_KEY or kwargs.get("api_key")
+            client = ai_client_registry.get(
+                ("groq:async", api_key),
+                lambda: AsyncGroq(
+                    api_key=api_key,
+                    max_retries=settings.AI_MAX_RETRIES,
+                    http_client=async_http_client(),
+                ),
+            )
+            params = {
+                "model": kwargs.get("model") or settings.GROQ_MODEL,
+                "temperature": kwargs.get("temperature", settings.GROQ_TEMPERATURE),
+                "max_tokens": kwargs.get("max_tokens", settings.GROQ_MAX_TOKENS),
+            }
+        else:
+            raise ValueError(f"Provider is not OpenAI-compatible: {provider}")
+        return client, params
+
+    @staticmethod
+    async def _openai_compatible_acompletion(provider: AIProvider, messages: list, **kwargs) -> Dict[str, Any]:
+        client, params = ChatCompletionFactory._openai_compatible_client(provider, **kwargs)
+        response = await client.chat.completions.create(messages=messages, **params)
+        return {"content": response.choices[0].message.content, "usage": response.usage}
+
+    @staticmethod
+    async def _anthropic_acompletion(messages: list, **kwargs) -> Dict[str, Any]:
+        import anthropic
+
+        api_key = kwargs.get("api_key") or settings.ANTHROPIC_API_KEY
+        client = ai_client_registry.get(
+            ("anthropic:async", api_key),
+            lambda: anthropic.AsyncAnthropic(
+                api_key=api_key,
+                max_retries=settings.AI_MAX_RETRIES,
+                http_client=async_http_client(),
+            ),
+        )
+        response = await client.messages.create(
+            model=kwargs.get("model") or settings.ANTHROPIC_MODEL,
+            messages=messages,
+            temperature=kwargs.get("temperature", 0.7),
+            max_tokens=kwargs.get("max_tokens", 1000),
+        )
+        return {"content": response.content[0].text, "usage": response.usage}
+
     @staticmethod
     def _azure_openai_completion(messages: list, **kwargs) -> Dict[str, Any]:
         from openai import AzureOpenAI
 
-        client = AzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY or kwargs.get("api_key"),
-            api_version=settings.AZURE_OPENAI_API_VERSION or kwargs.get("api_version", "2024-02-01"),
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT or kwargs.get("azure_endpoint"),
+        api_key = settings.AZURE_OPENAI_API_KEY or kwargs.get("api_key")
+        api_version = settings.AZURE_OPENAI_API_VERSION or kwargs.get("api_version", "2024-02-01")
+        azure_endpoint = settings.AZURE_OPENAI_ENDPOINT or kwargs.get("azure_endpoint")
+        client = ai_client_registry.get(
+            ("azure_openai:sync", api_key, api_version, azure_endpoint),
+            lambda: AzureOpenAI(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=azure_endpoint,
+                max_retries=settings.AI_MAX_RETRIES,
+                http_client=sync_http_client(),
+            ),
         )
 
         response = client.chat.completions.create(
@@ -47,7 +218,15 @@ class ChatCompletionFactory:
     def _openai_completion(messages: list, **kwargs) -> Dict[str, Any]:
         from openai import OpenAI
 
-        client = OpenAI(api_key=kwargs.get("api_key") or settings.OPENAI_API_KEY)
+        api_key = kwargs.get("api_key") or settings.OPENAI_API_KEY
+        client = ai_client_registry.get(
+            ("openai:sync", api_key),
+            lambda: OpenAI(
+                api_key=api_key,
+                max_retries=settings.AI_MAX_RETRIES,
+                http_client=sync_http_client(),
+            ),
+        )
         response = client.chat.completions.create(
             model=kwargs.get("model") or settings.OPENAI_MODEL,
             messages=messages,
@@ -60,7 +239,15 @@ class ChatCompletionFactory:
     def _groq_completion(messages: list, **kwargs) -> Dict[str, Any]:
         from groq import Groq
 
-        client = Groq(api_key=settings.GROQ_API_KEY or kwargs.get("api_key"))
+        api_key = settings.GROQ_API_KEY or kwargs.get("api_key")
+        client = ai_client_registry.get(
+            ("groq:sync", api_key),
+            lambda: Groq(
+                api_key=api_key,
+                max_retries=settings.AI_MAX_RETRIES,
+                http_client=sync_http_client(),
+            ),
+        )
         response = client.chat.completions.create(
             model=kwargs.get("model") or settings.GROQ_MODEL,
             messages=messages,
@@ -73,7 +260,15 @@ class ChatCompletionFactory:
     def _anthropic_completion(messages: list, **kwargs) -> Dict[str, Any]:
         import anthropic
 
-        client = anthropic.Anthropic(api_key=kwargs.get("api_key") or settings.ANTHROPIC_API_KEY)
+        api_key = kwargs.get("api_key") or settings.ANTHROPIC_API_KEY
+        client = ai_client_registry.get(
+            ("anthropic:sync", api_key),
+            lambda: anthropic.Anthropic(
+                api_key=api_key,
+                max_retries=settings.AI_MAX_RETRIES,
+                http_client=sync_http_client(),
+            ),
+        )
         response = client.messages.create(
             model=kwargs.get("model") or settings.ANTHROPIC_MODEL,
             messages=messages,
@@ -87,8 +282,13 @@ class ChatCompletionFactory:
         import google.generativeai as genai
 
         model_name = kwargs.get("model") or settings.GEMINI_MODEL
-        genai.configure(api_key=kwargs.get("api_key") or settings.GEMINI_API_KEY)
-        model_instance = genai.GenerativeModel(model_name)
+        api_key = kwargs.get("api_key") or settings.GEMINI_API_KEY
+
+        def build_model():
+            genai.configure(api_key=api_key)
+            return genai.GenerativeModel(model_name)
+
+        model_instance = ai_client_registry.get(("gemini:sync", api_key, model_name), build_model)
         prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         response = model_instance.generate_content(prompt)
         return {"content": response.text, "usage": None}
@@ -98,7 +298,11 @@ class ChatCompletionFactory:
         import cohere
 
         model_name = kwargs.get("model") or settings.COHERE_MODEL
-        client = cohere.Client(api_key=kwargs.get("api_key") or settings.COHERE_API_KEY)
+        api_key = kwargs.get("api_key") or settings.COHERE_API_KEY
+        client = ai_client_registry.get(
+            ("cohere:sync", api_key),
+            lambda: cohere.Client(api_key=api_key, timeout=int(settings.AI_HTTP_TIMEOUT)),
+        )
         prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         response = client.generate(
             model=model_name,
@@ -113,7 +317,11 @@ class ChatCompletionFactory:
         from huggingface_hub import InferenceClient
 
         model_name = kwargs.get("model") or settings.HUGGING_FACE_MODEL
-        client = InferenceClient(model=model_name, token=kwargs.get("api_key") or settings.HUGGING_FACE_API_KEY)
+        api_key = kwargs.get("api_key") or settings.HUGGING_FACE_API_KEY
+        client = ai_client_registry.get(
+            ("hugging_face:sync", api_key, model_name),
+            lambda: InferenceClient(model=model_name, token=api_key, timeout=settings.AI_HTTP_TIMEOUT),
+        )
         prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         response = client.text_generation(
             prompt,
@@ -127,7 +335,15 @@ class ChatCompletionFactory:
         from mistralai.client import MistralClient
 
         model_name = kwargs.get("model") or settings.MISTRAL_MODEL
-        client = MistralClient(api_key=kwargs.get("api_key") or settings.MISTRAL_API_KEY)
+        api_key = kwargs.get("api_key") or settings.MISTRAL_API_KEY
+        client = ai_client_registry.get(
+            ("mistral:sync", api_key),
+            lambda: MistralClient(
+                api_key=api_key,
+                max_retries=settings.AI_MAX_RETRIES,
+                timeout=int(settings.AI_HTTP_TIMEOUT),
+            ),
+        )
         response = client.chat(
             model=model_name,
             messages=messages,
@@ -0,0 +1,144 @@
+"""Process-wide pooled HTTP clients for third-party APIs (Open Food Facts, Stripe).
+
+One keep-alive ``httpx.AsyncClient`` per upstream, created on first use and
+closed by the app lifespan. HTTP/2 is used when OUTBOUND_HTTP2 is on and the
+optional ``h2`` package is installed. :meth:`OutboundClients.request` retries
+connection errors and 429/5xx answers with jittered exponential backoff, but
+only for requests that are safe to repeat: idempotent methods, or POSTs
+carrying an Idempotency-Key.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+OPEN_FOOD_FACTS = "openfoodfacts"
+STRIPE = "stripe"
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class Upstream:
+    base_url: str
+    timeout_seconds: float
+    headers: Optional[Dict[str, str]] = None
+
+
+def _settings_upstreams() -> Dict[str, Upstream]:
+    return {
+        OPEN_FOOD_FACTS: Upstream(
+            base_url="https://world.openfoodfacts.org",
+            timeout_seconds=settings.OPEN_FOOD_FACTS_TIMEOUT_SECONDS,
+            headers={
+                "User-Agent": settings.OPEN_FOOD_FACTS_USER_AGENT,
+                "Accept": "application/json",
+            },
+        ),
+        STRIPE: Upstream(base_url="https://api.stripe.com", timeout_seconds=settings.STRIPE_TIMEOUT_SECONDS),
+    }
+
+
+def _retryable(method: str, headers: Optional[Dict[str, str]]) -> bool:
+    if method.upper() in IDEMPOTENT_METHODS:
+        return True
+    return any(name.lower() == "idempotency-key" for name in (headers or {}))
+
+
+class OutboundClients:
+    """Lazily builds one pooled client per upstream; tests swap them with :meth:`override`."""
+
+    def __init__(self, upstreams: Optional[Dict[str, Upstream]] = None) -> None:
+        self._upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def upstream(self, name: str) -> Upstream:
+        if self._upstreams is None:
+            self._upstreams = _settings_upstreams()
+        return self._upstreams[name]
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        upstream = self.upstream(name)
+        http2 = settings.OUTBOUND_HTTP2 and http2_available()
+        logger.info("Created %s HTTP client (http2=%s)", name, http2)
+        return httpx.AsyncClient(
+            base_url=upstream.base_url,
+            headers=upstream.headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.OUTBOUND_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OUTBOUND_MAX_KEEPALIVE,
+                keepalive_expiry=settings.OUTBOUND_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(upstream.timeout_seconds, connect=settings.OUTBOUND_CONNECT_TIMEOUT),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    def override(self, name: str, client: Optional[httpx.AsyncClient]) -> None:
+        """Use ``client`` for ``name`` (tests); None goes back to the pooled default."""
+        if client is None:
+            self._clients.pop(name, None)
+        else:
+            self._clients[name] = client
+
+    async def request(
+        self,
+        name: str,
+        method: str,
+        url: str,
+        *,
+        retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request on ``name``'s pooled client, retrying when it is safe to."""
+        attempts = 1 + (settings.OUTBOUND_RETRIES if retries is None else retries)
+        if not _retryable(method, kwargs.get("headers")):
+            attempts = 1
+        client = self.get(name)
+        for attempt in range(attempts - 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                logger.info("%s %s %s failed (%s); retrying", name, method, url, exc)
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                logger.info("%s %s %s returned %s; retrying", name, method, url, response.status_code)
+                await response.aclose()
+            # Full jitter keeps retries from many workers from lining up.
+            await asyncio.sleep(random.uniform(0, settings.OUTBOUND_RETRY_BACKOFF_SECONDS * 2**attempt))
+        # The last attempt's response or error goes to the caller as is.
+        return await client.request(method, url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close every client (app shutdown)."""
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for name, client in clients:
+            try:
+                await client.aclose()
+            except Exception as exc:
+                logger.warning("Failed to close %s HTTP client: %s", name, exc)
+
+
+outbound_clients = OutboundClients()
@@ -0,0 +1,69 @@
+"""Incremental extraction of completed objects from a streamed JSON document."""
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class StreamingArrayParser:
+    """Emits each object of selected top-level arrays as soon as it closes.
+
+    Feed text chunks of a JSON object such as ``{"meals": [{...}, {...}], ...}``;
+    ``feed`` returns ``(array_key, item)`` pairs for every item completed by the chunk.
+    Leading noise (e.g. a Markdown code fence) before the root object is ignored.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self.text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self.text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = json.loads(text[self._string_start : index + 1])
+                continue
+
+            if not self._stack and char != "{":
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":" and len(self._stack) == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if char == "[" and len(self._stack) == 1 and self._current_key in self.keys:
+                    self._array_key = self._current_key
+                elif char == "{" and self._array_key and len(self._stack) == 2:
+                    self._item_start = index
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._item_start is not None and len(self._stack) == 2:
+                    completed.append((self._array_key, json.loads(text[self._item_start : index + 1])))
+                    self._item_start = None
+                elif char == "]" and len(self._stack) == 1:
+                    self._array_key = None
+        self._pos = len(text)
+        return completed
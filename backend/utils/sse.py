@@ -0,0 +1,15 @@
+"""Server-Sent Events framing helpers."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Tell nginx not to buffer the event stream.
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"